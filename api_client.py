@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the AlterEgo API test scripts
+Keeps TCP connections alive through one pooled requests.Session so the
+numbers we collect measure the route, not connection setup
+"""
+
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configuration (overridable from the environment)
+BASE_URL = os.environ.get("API_BASE_URL", "http://localhost:3000")
+API_BASE = f"{BASE_URL}/api"
+DEFAULT_TIMEOUT = 10
+POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "10"))
+MAX_RETRIES = int(os.environ.get("API_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("API_RETRY_BACKOFF", "0.25"))
+
+_settings = {
+    'pool_size': POOL_SIZE,
+    'max_retries': MAX_RETRIES,
+    'backoff_factor': RETRY_BACKOFF,
+}
+_session = None
+_session_lock = threading.Lock()
+
+def _build_session():
+    # Only connection errors are retried: the request never reached the server,
+    # so replaying a POST is safe. Read errors and HTTP statuses are returned as-is.
+    retry = Retry(
+        total=_settings['max_retries'],
+        connect=_settings['max_retries'],
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=_settings['backoff_factor'],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=_settings['pool_size'],
+        pool_maxsize=_settings['pool_size'],
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def configure(pool_size=None, max_retries=None, backoff_factor=None):
+    """Change pool/retry settings; the session is rebuilt on next use"""
+    global _session
+    with _session_lock:
+        if pool_size is not None:
+            _settings['pool_size'] = pool_size
+        if max_retries is not None:
+            _settings['max_retries'] = max_retries
+        if backoff_factor is not None:
+            _settings['backoff_factor'] = backoff_factor
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_session():
+    """Return the shared keep-alive session (thread-safe)"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def close():
+    """Close pooled connections"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def make_request(method, endpoint, data=None, headers=None, timeout=DEFAULT_TIMEOUT, params=None):
+    """Make HTTP request with error handling and timing.
+
+    `endpoint` is relative to API_BASE unless it is a full URL. The returned
+    dict carries `elapsed_ms` (full request including body) and `ttfb_ms`
+    (until response headers were parsed).
+    """
+    url = endpoint if endpoint.startswith("http") else f"{API_BASE}{endpoint}"
+    start = time.perf_counter()
+    response = None
+    try:
+        response = get_session().request(
+            method, url, json=data, headers=headers, params=params, timeout=timeout
+        )
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        return {
+            'success': True,
+            'status_code': response.status_code,
+            'data': response.json() if response.content else {},
+            'response': response,
+            'elapsed_ms': elapsed_ms,
+            'ttfb_ms': response.elapsed.total_seconds() * 1000,
+        }
+    except (json.JSONDecodeError, requests.exceptions.JSONDecodeError) as e:
+        return {
+            'success': False,
+            'error': f"JSON decode error: {str(e)}",
+            'status_code': response.status_code if response is not None else None,
+            'data': {},
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+            'ttfb_ms': response.elapsed.total_seconds() * 1000 if response is not None else None,
+        }
+    except requests.exceptions.RequestException as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'status_code': None,
+            'data': {},
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+            'ttfb_ms': None,
+        }
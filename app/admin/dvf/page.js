@@ -18,7 +18,7 @@ export default function DVFAdminPage() {
   const loadStats = async () => {
     try {
       const token = localStorage.getItem('adminToken');
-      const res = await fetch('/api/admin/dvf?action=stats', {
+      const res = await fetch('/api/admin/dvf/stats', {
         headers: { 'Authorization': `Bearer ${token}` }
       });
       if (res.ok) {
@@ -30,6 +30,10 @@ export default function AdminPage() {
   const [filterStatus, setFilterStatus] = useState('all');
   const [filterType, setFilterType] = useState('all');
   const [filterReason, setFilterReason] = useState(null);
+  const [filterFrom, setFilterFrom] = useState('');
+  const [filterTo, setFilterTo] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
   const [leadToDelete, setLeadToDelete] = useState(null);
 
@@ -38,10 +42,14 @@ export default function AdminPage() {
     if (savedToken) {
       setToken(savedToken);
       setIsAuthenticated(true);
-      loadLeads(savedToken);
     }
   }, []);
 
+  // Filtres appliqués côté serveur : recharger la première page à chaque changement
+  useEffect(() => {
+    if (token) loadLeads(token);
+  }, [token, filterStatus, filterType, filterReason, filterFrom, filterTo]);
+
   const handleLogin = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -58,7 +66,6 @@ export default function AdminPage() {
         localStorage.setItem('adminToken', data.token);
         setToken(data.token);
         setIsAuthenticated(true);
-        loadLeads(data.token);
       } else {
         alert('Identifiants invalides');
       }
@@ -70,20 +77,67 @@ export default function AdminPage() {
     }
   };
 
+  // Une page de leads (vue liste, sans le détail de l'estimation) avec les filtres courants
+  const fetchLeadsPage = async (authToken, cursor = null) => {
+    const params = new URLSearchParams();
+    if (cursor) params.set('cursor', cursor);
+    if (filterStatus !== 'all') params.set('status', filterStatus);
+    if (filterType !== 'all') params.set('type', filterType);
+    if (filterReason) params.set('reason', filterReason);
+    if (filterFrom) params.set('from', filterFrom);
+    if (filterTo) params.set('to', filterTo);
+    
+    const res = await fetch(`/api/leads?${params}`, {
+      headers: {
+        'Authorization': `Bearer ${authToken}`
+      }
+    });
+    if (!res.ok) {
+      throw new Error(await res.text());
+    }
+    return res.json();
+  };
+
   const loadLeads = async (authToken) => {
     try {
-      const res = await fetch('/api/leads', {
+      const data = await fetchLeadsPage(authToken);
+      setLeads(data.leads || []);
+      setNextCursor(data.nextCursor);
+    } catch (error) {
+      console.error('Error loading leads:', error);
+    }
+  };
+
+  const loadMoreLeads = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchLeadsPage(token, nextCursor);
+      setLeads(prevLeads => [...prevLeads, ...(data.leads || [])]);
+      setNextCursor(data.nextCursor);
+    } catch (error) {
+      console.error('Error loading leads:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Lead complet (estimation, comparables, commentaires) pour la fiche détail
+  const openLeadDetail = async (lead) => {
+    setSelectedLead(lead);
+    setShowDetailModal(true);
+    try {
+      const res = await fetch(`/api/admin/leads/detail?leadId=${lead.id}`, {
         headers: {
-          'Authorization': `Bearer ${authToken}`
+          'Authorization': `Bearer ${token}`
         }
       });
-      
       if (res.ok) {
         const data = await res.json();
-        setLeads(data.leads || []);
+        setSelectedLead(data.lead);
       }
     } catch (error) {
-      console.error('Error loading leads:', error);
+      console.error('Error loading lead:', error);
     }
   };
 
@@ -92,6 +146,7 @@ export default function AdminPage() {
     setIsAuthenticated(false);
     setToken(null);
     setLeads([]);
+    setNextCursor(null);
   };
 
   const updateLeadStatus = async (leadId, newStatus) => {
@@ -143,7 +198,11 @@ export default function AdminPage() {
         })
       });
       setNewComment('');
-      loadLeads(token);
+      setLeads(prevLeads => 
+        prevLeads.map(lead => 
+          lead.id === leadId ? { ...lead, commentCount: (lead.commentCount || 0) + 1 } : lead
+        )
+      );
     } catch (error) {
       console.error('Error adding comment:', error);
     }
@@ -213,13 +272,28 @@ export default function AdminPage() {
     }
   };
 
-  const exportToCSV = () => {
+  // Exporte tous les leads des filtres courants (pages suivantes comprises)
+  const exportToCSV = async () => {
+    let exported = [...leads];
+    let cursor = nextCursor;
+    try {
+      while (cursor) {
+        const data = await fetchLeadsPage(token, cursor);
+        exported = [...exported, ...(data.leads || [])];
+        cursor = data.nextCursor;
+      }
+    } catch (error) {
+      console.error('Error exporting leads:', error);
+      alert("Erreur lors de l'export des leads");
+      return;
+    }
+    
     const headers = [
       'Date', 'Heure', 'Nom', 'Email', 'Téléphone', 'Raison', 'Adresse', 'Type', 'Surface (m²)',
       'Prix Estimé (€)', 'Prix Conseillé (€)', 'Confiance (%)', 'Statut', 'Commentaires'
     ];
     
-    const rows = filteredLeads.map(lead => [
+    const rows = exported.filter(matchesSearch).map(lead => [
       new Date(lead.createdAt).toLocaleDateString('fr-FR'),
       new Date(lead.createdAt).toLocaleTimeString('fr-FR', { hour: '2-digit', minute: '2-digit' }),
       lead.name,
@@ -233,7 +307,7 @@ export default function AdminPage() {
       lead.estimation?.finalPrice?.mid || '',
       lead.estimation?.finalPrice?.confidence || '',
       lead.status || '',
-      lead.comments?.length || 0
+      lead.commentCount || 0
     ]);
     
     const csvContent = [
@@ -248,32 +322,25 @@ export default function AdminPage() {
     link.click();
   };
 
+  // La recherche porte sur les leads chargés ; statut, type, raison et période sont filtrés par le serveur
+  const matchesSearch = (lead) => {
+    if (!searchQuery) return true;
+    const query = searchQuery.toLowerCase();
+    return Boolean(
+      lead.name?.toLowerCase().includes(query) ||
+      lead.email?.toLowerCase().includes(query) ||
+      lead.property?.address?.toLowerCase().includes(query)
+    );
+  };
+
   const filteredLeads = leads.filter(lead => {
-    if (!searchQuery && filterStatus === 'all' && filterType === 'all' && !filterReason) return true;
-    
-    let matches = true;
-    
-    if (searchQuery) {
-      const query = searchQuery.toLowerCase();
-      matches = matches && (
-        lead.name?.toLowerCase().includes(query) ||
-        lead.email?.toLowerCase().includes(query) ||
-        lead.property?.address?.toLowerCase().includes(query)
-      );
-    }
+    let matches = matchesSearch(lead);
     
+    // Un lead modifié localement peut ne plus correspondre au filtre de statut
     if (filterStatus !== 'all') {
       matches = matches && lead.status === filterStatus;
     }
     
-    if (filterType !== 'all') {
-      matches = matches && lead.property?.type === filterType;
-    }
-    
-    if (filterReason) {
-      matches = matches && lead.estimationReason === filterReason;
-    }
-    
     return matches;
   });
 
@@ -368,7 +435,7 @@ export default function AdminPage() {
                 alt="AlterEgo" 
                 className="h-10 w-auto"
               />
-              <Badge variant="outline" className="text-sm">{filteredLeads.length} lead{filteredLeads.length !== 1 ? 's' : ''}</Badge>
+              <Badge variant="outline" className="text-sm">{filteredLeads.length}{nextCursor ? '+' : ''} lead{filteredLeads.length !== 1 ? 's' : ''}</Badge>
             </div>
             <div className="flex items-center gap-4">
               <Button 
@@ -442,12 +509,34 @@ export default function AdminPage() {
               </SelectContent>
             </Select>
             
+            {/* Filter Période */}
+            <div className="flex items-center gap-2">
+              <Calendar className="w-4 h-4 text-gray-400" />
+              <Input
+                type="date"
+                value={filterFrom}
+                onChange={(e) => setFilterFrom(e.target.value)}
+                className="w-[160px]"
+                aria-label="Du"
+              />
+              <span className="text-sm text-gray-500">au</span>
+              <Input
+                type="date"
+                value={filterTo}
+                onChange={(e) => setFilterTo(e.target.value)}
+                className="w-[160px]"
+                aria-label="Au"
+              />
+            </div>
+            
             {/* Reset Filters */}
-            {(filterStatus !== 'all' || filterType !== 'all' || filterReason || searchQuery) && (
+            {(filterStatus !== 'all' || filterType !== 'all' || filterReason || filterFrom || filterTo || searchQuery) && (
               <Button variant="outline" size="sm" onClick={() => {
                 setFilterStatus('all');
                 setFilterType('all');
                 setFilterReason(null);
+                setFilterFrom('');
+                setFilterTo('');
                 setSearchQuery('');
               }}>
                 <X className="w-4 h-4 mr-2" /> Réinitialiser
@@ -547,11 +636,11 @@ export default function AdminPage() {
               )}
 
               {/* Comments Badge */}
-              {lead.comments && lead.comments.length > 0 && (
+              {lead.commentCount > 0 && (
                 <div className="mb-4">
                   <Badge variant="outline" className="text-xs">
                     <MessageSquare className="w-3 h-3 mr-1" />
-                    {lead.comments.length} commentaire{lead.comments.length > 1 ? 's' : ''}
+                    {lead.commentCount} commentaire{lead.commentCount > 1 ? 's' : ''}
                   </Badge>
                 </div>
               )}
@@ -562,10 +651,7 @@ export default function AdminPage() {
                   size="sm" 
                   variant="outline" 
                   className="flex-1"
-                  onClick={() => {
-                    setSelectedLead(lead);
-                    setShowDetailModal(true);
-                  }}
+                  onClick={() => openLeadDetail(lead)}
                 >
                   <Eye className="w-4 h-4 mr-2" />
                   Détails
@@ -585,6 +671,15 @@ export default function AdminPage() {
           ))}
         </div>
 
+        {nextCursor && (
+          <div className="text-center mt-8">
+            <Button onClick={loadMoreLeads} variant="outline" disabled={loadingMore}>
+              {loadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+              Charger plus de leads
+            </Button>
+          </div>
+        )}
+
         {filteredLeads.length === 0 && (
           <div className="text-center py-12">
             <p className="text-gray-500 text-lg">Aucun lead trouvé</p>
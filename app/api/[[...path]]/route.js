@@ -1,21 +1,25 @@
 import { NextResponse } from 'next/server';
 import { connectToDatabase, getCollection } from '../../../lib/mongodb';
 import { getDVFComparables } from '../../../lib/dvf';
-import { getAdaptiveComparables } from '../../../lib/dvf-enhanced';
-import { calculateAdjustments, calculateAdjustedPrice } from '../../../lib/dvf-adjustments';
-import { ingestDVFDepartment } from '../../../lib/dvf-ingestion';
-import { scrapeSeLoger, calculateMarketStats } from '../../../lib/scraper';
-import { getDVFStats, startDVFIngestion, getIngestionState, clearDVFData } from '../../../lib/dvf-admin';
+import { getCachedComparables } from '../../../lib/comparables-cache';
+import { ingestMultipleDepartments } from '../../../lib/dvf-scheduler';
+import { getMarketSnapshot } from '../../../lib/market-snapshots';
+import { runEstimate } from '../../../lib/estimation';
+import { estimateBatch, BATCH_MAX_PROPERTIES } from '../../../lib/batch-estimation';
+import { resolveAddress, GeocodingError } from '../../../lib/geocoding';
+import { getDVFStats, getDVFDepartmentStatus, startDVFIngestion, getIngestionState, clearDVFData } from '../../../lib/dvf-admin';
+import { listDVFAggregates, AGGREGATE_LEVELS } from '../../../lib/dvf-aggregates';
 import { 
-  generateOTP, 
   normalizePhoneNumber, 
   isValidFrenchPhone, 
   shouldBypassVerification,
   sendOTPSMS,
-  calculateExpirationTime,
-  isOTPExpired
+  BREVO_API_URL
 } from '../../../lib/otp-service';
-import { createOrUpdateBrevoContact } from '../../../lib/brevo-contact-service';
+import { issueOTP, cancelOTP, verifyOTP } from '../../../lib/otp-state';
+import { checkRateLimit, rateLimitHeaders, ClientIpError, RATE_LIMIT_ENABLED } from '../../../lib/rate-limit';
+import { needsContactSync, pendingSyncFields, nudgeBrevoSyncWorker } from '../../../lib/brevo-sync-queue';
+import { listLeads, getLead, LeadQueryError } from '../../../lib/leads';
 import jwt from 'jsonwebtoken';
 import bcrypt from 'bcryptjs';
 import { v4 as uuidv4 } from 'uuid';
@@ -29,13 +33,53 @@ const corsHeaders = {
   'Access-Control-Allow-Origin': '*',
   'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
   'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+  'Access-Control-Expose-Headers': 'Retry-After, X-RateLimit-Limit, X-RateLimit-Remaining',
 };
 
+// Per-client rate limiting (lib/rate-limit.js): 429 before any database or upstream work,
+// X-RateLimit-* headers on every response of a rate-limited route
+async function withRateLimit(request, handler) {
+  const { pathname } = new URL(request.url);
+  
+  let rateLimit;
+  try {
+    rateLimit = await checkRateLimit(request, pathname);
+  } catch (error) {
+    if (error instanceof ClientIpError) {
+      console.error('[RateLimit] Cannot identify the client, check the proxy configuration:', error.message);
+      return NextResponse.json(
+        { error: 'Rate limiter misconfigured', message: error.message },
+        { status: 500, headers: corsHeaders }
+      );
+    }
+    throw error;
+  }
+  
+  if (rateLimit && !rateLimit.allowed) {
+    return NextResponse.json(
+      { error: 'Too many requests. Please try again later.', retryAfter: rateLimit.retryAfter },
+      { status: 429, headers: { ...corsHeaders, ...rateLimitHeaders(rateLimit) } }
+    );
+  }
+  
+  const response = await handler(request);
+  if (rateLimit) {
+    for (const [name, value] of Object.entries(rateLimitHeaders(rateLimit))) {
+      response.headers.set(name, value);
+    }
+  }
+  return response;
+}
+
 export async function OPTIONS() {
   return NextResponse.json({}, { headers: corsHeaders });
 }
 
 export async function GET(request) {
+  return withRateLimit(request, handleGET);
+}
+
+async function handleGET(request) {
   const { pathname, searchParams } = new URL(request.url);
 
   try {
@@ -58,20 +102,21 @@ export async function GET(request) {
         );
       }
       
-      const response = await fetch(
-        `https://api-adresse.data.gouv.fr/search/?q=${encodeURIComponent(address)}&limit=5`
-      );
-      const data = await response.json();
-      
-      if (data.features && data.features.length > 0) {
-        const suggestions = data.features.map(f => ({
-          address: f.properties.label,
-          lat: f.geometry.coordinates[1],
-          lng: f.geometry.coordinates[0],
-          city: f.properties.city,
-          postalCode: f.properties.postcode
-        }));
-        
+      let suggestions;
+      try {
+        suggestions = await resolveAddress(address);
+      } catch (error) {
+        if (error instanceof GeocodingError) {
+          console.error('Geocoding error:', error.message);
+          return NextResponse.json(
+            { error: 'Geocoding service unavailable' },
+            { status: error.status, headers: corsHeaders }
+          );
+        }
+        throw error;
+      }
+      
+      if (suggestions.length > 0) {
         return NextResponse.json(
           { suggestions },
           { headers: corsHeaders }
@@ -101,7 +146,7 @@ export async function GET(request) {
       }
       
       // Use enhanced adaptive algorithm
-      const result = await getAdaptiveComparables({
+      const result = await getCachedComparables({
         lat,
         lng,
         type,
@@ -132,13 +177,9 @@ export async function GET(request) {
       }
       
       try {
-        const listings = await scrapeSeLoger({ address, lat, lng, type, surface });
-        const stats = calculateMarketStats(listings);
+        const snapshot = await getMarketSnapshot({ address, lat, lng, type, surface });
         
-        return NextResponse.json(
-          { listings: listings.slice(0, 20), stats },
-          { headers: corsHeaders }
-        );
+        return NextResponse.json(snapshot, { headers: corsHeaders });
       } catch (error) {
         console.error('Market scraping error:', error);
         return NextResponse.json(
@@ -148,7 +189,7 @@ export async function GET(request) {
       }
     }
 
-    // Get all leads (admin)
+    // List leads (admin)
     if (pathname === '/api/leads') {
       const authHeader = request.headers.get('authorization');
       
@@ -168,10 +209,70 @@ export async function GET(request) {
         );
       }
       
-      const collection = await getCollection('leads');
-      const leads = await collection.find({}).sort({ createdAt: -1 }).toArray();
+      // Paginated by cursor: ?cursor=<nextCursor>&limit=&status=&reason=&type=&from=&to=
+      let page;
+      try {
+        page = await listLeads({
+          cursor: searchParams.get('cursor'),
+          limit: searchParams.get('limit') || undefined,
+          status: searchParams.get('status'),
+          reason: searchParams.get('reason'),
+          type: searchParams.get('type'),
+          from: searchParams.get('from'),
+          to: searchParams.get('to')
+        });
+      } catch (error) {
+        if (error instanceof LeadQueryError) {
+          return NextResponse.json(
+            { error: error.message },
+            { status: error.status, headers: corsHeaders }
+          );
+        }
+        throw error;
+      }
+      
+      return NextResponse.json(page, { headers: corsHeaders });
+    }
+
+    // Get one lead with its full estimation (admin)
+    if (pathname === '/api/admin/leads/detail') {
+      const authHeader = request.headers.get('authorization');
+      
+      if (!authHeader || !authHeader.startsWith('Bearer ')) {
+        return NextResponse.json(
+          { error: 'Unauthorized' },
+          { status: 401, headers: corsHeaders }
+        );
+      }
+      
+      try {
+        jwt.verify(authHeader.split(' ')[1], JWT_SECRET);
+      } catch {
+        return NextResponse.json(
+          { error: 'Invalid token' },
+          { status: 401, headers: corsHeaders }
+        );
+      }
+      
+      const leadId = searchParams.get('leadId');
       
-      return NextResponse.json({ leads }, { headers: corsHeaders });
+      if (!leadId) {
+        return NextResponse.json(
+          { error: 'Lead ID is required' },
+          { status: 400, headers: corsHeaders }
+        );
+      }
+      
+      const lead = await getLead(leadId);
+      
+      if (!lead) {
+        return NextResponse.json(
+          { error: 'Lead not found' },
+          { status: 404, headers: corsHeaders }
+        );
+      }
+      
+      return NextResponse.json({ lead }, { headers: corsHeaders });
     }
 
     // Get DVF ingestion status (admin)
@@ -194,33 +295,79 @@ export async function GET(request) {
         );
       }
       
-      const collection = await getCollection('dvf_sales');
+      // Per-department counters maintained by ingestion (lib/dvf-department-stats.js)
+      const status = await getDVFDepartmentStatus();
       
-      // Get statistics per department
-      const pipeline = [
-        {
-          $group: {
-            _id: '$code_departement',
-            count: { $sum: 1 },
-            appartements: {
-              $sum: { $cond: [{ $eq: ['$type_local', 'appartement'] }, 1, 0] }
-            },
-            maisons: {
-              $sum: { $cond: [{ $eq: ['$type_local', 'maison'] }, 1, 0] }
-            },
-            lastImport: { $max: '$imported_at' }
-          }
-        },
-        { $sort: { _id: 1 } }
-      ];
+      return NextResponse.json(status, { headers: corsHeaders });
+    }
+
+    // Get DVF statistics (admin dashboard)
+    if (pathname === '/api/admin/dvf/stats') {
+      const authHeader = request.headers.get('authorization');
       
-      const stats = await collection.aggregate(pipeline).toArray();
-      const total = await collection.countDocuments({});
+      if (!authHeader || !authHeader.startsWith('Bearer ')) {
+        return NextResponse.json(
+          { error: 'Unauthorized' },
+          { status: 401, headers: corsHeaders }
+        );
+      }
       
-      return NextResponse.json({ 
-        total, 
-        byDepartment: stats 
-      }, { headers: corsHeaders });
+      try {
+        jwt.verify(authHeader.split(' ')[1], JWT_SECRET);
+      } catch {
+        return NextResponse.json(
+          { error: 'Invalid token' },
+          { status: 401, headers: corsHeaders }
+        );
+      }
+      
+      const stats = await getDVFStats();
+      
+      return NextResponse.json(stats, { headers: corsHeaders });
+    }
+
+    // Get DVF price aggregates per zone (admin dashboard / heatmap)
+    if (pathname === '/api/admin/dvf/aggregates') {
+      const authHeader = request.headers.get('authorization');
+      
+      if (!authHeader || !authHeader.startsWith('Bearer ')) {
+        return NextResponse.json(
+          { error: 'Unauthorized' },
+          { status: 401, headers: corsHeaders }
+        );
+      }
+      
+      try {
+        jwt.verify(authHeader.split(' ')[1], JWT_SECRET);
+      } catch {
+        return NextResponse.json(
+          { error: 'Invalid token' },
+          { status: 401, headers: corsHeaders }
+        );
+      }
+      
+      const level = searchParams.get('level') || 'department';
+      const type = searchParams.get('type') || 'appartement';
+      const department = searchParams.get('department');
+      const bandParam = searchParams.get('band') || 'all';
+      const band = bandParam === 'all' ? 'all' : parseInt(bandParam, 10);
+      
+      if (!AGGREGATE_LEVELS.includes(level) || (level !== 'department' && !department) || Number.isNaN(band)) {
+        return NextResponse.json(
+          { error: `level must be one of ${AGGREGATE_LEVELS.join(', ')}; department is required below department level` },
+          { status: 400, headers: corsHeaders }
+        );
+      }
+      
+      const aggregates = await listDVFAggregates({
+        level,
+        type,
+        band,
+        department,
+        includeTrend: searchParams.get('trend') === 'true'
+      });
+      
+      return NextResponse.json({ level, type, band, department, aggregates }, { headers: corsHeaders });
     }
 
     // Test endpoint pour vérifier les variables d'environnement (GET)
@@ -230,6 +377,8 @@ export async function GET(request) {
           hasBrevoKey: !!process.env.BREVO_API_KEY,
           keyPrefix: process.env.BREVO_API_KEY ? process.env.BREVO_API_KEY.substring(0, 15) + '...' : 'NOT_SET',
           hasBypassPhone: !!process.env.BYPASS_PHONE_NUMBER,
+          brevoApiUrl: BREVO_API_URL,
+          rateLimitEnabled: RATE_LIMIT_ENABLED,
           nodeEnv: process.env.NODE_ENV
         },
         { headers: corsHeaders }
@@ -250,6 +399,10 @@ export async function GET(request) {
 }
 
 export async function POST(request) {
+  return withRateLimit(request, handlePOST);
+}
+
+async function handlePOST(request) {
   const { pathname } = new URL(request.url);
 
   try {
@@ -302,52 +455,22 @@ export async function POST(request) {
         );
       }
       
-      const collection = await getCollection('otp_verifications');
-      
-      // Vérifier s'il existe déjà un OTP non expiré (rate limiting)
-      const existingOTP = await collection.findOne({
-        phone: normalizedPhone,
-        verified: false,
-        expiresAt: { $gt: new Date() }
-      });
+      // Cooldown et remplacement de l'ancien code en une seule opération (lib/otp-state.js)
+      const issued = await issueOTP(normalizedPhone);
       
-      if (existingOTP) {
-        // Vérifier si créé il y a moins de 30 secondes (cooldown)
-        const thirtySecondsAgo = new Date(Date.now() - 30 * 1000);
-        if (new Date(existingOTP.createdAt) > thirtySecondsAgo) {
-          return NextResponse.json(
-            { error: 'Please wait 30 seconds before requesting another code' },
-            { status: 429, headers: corsHeaders }
-          );
-        }
+      if (issued.status === 'cooldown') {
+        return NextResponse.json(
+          { error: 'Please wait 30 seconds before requesting another code' },
+          { status: 429, headers: corsHeaders }
+        );
       }
       
-      // Supprimer les anciens OTP pour ce numéro
-      await collection.deleteMany({
-        phone: normalizedPhone,
-        verified: false
-      });
-      
-      // Générer un nouveau code
-      const code = generateOTP(6);
-      const expiresAt = calculateExpirationTime(5); // 5 minutes
-      
-      // Sauvegarder en base
-      await collection.insertOne({
-        phone: normalizedPhone,
-        code,
-        createdAt: new Date(),
-        expiresAt,
-        verified: false,
-        attempts: 0
-      });
-      
       // Envoyer le SMS via Brevo
-      const smsResult = await sendOTPSMS(normalizedPhone, code);
+      const smsResult = await sendOTPSMS(normalizedPhone, issued.code);
       
       if (!smsResult.success) {
-        // Supprimer l'OTP si l'envoi a échoué
-        await collection.deleteOne({ phone: normalizedPhone, code });
+        // Annuler le code si l'envoi a échoué
+        await cancelOTP(normalizedPhone, issued.code);
         return NextResponse.json(
           { error: 'Failed to send verification code. Please try again.' },
           { status: 500, headers: corsHeaders }
@@ -386,59 +509,37 @@ export async function POST(request) {
         );
       }
       
-      const collection = await getCollection('otp_verifications');
-      
-      // Trouver l'OTP
-      const otpRecord = await collection.findOne({
-        phone: normalizedPhone,
-        verified: false
-      });
+      // Expiration, tentatives et code évalués dans une seule mise à jour atomique
+      const { outcome, attemptsRemaining } = await verifyOTP(normalizedPhone, code);
       
-      if (!otpRecord) {
+      if (outcome === 'not_found') {
         return NextResponse.json(
           { error: 'No pending verification for this phone number' },
           { status: 404, headers: corsHeaders }
         );
       }
       
-      // Vérifier l'expiration
-      if (isOTPExpired(otpRecord.expiresAt)) {
-        await collection.deleteOne({ _id: otpRecord._id });
+      if (outcome === 'expired') {
         return NextResponse.json(
           { error: 'Verification code has expired. Please request a new one.' },
           { status: 400, headers: corsHeaders }
         );
       }
       
-      // Vérifier le nombre de tentatives
-      const maxAttempts = parseInt(process.env.MAX_OTP_ATTEMPTS) || 5;
-      if (otpRecord.attempts >= maxAttempts) {
-        await collection.deleteOne({ _id: otpRecord._id });
+      if (outcome === 'locked') {
         return NextResponse.json(
           { error: 'Too many failed attempts. Please request a new code.' },
           { status: 429, headers: corsHeaders }
         );
       }
       
-      // Vérifier le code
-      if (otpRecord.code !== code) {
-        // Incrémenter les tentatives
-        await collection.updateOne(
-          { _id: otpRecord._id },
-          { $inc: { attempts: 1 } }
-        );
+      if (outcome === 'invalid') {
         return NextResponse.json(
-          { error: 'Invalid verification code', attemptsRemaining: maxAttempts - otpRecord.attempts - 1 },
+          { error: 'Invalid verification code', attemptsRemaining },
           { status: 400, headers: corsHeaders }
         );
       }
       
-      // Marquer comme vérifié
-      await collection.updateOne(
-        { _id: otpRecord._id },
-        { $set: { verified: true, verifiedAt: new Date() } }
-      );
-      
       return NextResponse.json(
         { success: true, verified: true, message: 'Phone verified successfully' },
         { headers: corsHeaders }
@@ -467,45 +568,19 @@ export async function POST(request) {
         );
       }
       
-      const collection = await getCollection('otp_verifications');
-      
-      // Vérifier le cooldown (30 secondes)
-      const recentOTP = await collection.findOne({
-        phone: normalizedPhone,
-        verified: false,
-        createdAt: { $gt: new Date(Date.now() - 30 * 1000) }
-      });
+      const issued = await issueOTP(normalizedPhone);
       
-      if (recentOTP) {
+      if (issued.status === 'cooldown') {
         return NextResponse.json(
           { error: 'Please wait 30 seconds before requesting another code' },
           { status: 429, headers: corsHeaders }
         );
       }
       
-      // Supprimer les anciens OTP
-      await collection.deleteMany({
-        phone: normalizedPhone,
-        verified: false
-      });
-      
-      // Générer et envoyer un nouveau code
-      const code = generateOTP(6);
-      const expiresAt = calculateExpirationTime(5);
-      
-      await collection.insertOne({
-        phone: normalizedPhone,
-        code,
-        createdAt: new Date(),
-        expiresAt,
-        verified: false,
-        attempts: 0
-      });
-      
-      const smsResult = await sendOTPSMS(normalizedPhone, code);
+      const smsResult = await sendOTPSMS(normalizedPhone, issued.code);
       
       if (!smsResult.success) {
-        await collection.deleteOne({ phone: normalizedPhone, code });
+        await cancelOTP(normalizedPhone, issued.code);
         return NextResponse.json(
           { error: 'Failed to send verification code. Please try again.' },
           { status: 500, headers: corsHeaders }
@@ -526,41 +601,20 @@ export async function POST(request) {
     if (pathname === '/api/leads') {
       const leadData = await request.json();
       
+      // Le contact Brevo est synchronisé en arrière-plan (lib/brevo-sync-queue.js) :
+      // la réponse n'attend pas l'API Brevo
       const lead = {
         id: uuidv4(),
         ...leadData,
-        createdAt: new Date().toISOString()
+        createdAt: new Date().toISOString(),
+        ...(needsContactSync(leadData) && pendingSyncFields())
       };
       
       const collection = await getCollection('leads');
       await collection.insertOne(lead);
       
-      // Créer/Mettre à jour le contact dans Brevo si toutes les infos sont présentes
-      if (leadData.email && leadData.name && leadData.estimationReason) {
-        try {
-          // Normaliser le numéro de téléphone au format E.164 pour Brevo
-          const normalizedPhone = leadData.phone ? normalizePhoneNumber(leadData.phone) : '';
-          
-          const brevoResult = await createOrUpdateBrevoContact({
-            email: leadData.email,
-            name: leadData.name,
-            phone: normalizedPhone,  // Numéro normalisé (+33...)
-            estimationReason: leadData.estimationReason, // "Acheter" ou "Vendre"
-            property: leadData.property,
-            estimation: leadData.estimation,
-            consent: leadData.consent
-          });
-          
-          if (brevoResult.success) {
-            console.log(`✅ Contact Brevo synchronisé pour ${leadData.email}`);
-          } else {
-            console.error(`⚠️ Échec synchronisation Brevo: ${brevoResult.error}`);
-            // On ne bloque pas la création du lead si Brevo échoue
-          }
-        } catch (error) {
-          console.error('⚠️ Erreur lors de la synchronisation Brevo:', error);
-          // On continue même si Brevo échoue
-        }
+      if (lead.syncStatus) {
+        nudgeBrevoSyncWorker();
       }
       
       return NextResponse.json(
@@ -580,80 +634,74 @@ export async function POST(request) {
         );
       }
       
-      // Get DVF comparables with enhanced adaptive algorithm
-      const dvfResult = await getAdaptiveComparables({
-        lat,
-        lng,
-        type,
-        surface,
-        initialRadiusMeters: 500,
-        maxRadiusMeters: 800,
-        months: 24,
-        maxMonths: 36,
-        minComparables: 8
-      });
+      // DVF et marché en parallèle, chacun avec son échéance (voir lib/estimation.js)
+      const estimate = await runEstimate({ address, lat, lng, type, surface, characteristics });
       
-      // Calculate adjustments if we have DVF data
-      let adjustmentData = null;
-      let finalPrice = null;
+      return NextResponse.json(estimate, { headers: corsHeaders });
+    }
+
+    // Batch estimation (admin) - NDJSON stream, one line per property then a summary line
+    if (pathname === '/api/estimate/batch') {
+      const authHeader = request.headers.get('authorization');
       
-      if (dvfResult.stats) {
-        const adjustmentResult = calculateAdjustments(
-          { ...characteristics, type, surface },
-          dvfResult
-        );
-        
-        const priceData = calculateAdjustedPrice(
-          dvfResult.stats.weightedAverage,
-          surface,
-          adjustmentResult,
-          dvfResult
+      if (!authHeader || !authHeader.startsWith('Bearer ')) {
+        return NextResponse.json(
+          { error: 'Unauthorized' },
+          { status: 401, headers: corsHeaders }
         );
-        
-        adjustmentData = {
-          ...adjustmentResult,
-          ...priceData
-        };
-        
-        finalPrice = {
-          mid: priceData.priceMid,
-          low: priceData.priceLow,
-          high: priceData.priceHigh,
-          confidence: priceData.confidence
-        };
       }
       
-      // Get market listings
-      let marketResult = { listings: [], stats: null };
       try {
-        const listings = await scrapeSeLoger({ address, lat, lng, type, surface });
-        marketResult = {
-          listings: listings.slice(0, 20),
-          stats: calculateMarketStats(listings)
-        };
-      } catch (error) {
-        console.error('Market scraping failed:', error);
+        jwt.verify(authHeader.split(' ')[1], JWT_SECRET);
+      } catch {
+        return NextResponse.json(
+          { error: 'Invalid token' },
+          { status: 401, headers: corsHeaders }
+        );
       }
       
-      // Calculate delta
-      let delta = null;
-      if (adjustmentData && marketResult.stats) {
-        const adjustedPrice = adjustmentData.adjustedPricePerM2;
-        const marketPrice = marketResult.stats.medianPricePerM2;
-        delta = ((marketPrice - adjustedPrice) / adjustedPrice * 100).toFixed(1);
+      const { properties, includeMarket = false } = await request.json();
+      
+      if (!Array.isArray(properties) || properties.length === 0) {
+        return NextResponse.json(
+          { error: 'Invalid properties array' },
+          { status: 400, headers: corsHeaders }
+        );
       }
       
-      return NextResponse.json(
-        {
-          dvf: dvfResult,
-          adjustments: adjustmentData,
-          finalPrice,
-          market: marketResult,
-          delta,
-          disclaimer: 'Estimations basées sur DVF (open data) et ajustements selon caractéristiques — valeurs indicatives, non contractuelles.'
+      if (properties.length > BATCH_MAX_PROPERTIES) {
+        return NextResponse.json(
+          { error: `Too many properties (max ${BATCH_MAX_PROPERTIES} per request)` },
+          { status: 413, headers: corsHeaders }
+        );
+      }
+      
+      // pull() ne produit une ligne que lorsque le client a consommé la précédente
+      const encoder = new TextEncoder();
+      const results = estimateBatch(properties, { includeMarket: Boolean(includeMarket) });
+      const stream = new ReadableStream({
+        async pull(controller) {
+          try {
+            const { value, done } = await results.next();
+            if (done) {
+              controller.close();
+            } else {
+              controller.enqueue(encoder.encode(JSON.stringify(value) + '\n'));
+            }
+          } catch (error) {
+            console.error('Batch estimation error:', error);
+            controller.enqueue(encoder.encode(JSON.stringify({ error: 'Batch estimation failed' }) + '\n'));
+            controller.close();
+          }
         },
-        { headers: corsHeaders }
-      );
+        async cancel() {
+          await results.return();
+        }
+      });
+      
+      return new NextResponse(stream, {
+        headers: { ...corsHeaders, 'Content-Type': 'application/x-ndjson' }
+      });
     }
 
     // Trigger DVF ingestion (admin)
@@ -688,10 +736,8 @@ export async function POST(request) {
       // Trigger ingestion asynchronously
       setTimeout(async () => {
         try {
-          for (const dept of departments) {
-            console.log(`[API] Starting ingestion for department ${dept}...`);
-            await ingestDVFDepartment(dept);
-          }
+          console.log(`[API] Starting ingestion for departments ${departments.join(', ')}...`);
+          await ingestMultipleDepartments(departments);
         } catch (error) {
           console.error('[API] Ingestion error:', error);
         }
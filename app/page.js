@@ -293,6 +293,32 @@ export default function App() {
     }
   };
 
+  // Compléter une estimation renvoyée sans annonces (market.pending)
+  const loadMarketFollowUp = async (estimation) => {
+    try {
+      const params = new URLSearchParams({
+        address: formData.address,
+        lat: formData.lat,
+        lng: formData.lng,
+        type: formData.type,
+        surface: formData.surface
+      });
+      const res = await fetch(`/api/market/listings?${params}`);
+      const market = await res.json();
+
+      const adjustedPrice = estimation.adjustments?.adjustedPricePerM2;
+      const delta = adjustedPrice && market.stats
+        ? ((market.stats.medianPricePerM2 - adjustedPrice) / adjustedPrice * 100).toFixed(1)
+        : null;
+
+      setResults(current => current === estimation
+        ? { ...current, market: { listings: market.listings || [], stats: market.stats || null }, delta }
+        : current);
+    } catch (error) {
+      console.error('Market follow-up error:', error);
+    }
+  };
+
   const handleEstimate = async () => {
     if (!phoneVerified) {
       setOtpError('Veuillez vérifier votre numéro de téléphone');
@@ -338,6 +364,11 @@ export default function App() {
       const data = await res.json();
       setResults(data);
       
+      // Annonces du marché pas encore prêtes : les récupérer en suivi, sans bloquer l'affichage
+      if (data.market?.pending) {
+        loadMarketFollowUp(data);
+      }
+      
       // 3. Mettre à jour le lead avec l'estimation
       await fetch('/api/leads', {
         method: 'POST',
@@ -1233,7 +1264,7 @@ export default function App() {
                 <h3 className="text-2xl font-bold mb-4">Carte des comparables</h3>
                 <EstimationMap
                   center={[formData.lat, formData.lng]}
-                  dvfSales={results.dvf.comparables || []}
+                  dvfSales={results.dvf?.comparables || []}
                   marketListings={results.market?.listings || []}
                 />
               </Card>
@@ -2,22 +2,47 @@
 """
 Comprehensive Backend Testing for SMS OTP Verification System
 Tests the three OTP endpoints: send-otp, verify-otp, resend-otp
+
+Start the server with RATE_LIMIT_DISABLED=true: the suites send more OTP
+requests from one client than the per-IP limits allow (rate_limit_load.py
+covers the limiter itself).
 """
 
-import requests
+import argparse
+import asyncio
 import json
+import os
+import threading
 import time
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Configuration
-BASE_URL = "http://localhost:3000"
-API_BASE = f"{BASE_URL}/api"
+from api_client import BASE_URL, API_BASE, make_request
+from brevo_mock import DEFAULT_PORT as BREVO_MOCK_PORT, ensure_running, fetch_contact, fetch_latest_code
+from otp_load import add_load_arguments, run_load_from_args, to_e164
 
 # Test phone numbers
 VALID_FRENCH_PHONE = "06 12 34 56 78"
 BYPASS_PHONE = "0698793430"
 INVALID_PHONE = "123456789"
+# Distinct from VALID_FRENCH_PHONE so the Brevo check never hits the send-otp cooldown
+BREVO_TEST_PHONE = "06 12 34 56 79"
+E2E_PHONE = "06 44 55 66 77"
+# Concurrency checks: one number per race so their cooldowns never interact
+RACE_SEND_PHONE = "06 55 66 77 88"
+RACE_VERIFY_PHONE = "06 55 66 77 89"
+RACE_BRUTE_FORCE_PHONE = "06 55 66 77 90"
+RACE_REQUESTS = 10
+MAX_OTP_ATTEMPTS = int(os.environ.get("MAX_OTP_ATTEMPTS", "5"))
+# Lead whose Brevo contact is synchronised in the background
+SYNC_LEAD_EMAIL = f"lead-sync-{int(time.time())}@example.com"
+# Brevo latency injected while submitting it, and how long to wait for the contact
+SLOW_BREVO_MS = 2000
+CONTACT_SYNC_TIMEOUT = 20
+
+# Brevo stand-in (brevo_mock.py) the Next.js server sends SMS to, via BREVO_API_URL
+BREVO_MOCK_URL = os.environ.get("BREVO_MOCK_URL", f"http://localhost:{BREVO_MOCK_PORT}")
 
 # Colors for output
 class Colors:
@@ -28,9 +53,17 @@ class Colors:
     ENDC = '\033[0m'
     BOLD = '\033[1m'
 
+# Per-thread output buffer used by the parallel runner so groups don't interleave
+_log_buffer = threading.local()
+
 def log(message, color=Colors.ENDC):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{color}[{timestamp}] {message}{Colors.ENDC}")
+    line = f"{color}[{timestamp}] {message}{Colors.ENDC}"
+    lines = getattr(_log_buffer, 'lines', None)
+    if lines is not None:
+        lines.append(line)
+    else:
+        print(line)
 
 def test_result(test_name, success, details=""):
     status = "✅ PASS" if success else "❌ FAIL"
@@ -40,38 +73,6 @@ def test_result(test_name, success, details=""):
         log(f"    {details}", Colors.BLUE)
     return success
 
-def make_request(method, endpoint, data=None, headers=None):
-    """Make HTTP request with error handling"""
-    url = f"{API_BASE}{endpoint}"
-    try:
-        if method == "GET":
-            response = requests.get(url, headers=headers, timeout=10)
-        elif method == "POST":
-            response = requests.post(url, json=data, headers=headers, timeout=10)
-        elif method == "DELETE":
-            response = requests.delete(url, headers=headers, timeout=10)
-        
-        return {
-            'success': True,
-            'status_code': response.status_code,
-            'data': response.json() if response.content else {},
-            'response': response
-        }
-    except requests.exceptions.RequestException as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'status_code': None,
-            'data': {}
-        }
-    except json.JSONDecodeError as e:
-        return {
-            'success': False,
-            'error': f"JSON decode error: {str(e)}",
-            'status_code': response.status_code if 'response' in locals() else None,
-            'data': {}
-        }
-
 def test_send_otp_endpoint():
     """Test POST /api/verification/send-otp endpoint"""
     log("🧪 Testing SMS OTP Send API", Colors.BOLD)
@@ -309,7 +310,7 @@ def test_brevo_integration():
     
     # Test with a real French number to see if Brevo API is working
     log("Test: Brevo SMS API integration")
-    result = make_request("POST", "/verification/send-otp", {"phone": "06 12 34 56 78"})
+    result = make_request("POST", "/verification/send-otp", {"phone": BREVO_TEST_PHONE})
     
     if result['success'] and result['status_code'] == 200:
         data = result['data']
@@ -377,26 +378,173 @@ def test_mongodb_storage():
     
     return results
 
-def run_comprehensive_tests():
-    """Run all SMS OTP verification tests"""
-    log("🚀 Starting Comprehensive SMS OTP Verification Testing", Colors.BOLD)
-    log(f"Base URL: {BASE_URL}", Colors.BLUE)
-    log(f"API Base: {API_BASE}", Colors.BLUE)
+def test_otp_end_to_end():
+    """Full send → verify cycle through the Brevo mock, using the real code"""
+    log("🧪 Testing OTP End-to-End (Brevo mock)", Colors.BOLD)
+    results = []
     
-    all_results = []
+    # Test 1: Real send path (insert, Brevo call) against the mock
+    log("Test 1: Send OTP through the mocked Brevo API")
+    send_result = make_request("POST", "/verification/send-otp", {"phone": E2E_PHONE})
+    success = send_result['success'] and send_result['status_code'] == 200 and \
+        send_result['data'].get('success') == True and not send_result['data'].get('bypass')
+    results.append(test_result("Send OTP via Brevo mock", success, 
+                             f"Status: {send_result['status_code']}, {send_result['elapsed_ms']:.0f} ms"))
+    if not success:
+        return results
+    
+    code = fetch_latest_code(BREVO_MOCK_URL, to_e164(E2E_PHONE))
+    results.append(test_result("SMS recorded by Brevo mock", code is not None, 
+                             f"Mock: {BREVO_MOCK_URL}"))
+    if code is None:
+        return results
+    
+    # Test 2: Wrong code is rejected
+    log("Test 2: Wrong code is rejected")
+    wrong_code = "000000" if code != "000000" else "111111"
+    result = make_request("POST", "/verification/verify-otp", {"phone": E2E_PHONE, "code": wrong_code})
+    success = result['success'] and result['status_code'] == 400 and \
+        'Invalid verification code' in result['data'].get('error', '')
+    results.append(test_result("Wrong code rejected", success, 
+                             f"Status: {result['status_code']}, Response: {result['data']}"))
     
-    # Test each endpoint
-    all_results.extend(test_send_otp_endpoint())
-    print()
-    all_results.extend(test_verify_otp_endpoint())
-    print()
-    all_results.extend(test_resend_otp_endpoint())
-    print()
-    all_results.extend(test_brevo_integration())
-    print()
-    all_results.extend(test_mongodb_storage())
-    
-    # Summary
+    # Test 3: The code actually sent by SMS verifies the number
+    log("Test 3: Verify with the code received by SMS")
+    verify_result = make_request("POST", "/verification/verify-otp", {"phone": E2E_PHONE, "code": code})
+    success = verify_result['success'] and verify_result['status_code'] == 200 and \
+        verify_result['data'].get('verified') == True
+    total_ms = send_result['elapsed_ms'] + verify_result['elapsed_ms']
+    results.append(test_result("Verify with real code", success, 
+                             f"Status: {verify_result['status_code']}, end-to-end {total_ms:.0f} ms"))
+    
+    return results
+
+def _race(method, endpoint, payloads):
+    """Send all payloads at once and return the results in payload order"""
+    with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+        return list(executor.map(lambda payload: make_request(method, endpoint, payload), payloads))
+
+def _count_sms(recipient):
+    result = make_request("GET", f"{BREVO_MOCK_URL}/_mock/messages", params={'recipient': recipient}, timeout=5)
+    return len(result['data'].get('messages', [])) if result['success'] else None
+
+def test_otp_concurrency():
+    """Concurrent OTP requests: cooldown, attempt limit and verification hold under races"""
+    log("🧪 Testing OTP under concurrent requests (Brevo mock)", Colors.BOLD)
+    results = []
+    
+    # Test 1: simultaneous sends for one number issue a single code
+    log(f"Test 1: {RACE_REQUESTS} simultaneous send-otp for the same number")
+    sms_before = _count_sms(to_e164(RACE_SEND_PHONE)) or 0
+    responses = _race("POST", "/verification/send-otp", [{"phone": RACE_SEND_PHONE}] * RACE_REQUESTS)
+    if not all(r['success'] for r in responses):
+        results.append(test_result("Concurrent sends issue one code", False, 
+                                 f"Request failed: {next(r['error'] for r in responses if not r['success'])}"))
+        return results
+    statuses = sorted(r['status_code'] for r in responses)
+    sent = _count_sms(to_e164(RACE_SEND_PHONE))
+    success = statuses == [200] + [429] * (RACE_REQUESTS - 1) and sent == sms_before + 1
+    results.append(test_result("Concurrent sends issue one code", success, 
+                             f"Statuses: {statuses}, SMS sent: {sent - sms_before if sent is not None else '?'}"))
+    
+    # Test 2: simultaneous verifies with the right code succeed exactly once
+    log(f"Test 2: {RACE_REQUESTS} simultaneous verify-otp with the correct code")
+    make_request("POST", "/verification/send-otp", {"phone": RACE_VERIFY_PHONE})
+    code = fetch_latest_code(BREVO_MOCK_URL, to_e164(RACE_VERIFY_PHONE))
+    if code is None:
+        results.append(test_result("Concurrent verifies succeed once", False, "No SMS recorded by the mock"))
+    else:
+        responses = _race("POST", "/verification/verify-otp",
+                          [{"phone": RACE_VERIFY_PHONE, "code": code}] * RACE_REQUESTS)
+        statuses = sorted(r['status_code'] or 0 for r in responses)
+        success = statuses == [200] + [404] * (RACE_REQUESTS - 1)
+        results.append(test_result("Concurrent verifies succeed once", success, f"Statuses: {statuses}"))
+    
+    # Test 3: a burst of wrong codes cannot exceed the attempt limit
+    log(f"Test 3: {RACE_REQUESTS} simultaneous wrong codes (limit {MAX_OTP_ATTEMPTS})")
+    make_request("POST", "/verification/send-otp", {"phone": RACE_BRUTE_FORCE_PHONE})
+    code = fetch_latest_code(BREVO_MOCK_URL, to_e164(RACE_BRUTE_FORCE_PHONE))
+    if code is None:
+        results.append(test_result("Attempt limit holds under a burst", False, "No SMS recorded by the mock"))
+        return results
+    wrong_code = "000000" if code != "000000" else "111111"
+    responses = _race("POST", "/verification/verify-otp",
+                      [{"phone": RACE_BRUTE_FORCE_PHONE, "code": wrong_code}] * RACE_REQUESTS)
+    invalid = sum(1 for r in responses if r['status_code'] == 400 and
+                  'Invalid verification code' in r['data'].get('error', ''))
+    locked = sum(1 for r in responses if r['status_code'] == 429)
+    success = invalid == min(MAX_OTP_ATTEMPTS, RACE_REQUESTS) and invalid + locked == RACE_REQUESTS
+    results.append(test_result("Attempt limit holds under a burst", success, 
+                             f"{invalid} counted attempts, {locked} locked out"))
+    
+    # The right code no longer works once the limit is reached (still locked, not expired)
+    result = make_request("POST", "/verification/verify-otp", {"phone": RACE_BRUTE_FORCE_PHONE, "code": code})
+    success = result['status_code'] == 429 and not result['data'].get('verified')
+    results.append(test_result("Correct code refused after lockout", success, 
+                             f"Status: {result['status_code']}, Response: {result['data']}"))
+    
+    return results
+
+def test_lead_contact_sync():
+    """Lead submission is acknowledged without waiting for Brevo, the contact follows"""
+    log("🧪 Testing Lead → Brevo contact sync (Brevo mock)", Colors.BOLD)
+    results = []
+    
+    # Test 1: a slow Brevo does not slow the lead submission down
+    log(f"Test 1: Submit a lead while Brevo answers in {SLOW_BREVO_MS} ms")
+    make_request("POST", f"{BREVO_MOCK_URL}/_mock/profile", {"latency_ms": SLOW_BREVO_MS}, timeout=5)
+    try:
+        result = make_request("POST", "/leads", {
+            "name": "Test Sync",
+            "email": SYNC_LEAD_EMAIL,
+            "phone": "06 11 22 33 44",
+            "estimationReason": "Vendre",
+            "property": {"type": "appartement", "address": "8 Rue des Italiens 75009 Paris", "surface": 65},
+            "consent": True,
+        })
+    finally:
+        make_request("POST", f"{BREVO_MOCK_URL}/_mock/profile", {"latency_ms": 0}, timeout=5)
+    success = result['success'] and result['status_code'] == 200 and \
+        result['data'].get('success') == True and result['elapsed_ms'] < SLOW_BREVO_MS
+    results.append(test_result("Lead acknowledged before Brevo answers", success, 
+                             f"Status: {result['status_code']}, {result['elapsed_ms']:.0f} ms"))
+    if not success:
+        return results
+    
+    # Test 2: the background worker creates the contact
+    log("Test 2: Contact reaches Brevo in the background")
+    start = time.perf_counter()
+    contact = None
+    while contact is None and time.perf_counter() - start < CONTACT_SYNC_TIMEOUT:
+        time.sleep(0.5)
+        contact = fetch_contact(BREVO_MOCK_URL, SYNC_LEAD_EMAIL)
+    success = contact is not None and contact['attributes'].get('RAISON_ESTIMATION') == "Vendre" \
+        and contact['listIds'] == [4]
+    results.append(test_result("Brevo contact synchronised", success, 
+                             f"after {time.perf_counter() - start:.1f}s" if contact else
+                             f"not synchronised within {CONTACT_SYNC_TIMEOUT}s"))
+    
+    return results
+
+# Independent test groups. Each group uses its own phone numbers, so groups can
+# run concurrently while the ordered steps inside a group stay sequential.
+TEST_GROUPS = [
+    ("send-otp", test_send_otp_endpoint),
+    ("verify-otp", test_verify_otp_endpoint),
+    ("resend-otp", test_resend_otp_endpoint),
+    ("brevo", test_brevo_integration),
+    ("mongodb", test_mongodb_storage),
+]
+
+# Only meaningful when the server sends SMS to the Brevo mock
+MOCK_TEST_GROUPS = [
+    ("end-to-end", test_otp_end_to_end),
+    ("concurrency", test_otp_concurrency),
+    ("lead-sync", test_lead_contact_sync),
+]
+
+def print_summary(all_results, elapsed):
+    """Print the PASS/FAIL summary and return True if everything passed"""
     print("\n" + "="*80)
     log("📊 TEST SUMMARY", Colors.BOLD)
     print("="*80)
@@ -409,6 +557,7 @@ def run_comprehensive_tests():
     log(f"Passed: {passed}", Colors.GREEN)
     log(f"Failed: {failed}", Colors.RED)
     log(f"Success Rate: {(passed/total*100):.1f}%", Colors.YELLOW)
+    log(f"Duration: {elapsed:.1f}s", Colors.BLUE)
     
     if failed == 0:
         log("🎉 ALL TESTS PASSED! SMS OTP system is working correctly.", Colors.GREEN)
@@ -417,9 +566,95 @@ def run_comprehensive_tests():
         log(f"⚠️  {failed} tests failed. Please check the issues above.", Colors.RED)
         return False
 
+def run_comprehensive_tests(groups=TEST_GROUPS):
+    """Run all SMS OTP verification tests"""
+    log("🚀 Starting Comprehensive SMS OTP Verification Testing", Colors.BOLD)
+    log(f"Base URL: {BASE_URL}", Colors.BLUE)
+    log(f"API Base: {API_BASE}", Colors.BLUE)
+    
+    all_results = []
+    start = time.perf_counter()
+    
+    # Test each endpoint
+    for index, (_, group) in enumerate(groups):
+        if index > 0:
+            print()
+        all_results.extend(group())
+    
+    return print_summary(all_results, time.perf_counter() - start)
+
+def _run_group_buffered(group):
+    """Run a test group in the current thread, capturing its log output"""
+    _log_buffer.lines = []
+    try:
+        results = group()
+    except Exception as e:
+        log(f"Group crashed: {str(e)}", Colors.RED)
+        results = [False]
+    finally:
+        lines = _log_buffer.lines
+        _log_buffer.lines = None
+    return results, lines
+
+async def run_parallel_tests(groups=TEST_GROUPS):
+    """Run the independent test groups concurrently.
+    
+    The groups are blocking (requests + time.sleep), so each one runs on the
+    event loop's worker threads; the total duration is that of the slowest group.
+    """
+    log("🚀 Starting Comprehensive SMS OTP Verification Testing (parallel)", Colors.BOLD)
+    log(f"Base URL: {BASE_URL}", Colors.BLUE)
+    log(f"API Base: {API_BASE}", Colors.BLUE)
+    log(f"Running {len(groups)} groups concurrently", Colors.BLUE)
+    
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(
+        asyncio.to_thread(_run_group_buffered, group) for _, group in groups
+    ))
+    
+    # Replay each group's output in the usual order so the report stays readable
+    all_results = []
+    for index, (results, lines) in enumerate(outcomes):
+        if index > 0:
+            print()
+        for line in lines:
+            print(line)
+        all_results.extend(results)
+    
+    return print_summary(all_results, time.perf_counter() - start)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="SMS OTP verification backend tests")
+    parser.add_argument("--parallel", action="store_true",
+                        help="run independent test groups concurrently")
+    parser.add_argument("--brevo-mock", nargs="?", const=BREVO_MOCK_URL, default=None, metavar="URL",
+                        help="use the Brevo mock at URL (started in-process if not running) "
+                             "and add the end-to-end OTP tests")
+    parser.add_argument("--load", action="store_true",
+                        help="generate load on the OTP endpoints instead of running functional tests")
+    add_load_arguments(parser)
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    groups = TEST_GROUPS
+    code_lookup = None
+    if args.brevo_mock:
+        BREVO_MOCK_URL = args.brevo_mock.rstrip("/")
+        mock = ensure_running(BREVO_MOCK_URL)
+        if mock:
+            log(f"📡 Started Brevo mock on {mock.base_url}", Colors.BLUE)
+            code_lookup = mock.latest_code
+        else:
+            code_lookup = lambda phone: fetch_latest_code(BREVO_MOCK_URL, phone)
+        groups = TEST_GROUPS + MOCK_TEST_GROUPS
     try:
-        success = run_comprehensive_tests()
+        if args.load:
+            success = run_load_from_args(args, code_lookup=code_lookup)
+        elif args.parallel:
+            success = asyncio.run(run_parallel_tests(groups))
+        else:
+            success = run_comprehensive_tests(groups)
         sys.exit(0 if success else 1)
     except KeyboardInterrupt:
         log("Testing interrupted by user", Colors.YELLOW)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the BAN geocoding API (api-adresse.data.gouv.fr)
+Lets /api/geo/resolve run offline and lets tests check how many lookups
+actually reach the upstream (cache hits and coalesced calls never do).
+
+Point the Next.js server at it with:
+    BAN_API_URL=http://localhost:4020 yarn dev
+
+Addresses come from tests/estimation_corpus.json; every /search/ call is
+recorded (GET /_mock/requests, DELETE to reset).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import unicodedata
+from urllib.parse import parse_qs, urlparse
+
+from mock_server import MockServer, Profile
+
+DEFAULT_PORT = 4020
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "estimation_corpus.json")
+ADDRESS_PATTERN = re.compile(r"^(?P<street>.*?)\s+(?P<postcode>\d{5})\s+(?P<city>.+)$")
+
+def normalize(text):
+    """Same normalization as normalizeAddressQuery in lib/geocoding.js"""
+    text = unicodedata.normalize("NFD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+def load_addresses(corpus_path=DEFAULT_CORPUS):
+    """Fixture addresses as BAN-like records"""
+    with open(corpus_path, encoding="utf-8") as f:
+        properties = json.load(f)["properties"]
+    addresses = []
+    for prop in properties:
+        match = ADDRESS_PATTERN.match(prop["address"])
+        addresses.append({
+            'label': prop["address"],
+            'postcode': match.group("postcode") if match else None,
+            'city': match.group("city") if match else None,
+            'lat': prop["lat"],
+            'lng': prop["lng"],
+            'tokens': set(normalize(prop["address"]).split()),
+        })
+    return addresses
+
+class BanMock(MockServer):
+    """Asyncio HTTP server emulating GET /search/ of the BAN API"""
+
+    name = "ban"
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, profile=None, seed=None, addresses=None):
+        super().__init__(host, port, profile, seed)
+        self.addresses = addresses if addresses is not None else load_addresses()
+        self.requests = []
+
+    # ------------------------------------------------------------------
+    # Recorded data
+    # ------------------------------------------------------------------
+
+    def get_requests(self):
+        with self.lock:
+            return list(self.requests)
+
+    def reset(self):
+        with self.lock:
+            self.requests.clear()
+
+    # ------------------------------------------------------------------
+    # BAN API emulation
+    # ------------------------------------------------------------------
+
+    def search(self, query, limit=5):
+        """Fixture addresses containing every query token, best score first"""
+        tokens = normalize(query).split()
+        if not tokens:
+            return []
+        features = []
+        for address in self.addresses:
+            if not all(token in address['tokens'] for token in tokens):
+                continue
+            score = round(len(tokens) / len(address['tokens']), 4)
+            features.append({
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [address['lng'], address['lat']]},
+                'properties': {
+                    'label': address['label'],
+                    'score': score,
+                    'postcode': address['postcode'],
+                    'city': address['city'],
+                    'type': 'housenumber',
+                },
+            })
+        features.sort(key=lambda feature: -feature['properties']['score'])
+        return features[:limit]
+
+    async def _search(self, query):
+        q = query.get('q', [''])[0]
+        try:
+            limit = int(query.get('limit', ['5'])[0])
+        except ValueError:
+            return 400, {'code': 400, 'message': 'limit must be an integer'}
+        with self.lock:
+            self.requests.append({'q': q, 'limit': limit, 'received_at': time.time()})
+        if len(q.strip()) < 3:
+            return 400, {'code': 400, 'message': 'q must contain at least 3 characters'}
+        failure = await self.apply_profile()
+        if failure:
+            return failure
+        return 200, {'type': 'FeatureCollection', 'query': q, 'limit': limit,
+                     'features': self.search(q, limit)}
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    async def handle(self, method, target, headers, body):
+        url = urlparse(target)
+        path = url.path.rstrip('/')
+        query = parse_qs(url.query)
+
+        # Control API for tests
+        if path == '/_mock/requests':
+            if method == 'DELETE':
+                self.reset()
+                return 204, None
+            return 200, {'requests': self.get_requests()}
+        if path == '/_mock/profile':
+            if method == 'POST':
+                self.profile.update(**(body or {}))
+            return 200, self.profile.as_dict()
+
+        # BAN API
+        if path == '/search' and method == 'GET':
+            return await self._search(query)
+        return 404, {'code': 404, 'message': f'No mock for {method} {path}'}
+
+def ensure_running(mock_url):
+    """Start an in-process mock at `mock_url` unless one already answers there.
+
+    Returns the BanMock started here, or None when an external one is used.
+    """
+    from api_client import make_request
+
+    probe = make_request("GET", f"{mock_url}/_mock/profile", timeout=2)
+    if probe['success'] and probe['status_code'] == 200:
+        return None
+    url = urlparse(mock_url)
+    return BanMock(url.hostname, url.port or DEFAULT_PORT).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local BAN geocoding stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSON corpus providing the addresses")
+    parser.add_argument("--latency-ms", type=float, default=0, help="base upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random latency (uniform)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="status for failed calls")
+    parser.add_argument("--max-rps", type=float, default=None, help="throttle: 429 above this rate")
+    args = parser.parse_args()
+
+    mock = BanMock(args.host, args.port, Profile(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        max_rps=args.max_rps,
+    ), addresses=load_addresses(args.corpus))
+    print(f"🗺️  BAN mock listening on {mock.base_url} (BAN_API_URL={mock.base_url})")
+    try:
+        asyncio.run(mock.serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
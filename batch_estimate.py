@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Client for the batch estimation API (POST /api/estimate/batch)
+Revalues a portfolio or lead list from a CSV, JSON or NDJSON file and writes
+one NDJSON result line per property as the server streams them back.
+
+Usage:
+    ADMIN_USERNAME=... ADMIN_PASSWORD=... python batch_estimate.py portfolio.csv -o results.ndjson
+    python batch_estimate.py leads.ndjson --token $JWT --include-market
+
+Input rows need lat, lng, type (appartement/maison) and surface; id, address
+and characteristics (a JSON object in CSV files) are passed through.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from api_client import API_BASE, BASE_URL, get_session, make_request
+
+BATCH_ENDPOINT = f"{API_BASE}/estimate/batch"
+# Server-side limit is BATCH_MAX_PROPERTIES (10000); smaller chunks stream sooner
+DEFAULT_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", "2000"))
+STREAM_TIMEOUT = 300
+NUMERIC_FIELDS = ("lat", "lng", "surface")
+
+def _coerce(row):
+    """Typed property from a CSV row (all values arrive as strings)"""
+    prop = {key: value for key, value in row.items() if value not in (None, "")}
+    for field in NUMERIC_FIELDS:
+        if field in prop:
+            try:
+                prop[field] = float(prop[field])
+            except ValueError:
+                pass
+    if isinstance(prop.get("characteristics"), str):
+        prop["characteristics"] = json.loads(prop["characteristics"])
+    return prop
+
+def load_properties(path):
+    """Read properties from .csv, .json (array or {"properties": [...]}) or .ndjson"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            return [_coerce(row) for row in csv.DictReader(f)]
+        if path.endswith((".ndjson", ".jsonl")):
+            return [json.loads(line) for line in f if line.strip()]
+        data = json.load(f)
+    return data["properties"] if isinstance(data, dict) else data
+
+def login(username, password):
+    """Admin JWT from /api/auth/login"""
+    result = make_request("POST", "/auth/login", {"username": username, "password": password})
+    if result['status_code'] != 200 or 'token' not in result['data']:
+        raise RuntimeError(f"Login failed: {result['data'].get('error') or result.get('error')}")
+    return result['data']['token']
+
+def stream_batch(properties, token, include_market=False, timeout=STREAM_TIMEOUT):
+    """POST one chunk and yield each NDJSON line as a dict as soon as it arrives"""
+    response = get_session().post(
+        BATCH_ENDPOINT,
+        json={"properties": properties, "includeMarket": include_market},
+        headers={"Authorization": f"Bearer {token}"},
+        stream=True,
+        timeout=timeout,
+    )
+    with response:
+        if response.status_code != 200:
+            try:
+                error = response.json().get('error')
+            except ValueError:
+                error = response.text
+            raise RuntimeError(f"Batch request failed ({response.status_code}): {error}")
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+def estimate_all(properties, token, chunk_size=DEFAULT_CHUNK_SIZE, include_market=False, stream=stream_batch):
+    """Yield results for every property, chunk by chunk.
+
+    `index` is rewritten to the position in `properties`; the per-chunk
+    summary lines are folded into the final returned totals.
+    """
+    totals = {'total': 0, 'estimated': 0, 'failed': 0, 'groups': 0}
+    for offset in range(0, len(properties), chunk_size):
+        chunk = properties[offset:offset + chunk_size]
+        for line in stream(chunk, token, include_market):
+            if 'summary' in line:
+                for key in totals:
+                    totals[key] += line['summary'].get(key, 0)
+            elif 'index' in line:
+                yield {**line, 'index': line['index'] + offset}
+            else:
+                raise RuntimeError(line.get('error', 'Unexpected batch response line'))
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch property estimation (NDJSON output)")
+    parser.add_argument("input", help="properties file (.csv, .json or .ndjson)")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="properties per request (default: %(default)s)")
+    parser.add_argument("--include-market", action="store_true",
+                        help="attach cached market snapshots (never scrapes during a batch)")
+    parser.add_argument("--token", default=os.environ.get("ADMIN_TOKEN"), help="admin JWT")
+    parser.add_argument("--username", default=os.environ.get("ADMIN_USERNAME"))
+    parser.add_argument("--password", default=os.environ.get("ADMIN_PASSWORD"))
+    args = parser.parse_args()
+
+    properties = load_properties(args.input)
+    token = args.token
+    if not token:
+        if not (args.username and args.password):
+            parser.error("--token or --username/--password (ADMIN_USERNAME/ADMIN_PASSWORD) required")
+        token = login(args.username, args.password)
+
+    print(f"📦 Estimating {len(properties)} properties on {BASE_URL} "
+          f"(chunks of {args.chunk_size})", file=sys.stderr)
+    start = time.perf_counter()
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    results = estimate_all(properties, token, args.chunk_size, args.include_market)
+    written = 0
+    try:
+        while True:
+            try:
+                line = next(results)
+            except StopIteration as done:
+                totals = done.value
+                break
+            out.write(json.dumps(line, ensure_ascii=False) + "\n")
+            written += 1
+            if written % 1000 == 0:
+                print(f"  {written}/{len(properties)} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {totals['estimated']} estimated, {totals['failed']} failed, "
+          f"{totals['groups']} spatial groups in {elapsed:.1f}s "
+          f"({len(properties) / elapsed if elapsed else 0:.0f} properties/s)", file=sys.stderr)
+    return 0 if totals['failed'] == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Brevo transactional SMS and contacts APIs
+Lets the real OTP send path (insert, SMS call, cleanup on failure) run under
+test and under load without spending SMS credits.
+
+Point the Next.js server at it with:
+    BREVO_API_URL=http://localhost:4010/v3 BREVO_API_KEY=test yarn dev
+
+Every SMS is recorded so tests can read the real OTP code, either in-process
+(BrevoMock.latest_code) or over HTTP (GET /_mock/messages?recipient=+33...).
+"""
+
+import argparse
+import asyncio
+import itertools
+import re
+import time
+from urllib.parse import parse_qs, unquote, urlparse
+
+from mock_server import MockServer, Profile
+
+DEFAULT_PORT = 4010
+OTP_CODE_PATTERN = re.compile(r"\b(\d{6})\b")
+
+class BrevoMock(MockServer):
+    """Asyncio HTTP server emulating the parts of the Brevo API we call"""
+
+    name = "brevo"
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, profile=None, seed=None):
+        super().__init__(host, port, profile or Profile(error_status=402), seed)
+        self.messages = []
+        self.contacts = {}
+        self.references = itertools.count(1)
+        self.contact_ids = itertools.count(1)
+
+    @property
+    def api_url(self):
+        """Value to use for BREVO_API_URL on the Next.js side"""
+        return f"{self.base_url}/v3"
+
+    # ------------------------------------------------------------------
+    # Recorded data
+    # ------------------------------------------------------------------
+
+    def get_messages(self, recipient=None):
+        with self.lock:
+            return [m for m in self.messages if recipient is None or m['recipient'] == recipient]
+
+    def latest_code(self, recipient):
+        """Most recent OTP code sent to an E.164 number, or None"""
+        messages = self.get_messages(recipient)
+        return messages[-1]['code'] if messages else None
+
+    def reset(self):
+        with self.lock:
+            self.messages.clear()
+            self.contacts.clear()
+
+    # ------------------------------------------------------------------
+    # Brevo API emulation
+    # ------------------------------------------------------------------
+
+    def error_payload(self, status):
+        if status == 402:
+            return {'code': 'not_enough_credits', 'message': 'Not enough credits'}
+        return super().error_payload(status)
+
+    async def _send_sms(self, body):
+        if not body.get('recipient') or not body.get('content'):
+            return 400, {'code': 'missing_parameter', 'message': 'recipient and content are required'}
+        failure = await self.apply_profile()
+        if failure:
+            return failure
+        match = OTP_CODE_PATTERN.search(body['content'])
+        reference = f"mock-{next(self.references)}"
+        with self.lock:
+            self.messages.append({
+                'reference': reference,
+                'recipient': body['recipient'],
+                'sender': body.get('sender'),
+                'content': body['content'],
+                'code': match.group(1) if match else None,
+                'received_at': time.time(),
+            })
+        return 201, {'reference': reference, 'messageId': reference, 'smsCount': 1,
+                     'usedCredits': 1, 'remainingCredits': 1000}
+
+    async def _create_contact(self, body):
+        email = body.get('email')
+        if not email:
+            return 400, {'code': 'missing_parameter', 'message': 'email is required'}
+        failure = await self.apply_profile()
+        if failure:
+            return failure
+        with self.lock:
+            existing = self.contacts.get(email)
+            if existing and not body.get('updateEnabled'):
+                return 400, {'code': 'duplicate_parameter', 'message': 'Contact already exist'}
+            if existing:
+                existing['attributes'].update(body.get('attributes') or {})
+                existing['listIds'] = body.get('listIds', existing['listIds'])
+                return 204, None
+            contact_id = next(self.contact_ids)
+            self.contacts[email] = {
+                'id': contact_id,
+                'email': email,
+                'attributes': dict(body.get('attributes') or {}),
+                'listIds': body.get('listIds', []),
+            }
+        return 201, {'id': contact_id}
+
+    async def _update_contact(self, email, body):
+        failure = await self.apply_profile()
+        if failure:
+            return failure
+        with self.lock:
+            contact = self.contacts.get(email)
+            if not contact:
+                return 404, {'code': 'document_not_found', 'message': 'Contact does not exist'}
+            contact['attributes'].update(body.get('attributes') or {})
+            if 'listIds' in body:
+                contact['listIds'] = body['listIds']
+        return 204, None
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    async def handle(self, method, target, headers, body):
+        url = urlparse(target)
+        path = url.path.rstrip('/')
+        query = parse_qs(url.query)
+
+        # Control API for tests
+        if path == '/_mock/messages':
+            if method == 'DELETE':
+                self.reset()
+                return 204, None
+            recipient = query.get('recipient', [None])[0]
+            return 200, {'messages': self.get_messages(recipient)}
+        if path == '/_mock/contacts' and method == 'GET':
+            with self.lock:
+                return 200, {'contacts': list(self.contacts.values())}
+        if path == '/_mock/profile':
+            if method == 'POST':
+                self.profile.update(**(body or {}))
+            return 200, self.profile.as_dict()
+
+        # Brevo API
+        if not headers.get('api-key'):
+            return 401, {'code': 'unauthorized', 'message': 'Key not found'}
+        if path == '/v3/transactionalSMS/sms' and method == 'POST':
+            return await self._send_sms(body or {})
+        if path == '/v3/contacts' and method == 'POST':
+            return await self._create_contact(body or {})
+        if path.startswith('/v3/contacts/') and method == 'PUT':
+            return await self._update_contact(unquote(path[len('/v3/contacts/'):]), body or {})
+        return 404, {'code': 'not_found', 'message': f'No mock for {method} {path}'}
+
+def fetch_latest_code(mock_url, recipient):
+    """Read the last OTP code sent to `recipient` from a mock running elsewhere"""
+    from api_client import make_request
+
+    result = make_request("GET", f"{mock_url}/_mock/messages", params={'recipient': recipient}, timeout=5)
+    if not result['success'] or result['status_code'] != 200:
+        return None
+    messages = result['data'].get('messages', [])
+    return messages[-1]['code'] if messages else None
+
+def fetch_contact(mock_url, email):
+    """Read the contact stored for `email` from a mock running elsewhere, or None"""
+    from api_client import make_request
+
+    result = make_request("GET", f"{mock_url}/_mock/contacts", timeout=5)
+    if not result['success'] or result['status_code'] != 200:
+        return None
+    return next((c for c in result['data'].get('contacts', []) if c['email'] == email), None)
+
+def ensure_running(mock_url):
+    """Start an in-process mock at `mock_url` unless one already answers there.
+
+    Returns the BrevoMock started here, or None when an external one is used.
+    """
+    from api_client import make_request
+
+    probe = make_request("GET", f"{mock_url}/_mock/profile", timeout=2)
+    if probe['success'] and probe['status_code'] == 200:
+        return None
+    url = urlparse(mock_url)
+    return BrevoMock(url.hostname, url.port or DEFAULT_PORT).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Brevo SMS/contacts stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0, help="base upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="extra random latency (uniform)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls that fail")
+    parser.add_argument("--error-status", type=int, default=402,
+                        help="status for failed calls (402 = not enough credits)")
+    parser.add_argument("--max-rps", type=float, default=None, help="throttle: 429 above this rate")
+    args = parser.parse_args()
+
+    mock = BrevoMock(args.host, args.port, Profile(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        max_rps=args.max_rps,
+    ))
+    print(f"📡 Brevo mock listening on {mock.base_url} (BREVO_API_URL={mock.base_url}/v3)")
+    try:
+        asyncio.run(mock.serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
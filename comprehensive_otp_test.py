@@ -4,15 +4,13 @@ Comprehensive OTP Testing - Accounts for Brevo credit limitations
 Tests all functionality that can be verified without actual SMS sending
 """
 
-import requests
 import json
 import time
 import sys
 from datetime import datetime
 
-# Configuration
-BASE_URL = "http://localhost:3000"
-API_BASE = f"{BASE_URL}/api"
+from api_client import BASE_URL, API_BASE, make_request
+
 BYPASS_PHONE = "0698793430"
 
 # Colors for output
@@ -36,38 +34,6 @@ def test_result(test_name, success, details=""):
         log(f"    {details}", Colors.BLUE)
     return success
 
-def make_request(method, endpoint, data=None, headers=None):
-    """Make HTTP request with error handling"""
-    url = f"{API_BASE}{endpoint}"
-    try:
-        if method == "GET":
-            response = requests.get(url, headers=headers, timeout=10)
-        elif method == "POST":
-            response = requests.post(url, json=data, headers=headers, timeout=10)
-        elif method == "DELETE":
-            response = requests.delete(url, headers=headers, timeout=10)
-        
-        return {
-            'success': True,
-            'status_code': response.status_code,
-            'data': response.json() if response.content else {},
-            'response': response
-        }
-    except requests.exceptions.RequestException as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'status_code': None,
-            'data': {}
-        }
-    except json.JSONDecodeError as e:
-        return {
-            'success': False,
-            'error': f"JSON decode error: {str(e)}",
-            'status_code': response.status_code if 'response' in locals() else None,
-            'data': {}
-        }
-
 def test_send_otp_comprehensive():
     """Test send-otp endpoint comprehensively"""
     log("🧪 Testing Send OTP Endpoint", Colors.BOLD)
@@ -0,0 +1,182 @@
+import { getCollection } from './mongodb.js';
+import { encodeGeohash } from './dvf-geo.js';
+import { calculateDistance } from './dvf.js';
+import { selectAdaptiveComparables, toCandidateColumns } from './dvf-enhanced.js';
+import { ESTIMATE_SEARCH, marketDelta, priceFromComparables } from './estimation.js';
+import { marketSnapshotKey, peekMarketSnapshot } from './market-snapshots.js';
+
+// Estimation en lot (portefeuilles, listes de leads)
+// Les biens sont regroupés par cellule geohash et par type : chaque groupe charge une seule
+// fois les ventes DVF couvrant tous ses biens, puis la sélection adaptative et les
+// statistiques sont rejouées en mémoire pour chaque bien (selectAdaptiveComparables).
+// Les groupes sont traités par un pool borné et les résultats produits au fil de l'eau.
+//
+// Le marché n'est jamais scrapé pendant un lot : seuls les instantanés existants sont lus
+// (peekMarketSnapshot), les clés manquantes sont rafraîchies en arrière-plan.
+
+export const BATCH_MAX_PROPERTIES = parseInt(process.env.BATCH_MAX_PROPERTIES || '10000', 10);
+const GROUP_CONCURRENCY = parseInt(process.env.BATCH_GROUP_CONCURRENCY || '4', 10);
+
+// Précision 6 : cellules d'environ 1,2 km x 0,6 km
+const GROUP_PRECISION = 6;
+const EARTH_RADIUS_METERS = 6378100;
+
+const CANDIDATE_PROJECTION = {
+  _id: 1, location: 1, date_mutation: 1, date_epoch_day: 1, surface_reelle_bati: 1, prix_m2: 1
+};
+
+// Message d'erreur pour un bien invalide, null s'il est valide
+export function validateBatchProperty(property) {
+  if (!property || typeof property !== 'object') return 'Property must be an object';
+  const { lat, lng, type, surface } = property;
+  if (!Number.isFinite(lat) || !Number.isFinite(lng)) return 'lat and lng must be numbers';
+  if (type !== 'appartement' && type !== 'maison') return "type must be 'appartement' or 'maison'";
+  if (!Number.isFinite(surface) || surface <= 0) return 'surface must be a positive number';
+  return null;
+}
+
+function groupProperties(entries) {
+  const groups = new Map();
+  for (const entry of entries) {
+    const { lat, lng, type } = entry.property;
+    const key = `${encodeGeohash(lat, lng, GROUP_PRECISION)}|${type}`;
+    if (!groups.has(key)) groups.set(key, []);
+    groups.get(key).push(entry);
+  }
+  return [...groups.values()];
+}
+
+// Ventes couvrant tous les biens du groupe : cercle autour du centroïde élargi du rayon max
+async function fetchGroupCandidates(collection, members) {
+  const { type } = members[0].property;
+  const centroidLat = members.reduce((sum, m) => sum + m.property.lat, 0) / members.length;
+  const centroidLng = members.reduce((sum, m) => sum + m.property.lng, 0) / members.length;
+  const spread = Math.max(...members.map(m => calculateDistance(centroidLat, centroidLng, m.property.lat, m.property.lng)));
+  const reach = spread + Math.max(ESTIMATE_SEARCH.initialRadiusMeters, ESTIMATE_SEARCH.maxRadiusMeters) + 10;
+
+  const surfaces = members.map(m => m.property.surface);
+  const cutoff = new Date();
+  cutoff.setMonth(cutoff.getMonth() - Math.max(ESTIMATE_SEARCH.months, ESTIMATE_SEARCH.maxMonths));
+
+  return collection.find(
+    {
+      location: { $geoWithin: { $centerSphere: [[centroidLng, centroidLat], reach / EARTH_RADIUS_METERS] } },
+      type_local: type,
+      date_mutation: { $gte: cutoff.toISOString().split('T')[0] },
+      surface_reelle_bati: { $gte: Math.min(...surfaces) * 0.75, $lte: Math.max(...surfaces) * 1.25 },
+      prix_m2: { $gt: 0 }
+    },
+    { projection: CANDIDATE_PROJECTION }
+  ).toArray();
+}
+
+async function estimateMember({ index, property }, candidates, columns, { includeMarket, marketCache }) {
+  const { id = null, address, lat, lng, type, surface, characteristics } = property;
+
+  const distances = new Float64Array(candidates.length);
+  for (let i = 0; i < candidates.length; i++) {
+    const [saleLng, saleLat] = candidates[i].location.coordinates;
+    distances[i] = calculateDistance(lat, lng, saleLat, saleLng);
+  }
+
+  const selection = selectAdaptiveComparables(columns, distances, { surface, ...ESTIMATE_SEARCH, quiet: true });
+  const dvf = {
+    count: selection.comparables.length,
+    radius: selection.radius,
+    months: selection.months,
+    stats: selection.stats,
+    warning: selection.warning
+  };
+  const { adjustments, finalPrice } = priceFromComparables(dvf, { type, surface, characteristics });
+
+  let market = null;
+  if (includeMarket && address) {
+    // Un instantané est partagé par code postal / type / tranche : une lecture par clé et par lot
+    const params = { address, lat, lng, type, surface };
+    const key = marketSnapshotKey(params);
+    if (key && !marketCache.has(key)) {
+      marketCache.set(key, peekMarketSnapshot(params).catch(() => null));
+    }
+    market = key ? await marketCache.get(key) : null;
+  }
+
+  return {
+    index,
+    id,
+    dvf,
+    adjustments,
+    finalPrice,
+    market: market && { stats: market.stats, fetchedAt: market.fetchedAt, stale: market.stale },
+    delta: marketDelta(adjustments, market?.stats)
+  };
+}
+
+// Un groupe ne rejette jamais : une erreur est reportée sur chacun de ses biens
+async function estimateGroup(collection, members, options) {
+  try {
+    const candidates = await fetchGroupCandidates(collection, members);
+    const columns = toCandidateColumns(candidates);
+    const results = [];
+    for (const member of members) {
+      results.push(await estimateMember(member, candidates, columns, options));
+    }
+    return results;
+  } catch (error) {
+    console.error('[Batch] Group estimation failed:', error.message);
+    return members.map(({ index, property }) => ({ index, id: property.id ?? null, error: 'Estimation failed' }));
+  }
+}
+
+// Générateur de résultats (ordre d'achèvement ; `index` renvoie à la position dans la requête),
+// suivi d'une ligne { summary }
+export async function* estimateBatch(properties, { includeMarket = false, concurrency = GROUP_CONCURRENCY } = {}) {
+  const startedAt = Date.now();
+  const valid = [];
+  let failed = 0;
+
+  for (let index = 0; index < properties.length; index++) {
+    const error = validateBatchProperty(properties[index]);
+    if (error) {
+      failed++;
+      yield { index, id: properties[index]?.id ?? null, error };
+    } else {
+      valid.push({ index, property: properties[index] });
+    }
+  }
+
+  const groups = groupProperties(valid);
+  const collection = await getCollection('dvf_sales');
+  const options = { includeMarket, marketCache: new Map() };
+  const running = new Map();
+  let next = 0;
+  let estimated = 0;
+
+  const launch = () => {
+    const groupIndex = next++;
+    running.set(groupIndex, estimateGroup(collection, groups[groupIndex], options)
+      .then(results => ({ groupIndex, results })));
+  };
+
+  while (next < groups.length && running.size < concurrency) launch();
+
+  while (running.size > 0) {
+    const { groupIndex, results } = await Promise.race(running.values());
+    running.delete(groupIndex);
+    if (next < groups.length) launch();
+
+    for (const result of results) {
+      if (result.error) failed++; else estimated++;
+      yield result;
+    }
+  }
+
+  yield {
+    summary: {
+      total: properties.length,
+      estimated,
+      failed,
+      groups: groups.length,
+      elapsedMs: Date.now() - startedAt
+    }
+  };
+}
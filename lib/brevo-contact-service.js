@@ -3,10 +3,15 @@
  * Crée et met à jour les contacts avec leurs informations détaillées
  */
 
+import { BREVO_API_URL } from './otp-service.js';
+
 /**
  * Crée ou met à jour un contact dans Brevo avec toutes ses informations
  * @param {Object} contactData - Données du contact
- * @returns {Promise<{success: boolean, contactId?: number, error?: string}>}
+ * En cas d'échec, `status` (code HTTP Brevo, absent pour une erreur réseau) et
+ * `retryAfter` (en-tête Retry-After) permettent à la file de synchronisation
+ * de distinguer les erreurs définitives des erreurs à réessayer.
+ * @returns {Promise<{success: boolean, contactId?: number, error?: string, status?: number, retryAfter?: string}>}
  */
 export async function createOrUpdateBrevoContact(contactData) {
   const apiKey = process.env.BREVO_API_KEY;
@@ -98,7 +103,7 @@ export async function createOrUpdateBrevoContact(contactData) {
     
     // Appel à l'API Brevo pour créer/mettre à jour le contact
     console.log('   📤 Envoi à Brevo API...');
-    const response = await fetch('https://api.brevo.com/v3/contacts', {
+    const response = await fetch(`${BREVO_API_URL}/contacts`, {
       method: 'POST',
       headers: {
         'accept': 'application/json',
@@ -110,7 +115,11 @@ export async function createOrUpdateBrevoContact(contactData) {
     
     console.log(`   📥 Réponse Brevo: Status ${response.status}`);
     
-    if (response.ok) {
+    if (response.status === 204) {
+      // updateEnabled: contact existant mis à jour, pas de corps de réponse
+      console.log(`✅ Contact Brevo mis à jour : ${email}`);
+      return { success: true };
+    } else if (response.ok) {
       const data = await response.json();
       console.log(`✅ Contact Brevo créé : ${email} (ID: ${data.id})`);
       return { success: true, contactId: data.id };
@@ -121,7 +130,7 @@ export async function createOrUpdateBrevoContact(contactData) {
       if (errorData.code === 'duplicate_parameter' || (errorData.message && errorData.message.includes('already exist'))) {
         // Le contact existe déjà, on fait un update
         console.log(`ℹ️  Contact existe déjà, mise à jour : ${email}`);
-        const updateResponse = await fetch(`https://api.brevo.com/v3/contacts/${encodeURIComponent(email)}`, {
+        const updateResponse = await fetch(`${BREVO_API_URL}/contacts/${encodeURIComponent(email)}`, {
           method: 'PUT',
           headers: {
             'accept': 'application/json',
@@ -137,17 +146,27 @@ export async function createOrUpdateBrevoContact(contactData) {
         } else {
           const updateErrorData = await updateResponse.json();
           console.error('Erreur mise à jour contact Brevo:', updateErrorData);
-          return { success: false, error: updateErrorData.message || 'Update failed' };
+          return {
+            success: false,
+            error: updateErrorData.message || 'Update failed',
+            status: updateResponse.status,
+            retryAfter: updateResponse.headers.get('retry-after')
+          };
         }
       } else {
         // Autre erreur 400 (attribut manquant, format invalide, etc.)
         console.error('Erreur création contact Brevo:', errorData);
-        return { success: false, error: errorData.message || 'Failed to create contact' };
+        return { success: false, error: errorData.message || 'Failed to create contact', status: 400 };
       }
     } else {
-      const errorData = await response.json();
+      const errorData = await response.json().catch(() => ({}));
       console.error('Erreur création contact Brevo:', errorData);
-      return { success: false, error: errorData.message || 'Failed to create contact' };
+      return {
+        success: false,
+        error: errorData.message || 'Failed to create contact',
+        status: response.status,
+        retryAfter: response.headers.get('retry-after')
+      };
     }
   } catch (error) {
     console.error('Erreur lors de la synchronisation Brevo:', error);
@@ -0,0 +1,281 @@
+import { getCollection } from './mongodb.js';
+import { createOrUpdateBrevoContact } from './brevo-contact-service.js';
+import { normalizePhoneNumber } from './otp-service.js';
+
+// Synchronisation asynchrone des contacts Brevo (outbox)
+// Le lead est enregistré avec syncStatus: 'sync_pending' dans la même écriture que ses
+// données : la réponse de POST /api/leads ne dépend plus de Brevo. Un worker en tâche de
+// fond réclame les leads en attente par lots et les envoie à Brevo :
+//
+// - réclamation atomique (findOneAndUpdate + bail syncLockedUntil) : plusieurs instances
+//   peuvent tourner sans envoyer deux fois le même lead
+// - débit plafonné (BREVO_SYNC_RATE_PER_SEC) et concurrence bornée
+// - 429 : tout le worker se met en pause jusqu'à Retry-After, la tentative n'est pas comptée
+// - erreur réseau / 5xx : nouvel essai avec backoff exponentiel
+// - autre 4xx ou BREVO_SYNC_MAX_ATTEMPTS atteint : lettre morte (syncStatus: 'sync_dead')
+//
+// Statuts : sync_pending -> synced | sync_dead
+
+export const SYNC_PENDING = 'sync_pending';
+export const SYNC_DONE = 'synced';
+export const SYNC_DEAD = 'sync_dead';
+
+const MAX_ATTEMPTS = parseInt(process.env.BREVO_SYNC_MAX_ATTEMPTS || '8', 10);
+const BATCH_SIZE = parseInt(process.env.BREVO_SYNC_BATCH_SIZE || '20', 10);
+const CONCURRENCY = parseInt(process.env.BREVO_SYNC_CONCURRENCY || '2', 10);
+const RATE_PER_SEC = parseFloat(process.env.BREVO_SYNC_RATE_PER_SEC || '5');
+const POLL_MS = parseInt(process.env.BREVO_SYNC_POLL_MS || '5000', 10);
+const BACKOFF_BASE_MS = 30 * 1000;
+const BACKOFF_MAX_MS = 60 * 60 * 1000;
+const RATE_LIMIT_PAUSE_MS = 60 * 1000;
+const LEASE_MS = 2 * 60 * 1000;
+
+// Conservé sur globalThis pour survivre au rechargement des modules en dev
+const worker = globalThis.__brevoSyncWorker || (globalThis.__brevoSyncWorker = {
+  timer: null,
+  draining: null,
+  pausedUntil: 0,
+  nextCallAt: 0,
+  synced: 0,
+  retried: 0,
+  dead: 0
+});
+
+let indexesReady = null;
+
+async function getLeadsCollection() {
+  const collection = await getCollection('leads');
+  if (!indexesReady) {
+    indexesReady = collection.createIndex({ syncStatus: 1, syncNextAttemptAt: 1 }).catch(error => {
+      indexesReady = null;
+      throw error;
+    });
+  }
+  await indexesReady;
+  return collection;
+}
+
+// Un contact Brevo n'est créé que si le lead porte toutes ces informations
+export function needsContactSync(leadData) {
+  return Boolean(leadData.email && leadData.name && leadData.estimationReason);
+}
+
+// Champs de file à ajouter au lead à l'insertion
+export function pendingSyncFields(now = new Date()) {
+  return { syncStatus: SYNC_PENDING, syncAttempts: 0, syncNextAttemptAt: now };
+}
+
+function contactFromLead(lead) {
+  return {
+    email: lead.email,
+    name: lead.name,
+    // Brevo attend un numéro au format E.164 (+33...)
+    phone: lead.phone ? normalizePhoneNumber(lead.phone) : '',
+    estimationReason: lead.estimationReason, // "Acheter" ou "Vendre"
+    property: lead.property,
+    estimation: lead.estimation,
+    consent: lead.consent
+  };
+}
+
+// Délai avant le prochain essai (exponentiel, avec gigue de ±20 %)
+export function backoffDelay(attempts) {
+  const delay = Math.min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * 2 ** Math.max(0, attempts - 1));
+  return Math.round(delay * (0.8 + Math.random() * 0.4));
+}
+
+// Retry-After : secondes ou date HTTP
+function retryAfterMs(value) {
+  if (!value) return RATE_LIMIT_PAUSE_MS;
+  const seconds = Number(value);
+  if (Number.isFinite(seconds)) return Math.max(1000, seconds * 1000);
+  const date = Date.parse(value);
+  return Number.isFinite(date) ? Math.max(1000, date - Date.now()) : RATE_LIMIT_PAUSE_MS;
+}
+
+// 'synced' | 'rate_limited' | 'retry' | 'dead'
+export function classifySyncResult(result, attempts, maxAttempts = MAX_ATTEMPTS) {
+  if (result.success) return 'synced';
+  if (result.status === 429) return 'rate_limited';
+  const transient = result.status === undefined || result.status === 408 || result.status >= 500;
+  return transient && attempts < maxAttempts ? 'retry' : 'dead';
+}
+
+// Réclamer jusqu'à `limit` leads dus (chaque réclamation compte une tentative)
+async function claimBatch(collection, limit) {
+  const claimed = [];
+  while (claimed.length < limit) {
+    const now = new Date();
+    const lead = await collection.findOneAndUpdate(
+      {
+        syncStatus: SYNC_PENDING,
+        syncNextAttemptAt: { $lte: now },
+        $or: [{ syncLockedUntil: { $exists: false } }, { syncLockedUntil: { $lt: now } }]
+      },
+      { $set: { syncLockedUntil: new Date(now.getTime() + LEASE_MS) }, $inc: { syncAttempts: 1 } },
+      { sort: { syncNextAttemptAt: 1 }, returnDocument: 'after' }
+    );
+    if (!lead) break;
+    claimed.push(lead);
+  }
+  return claimed;
+}
+
+// Espacer les appels Brevo de 1 / BREVO_SYNC_RATE_PER_SEC, toutes tâches confondues
+async function takeRateSlot() {
+  const now = Date.now();
+  const wait = Math.max(0, worker.nextCallAt - now);
+  worker.nextCallAt = Math.max(now, worker.nextCallAt) + 1000 / RATE_PER_SEC;
+  if (wait > 0) await new Promise(resolve => setTimeout(resolve, wait));
+}
+
+async function syncLead(collection, lead) {
+  // Une pause 429 survenue pendant le lot : rendre le lead sans appeler Brevo
+  if (Date.now() < worker.pausedUntil) {
+    await collection.updateOne(
+      { _id: lead._id },
+      { $set: { syncNextAttemptAt: new Date(worker.pausedUntil) }, $inc: { syncAttempts: -1 }, $unset: { syncLockedUntil: '' } }
+    );
+    return;
+  }
+
+  await takeRateSlot();
+  const result = await createOrUpdateBrevoContact(contactFromLead(lead));
+  const outcome = classifySyncResult(result, lead.syncAttempts);
+  const now = new Date();
+
+  if (outcome === 'synced') {
+    worker.synced++;
+    await collection.updateOne(
+      { _id: lead._id },
+      {
+        $set: { syncStatus: SYNC_DONE, syncedAt: now.toISOString(), ...(result.contactId && { brevoContactId: result.contactId }) },
+        $unset: { syncLockedUntil: '', syncNextAttemptAt: '', syncError: '' }
+      }
+    );
+    return;
+  }
+
+  if (outcome === 'rate_limited') {
+    worker.pausedUntil = Math.max(worker.pausedUntil, now.getTime() + retryAfterMs(result.retryAfter));
+    console.warn(`[Brevo sync] Rate limited, pausing until ${new Date(worker.pausedUntil).toISOString()}`);
+    await collection.updateOne(
+      { _id: lead._id },
+      {
+        $set: { syncNextAttemptAt: new Date(worker.pausedUntil), syncError: result.error },
+        $inc: { syncAttempts: -1 },
+        $unset: { syncLockedUntil: '' }
+      }
+    );
+    return;
+  }
+
+  if (outcome === 'retry') {
+    worker.retried++;
+    await collection.updateOne(
+      { _id: lead._id },
+      {
+        $set: { syncNextAttemptAt: new Date(now.getTime() + backoffDelay(lead.syncAttempts)), syncError: result.error },
+        $unset: { syncLockedUntil: '' }
+      }
+    );
+    return;
+  }
+
+  worker.dead++;
+  console.error(`[Brevo sync] Lead ${lead.id} dead-lettered after ${lead.syncAttempts} attempt(s): ${result.error}`);
+  await collection.updateOne(
+    { _id: lead._id },
+    {
+      $set: { syncStatus: SYNC_DEAD, syncError: result.error, syncDeadAt: now.toISOString() },
+      $unset: { syncLockedUntil: '', syncNextAttemptAt: '' }
+    }
+  );
+}
+
+async function drain() {
+  const collection = await getLeadsCollection();
+  let processed = 0;
+
+  while (Date.now() >= worker.pausedUntil) {
+    const batch = await claimBatch(collection, BATCH_SIZE);
+    if (batch.length === 0) break;
+
+    // Pool borné sur le lot
+    let next = 0;
+    const runners = Array.from({ length: Math.min(CONCURRENCY, batch.length) }, async () => {
+      while (next < batch.length) {
+        const lead = batch[next++];
+        try {
+          await syncLead(collection, lead);
+        } catch (error) {
+          // Le bail expire : le lead sera réclamé à nouveau
+          console.error(`[Brevo sync] Lead ${lead.id} failed:`, error.message);
+        }
+      }
+    });
+    await Promise.all(runners);
+    processed += batch.length;
+  }
+
+  return processed;
+}
+
+// Une passe sur la file (un seul drainage à la fois dans ce processus)
+// Sans BREVO_API_KEY, les leads restent en attente jusqu'à la configuration de la clé.
+export function drainBrevoSyncQueue() {
+  if (!process.env.BREVO_API_KEY) return Promise.resolve(0);
+  if (!worker.draining) {
+    worker.draining = drain().finally(() => {
+      worker.draining = null;
+    });
+  }
+  return worker.draining;
+}
+
+function scheduleDrain(delayMs) {
+  clearTimeout(worker.timer);
+  worker.timer = setTimeout(async () => {
+    try {
+      await drainBrevoSyncQueue();
+    } catch (error) {
+      console.error('[Brevo sync] Drain failed:', error.message);
+    }
+    scheduleDrain(Math.max(POLL_MS, worker.pausedUntil - Date.now()));
+  }, delayMs);
+  worker.timer.unref?.();
+}
+
+// Démarrer le worker (idempotent) et drainer immédiatement : appelé après chaque lead enregistré
+export function nudgeBrevoSyncWorker() {
+  scheduleDrain(Math.max(0, worker.pausedUntil - Date.now()));
+}
+
+export function stopBrevoSyncWorker() {
+  clearTimeout(worker.timer);
+  worker.timer = null;
+}
+
+// Remettre les lettres mortes dans la file (après correction de la cause)
+export async function requeueDeadContacts() {
+  const collection = await getLeadsCollection();
+  const { modifiedCount } = await collection.updateMany(
+    { syncStatus: SYNC_DEAD },
+    { $set: pendingSyncFields(), $unset: { syncDeadAt: '' } }
+  );
+  return modifiedCount;
+}
+
+export async function getBrevoSyncStats() {
+  const collection = await getLeadsCollection();
+  const [pending, dead] = await Promise.all([
+    collection.countDocuments({ syncStatus: SYNC_PENDING }),
+    collection.countDocuments({ syncStatus: SYNC_DEAD })
+  ]);
+  return {
+    pending,
+    dead,
+    pausedUntil: worker.pausedUntil > Date.now() ? new Date(worker.pausedUntil).toISOString() : null,
+    processed: { synced: worker.synced, retried: worker.retried, dead: worker.dead }
+  };
+}
@@ -0,0 +1,193 @@
+import puppeteer from 'puppeteer';
+
+// Navigateur headless partagé entre les requêtes
+// - un seul Chromium, lancé à la demande et relancé s'il se déconnecte
+// - nombre de pages borné (BROWSER_MAX_PAGES), pages recyclées entre les scrapes
+// - images, polices, CSS et médias bloqués : seul le HTML et les scripts sont chargés
+// - le navigateur est fermé après BROWSER_IDLE_MS sans activité
+
+const MAX_PAGES = parseInt(process.env.BROWSER_MAX_PAGES || '2', 10);
+const IDLE_MS = parseInt(process.env.BROWSER_IDLE_MS || String(5 * 60 * 1000), 10);
+// Une page est recréée après ce nombre d'utilisations (fuites mémoire côté page)
+const MAX_PAGE_USES = 50;
+
+const BLOCKED_RESOURCES = new Set(['image', 'font', 'stylesheet', 'media']);
+const USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36';
+
+const LAUNCH_OPTIONS = {
+  headless: 'new',
+  args: [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu'
+  ]
+};
+
+// Conservé sur globalThis pour survivre au rechargement des modules en dev
+const pool = globalThis.__browserPool || (globalThis.__browserPool = {
+  browser: null,
+  launching: null,
+  idlePages: [],
+  busy: 0,
+  waiters: [],
+  idleTimer: null
+});
+
+export class ScrapeTimeoutError extends Error {
+  constructor(deadlineMs) {
+    super(`Scrape exceeded ${deadlineMs}ms deadline`);
+    this.name = 'ScrapeTimeoutError';
+  }
+}
+
+async function getBrowser() {
+  if (pool.browser?.isConnected()) return pool.browser;
+  if (!pool.launching) {
+    pool.launching = puppeteer.launch(LAUNCH_OPTIONS)
+      .then(browser => {
+        browser.on('disconnected', () => {
+          if (pool.browser === browser) {
+            pool.browser = null;
+            pool.idlePages = [];
+          }
+        });
+        pool.browser = browser;
+        return browser;
+      })
+      .finally(() => { pool.launching = null; });
+  }
+  return pool.launching;
+}
+
+async function createPage() {
+  const browser = await getBrowser();
+  const page = await browser.newPage();
+  await page.setUserAgent(USER_AGENT);
+  await page.setRequestInterception(true);
+  page.on('request', req => {
+    if (BLOCKED_RESOURCES.has(req.resourceType())) {
+      req.abort().catch(() => {});
+    } else {
+      req.continue().catch(() => {});
+    }
+  });
+  page.__uses = 0;
+  return page;
+}
+
+// Attendre qu'un slot de page se libère
+// Un appel expiré en file d'attente est marqué annulé et ne reçoit jamais de slot
+function acquireSlot() {
+  if (pool.busy < MAX_PAGES) {
+    pool.busy++;
+    return { ready: Promise.resolve(), cancel: () => {} };
+  }
+  const waiter = { cancelled: false };
+  const ready = new Promise(resolve => { waiter.resolve = resolve; });
+  pool.waiters.push(waiter);
+  return { ready, cancel: () => { waiter.cancelled = true; } };
+}
+
+function releaseSlot() {
+  while (pool.waiters.length > 0) {
+    const next = pool.waiters.shift();
+    if (!next.cancelled) {
+      next.resolve(); // le slot passe directement au suivant
+      return;
+    }
+  }
+  pool.busy--;
+}
+
+async function takePage() {
+  while (pool.idlePages.length > 0) {
+    const page = pool.idlePages.pop();
+    if (!page.isClosed() && pool.browser?.isConnected()) return page;
+  }
+  return createPage();
+}
+
+async function recyclePage(page, reusable) {
+  if (reusable && !page.isClosed() && page.__uses < MAX_PAGE_USES && pool.browser?.isConnected()) {
+    try {
+      // Libérer le DOM de la page précédente
+      await page.goto('about:blank');
+      pool.idlePages.push(page);
+      return;
+    } catch {
+      // page inutilisable : on la ferme
+    }
+  }
+  await page.close().catch(() => {});
+}
+
+function scheduleIdleClose() {
+  clearTimeout(pool.idleTimer);
+  pool.idleTimer = setTimeout(() => {
+    if (pool.busy === 0 && pool.browser) {
+      closeBrowserPool().catch(() => {});
+    }
+  }, IDLE_MS);
+  pool.idleTimer.unref?.();
+}
+
+// Exécuter fn(page) sur une page du pool avec une échéance stricte.
+// À l'échéance la page est fermée (navigation interrompue) et ScrapeTimeoutError est levée.
+export async function withPage(fn, { deadlineMs }) {
+  const deadline = Date.now() + deadlineMs;
+  let timer;
+  const expired = new Promise((_, reject) => {
+    timer = setTimeout(() => reject(new ScrapeTimeoutError(deadlineMs)), deadlineMs);
+  });
+  expired.catch(() => {});
+
+  const slot = acquireSlot();
+  try {
+    await Promise.race([slot.ready, expired]);
+  } catch (error) {
+    clearTimeout(timer);
+    slot.cancel();
+    throw error;
+  }
+
+  let page = null;
+  let reusable = false;
+  const opening = takePage();
+  try {
+    page = await Promise.race([opening, expired]);
+    page.__uses++;
+    page.setDefaultTimeout(Math.max(1, deadline - Date.now()));
+    const result = await Promise.race([fn(page), expired]);
+    reusable = true;
+    return result;
+  } finally {
+    clearTimeout(timer);
+    if (page) {
+      await recyclePage(page, reusable);
+    } else {
+      // Page ouverte après l'échéance : la remettre dans le pool
+      opening.then(late => recyclePage(late, true), () => {});
+    }
+    releaseSlot();
+    scheduleIdleClose();
+  }
+}
+
+export async function closeBrowserPool() {
+  clearTimeout(pool.idleTimer);
+  const browser = pool.browser;
+  pool.browser = null;
+  pool.idlePages = [];
+  if (browser) await browser.close().catch(() => {});
+}
+
+export function getBrowserPoolStats() {
+  return {
+    connected: Boolean(pool.browser?.isConnected()),
+    busyPages: pool.busy,
+    idlePages: pool.idlePages.length,
+    waiting: pool.waiters.length,
+    maxPages: MAX_PAGES
+  };
+}
@@ -0,0 +1,133 @@
+import { encodeGeohash } from './dvf-geo.js';
+import { getAdaptiveComparables } from './dvf-enhanced.js';
+import { getDVFGenerations } from './dvf-generations.js';
+import { getDVFDepartmentBounds } from './dvf-department-stats.js';
+
+// Cache des jeux de comparables DVF
+// Les données DVF ne changent qu'à l'ingestion : une estimation relancée pour la même
+// adresse (caractéristiques modifiées) réutilise le résultat au lieu de refaire $geoNear.
+//
+// - clé : cellule geohash (~38 m x 19 m), type, tranche de surface, fenêtres de recherche
+// - LRU borné en nombre d'entrées et en taille estimée, avec TTL
+// - invalidation par département : une entrée n'est plus servie dès que la génération
+//   d'un des départements que l'enveloppe de recherche peut toucher a changé (voir
+//   dvf-generations.js), y compris un département voisin sans vente dans le résultat.
+//   Faute de contours, l'emprise d'un département est la boîte englobante de ses ventes
+//   (dvf-department-stats.js), élargie du rayon maximal : l'approximation n'invalide que
+//   trop, jamais pas assez. Un département sans emprise connue est toujours retenu, et le
+//   premier chargement d'un département invalide toutes les entrées.
+
+const CACHE_TTL_MS = parseInt(process.env.COMPARABLES_CACHE_TTL_MS || String(6 * 60 * 60 * 1000), 10);
+const CACHE_MAX_ENTRIES = parseInt(process.env.COMPARABLES_CACHE_MAX_ENTRIES || '500', 10);
+const CACHE_MAX_BYTES = parseInt(process.env.COMPARABLES_CACHE_MAX_BYTES || String(20 * 1024 * 1024), 10);
+
+const CELL_PRECISION = 8;
+const CELL_MARGIN_METERS = 50;
+const SURFACE_BUCKET_M2 = 2;
+
+const entries = new Map(); // ordre d'insertion = ordre LRU (le plus ancien en premier)
+let totalBytes = 0;
+let hits = 0;
+let misses = 0;
+
+export function comparablesCacheKey({ lat, lng, type, surface, initialRadiusMeters, maxRadiusMeters, months, maxMonths, minComparables }) {
+  const cell = encodeGeohash(lat, lng, CELL_PRECISION);
+  const surfaceBucket = Math.round(surface / SURFACE_BUCKET_M2);
+  return [cell, type, surfaceBucket, initialRadiusMeters, maxRadiusMeters, months, maxMonths, minComparables].join('|');
+}
+
+const METERS_PER_DEGREE = 111320;
+
+// Départements dont l'emprise, élargie de radiusMeters, contient le point
+function departmentsNear(lat, lng, radiusMeters, departmentBounds) {
+  const dLat = radiusMeters / METERS_PER_DEGREE;
+  const dLng = radiusMeters / (METERS_PER_DEGREE * Math.cos(lat * Math.PI / 180));
+  const near = [];
+  for (const [dept, b] of departmentBounds) {
+    if (!b || (lat >= b.minLat - dLat && lat <= b.maxLat + dLat && lng >= b.minLng - dLng && lng <= b.maxLng + dLng)) {
+      near.push(dept);
+    }
+  }
+  return near;
+}
+
+// Un résultat sans département (aucun département chargé à proximité) est invalidé par
+// n'importe quelle ingestion : un nouveau département peut y apporter des ventes
+function snapshotFor(departments, gens) {
+  if (departments.length === 0) {
+    return { all: gens.all, any: gens.any };
+  }
+  return {
+    all: gens.all,
+    known: Object.keys(gens.departments).length,
+    departments: Object.fromEntries(departments.map(dept => [dept, gens.departments[dept] || 0]))
+  };
+}
+
+function isCurrent(entry, gens) {
+  const { snapshot } = entry;
+  if (snapshot.all !== gens.all) return false;
+  if (snapshot.any !== undefined) return snapshot.any === gens.any;
+  if (Object.keys(gens.departments).length !== snapshot.known) return false;
+  return Object.entries(snapshot.departments).every(([dept, gen]) => (gens.departments[dept] || 0) === gen);
+}
+
+function removeEntry(key) {
+  const entry = entries.get(key);
+  if (entry) {
+    totalBytes -= entry.bytes;
+    entries.delete(key);
+  }
+}
+
+function storeEntry(key, entry) {
+  removeEntry(key);
+  if (entry.bytes > CACHE_MAX_BYTES) return;
+
+  entries.set(key, entry);
+  totalBytes += entry.bytes;
+
+  // Éviction LRU jusqu'à revenir sous les bornes
+  for (const oldestKey of entries.keys()) {
+    if (entries.size <= CACHE_MAX_ENTRIES && totalBytes <= CACHE_MAX_BYTES) break;
+    removeEntry(oldestKey);
+  }
+}
+
+// getAdaptiveComparables avec cache
+export async function getCachedComparables(params) {
+  const key = comparablesCacheKey(params);
+  const gens = await getDVFGenerations();
+  const entry = entries.get(key);
+
+  if (entry && entry.expiresAt > Date.now() && isCurrent(entry, gens)) {
+    // Rafraîchir la position LRU
+    entries.delete(key);
+    entries.set(key, entry);
+    hits++;
+    return entry.value;
+  }
+
+  if (entry) removeEntry(key);
+  misses++;
+
+  // departments ne sert qu'à l'invalidation : il n'est ni mis en cache ni renvoyé au client
+  const [{ departments = [], ...value }, departmentBounds] = await Promise.all([
+    getAdaptiveComparables(params),
+    getDVFDepartmentBounds()
+  ]);
+  // Marge d'une cellule de clé : le point recherché peut être n'importe où dans la cellule
+  const radius = Math.max(params.initialRadiusMeters || 0, params.maxRadiusMeters || 0) + CELL_MARGIN_METERS;
+  const covered = [...new Set([...departments, ...departmentsNear(params.lat, params.lng, radius, departmentBounds)])];
+  storeEntry(key, {
+    value,
+    snapshot: snapshotFor(covered, gens),
+    bytes: JSON.stringify(value).length,
+    expiresAt: Date.now() + CACHE_TTL_MS
+  });
+  return value;
+}
+
+export function getComparablesCacheStats() {
+  return { entries: entries.size, bytes: totalBytes, hits, misses };
+}
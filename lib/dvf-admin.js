@@ -1,5 +1,9 @@
 import { getCollection, connectToDatabase } from './mongodb.js';
-import { ingestDVFDepartment } from './dvf-ingestion.js';
+import { FRENCH_DEPARTMENTS, runIngestion } from './dvf-scheduler.js';
+import { bumpDVFGenerations } from './dvf-generations.js';
+import { clearDVFAggregates } from './dvf-aggregates.js';
+import { listDVFDepartmentStats, clearDVFDepartmentStats } from './dvf-department-stats.js';
+import { clearWatermarks } from './dvf-ingestion.js';
 
 // État global de l'ingestion
 let ingestionState = {
@@ -11,29 +15,14 @@ let ingestionState = {
   failed: 0
 };
 
-// Liste complète des départements français
-const FRENCH_DEPARTMENTS = [
-  '01', '02', '03', '04', '05', '06', '07', '08', '09', '10',
-  '11', '12', '13', '14', '15', '16', '17', '18', '19', '21',
-  '22', '23', '24', '25', '26', '27', '28', '29', '2A', '2B',
-  '30', '31', '32', '33', '34', '35', '36', '37', '38', '39',
-  '40', '41', '42', '43', '44', '45', '46', '47', '48', '49',
-  '50', '51', '52', '53', '54', '55', '56', '57', '58', '59',
-  '60', '61', '62', '63', '64', '65', '66', '67', '68', '69',
-  '70', '71', '72', '73', '74', '75', '76', '77', '78', '79',
-  '80', '81', '82', '83', '84', '85', '86', '87', '88', '89',
-  '90', '91', '92', '93', '94', '95',
-  '971', '972', '973', '974', '976'
-];
-
 // Récupérer les statistiques DVF
+// Lues dans les documents par département tenus à jour par l'ingestion (dvf-department-stats.js),
+// sans parcourir dvf_sales
 export async function getDVFStats() {
   try {
-    const collection = await getCollection('dvf_sales');
-    
-    const total = await collection.countDocuments();
+    const departments = await listDVFDepartmentStats();
     
-    if (total === 0) {
+    if (departments.length === 0) {
       return {
         total: 0,
         byType: {},
@@ -42,39 +31,37 @@ export async function getDVFStats() {
       };
     }
     
-    // Stats par type
-    const byType = await collection.aggregate([
-      { $group: { _id: '$type_local', count: { $sum: 1 } } }
-    ]).toArray();
+    const byType = {};
+    let total = 0;
+    let rowBytes = 0;
+    let lastUpdate = null;
+    for (const dept of departments) {
+      total += dept.count;
+      rowBytes += dept.rowBytes;
+      for (const [type, count] of Object.entries(dept.byType)) {
+        byType[type] = (byType[type] || 0) + count;
+      }
+      if (dept.lastImport && (!lastUpdate || dept.lastImport > lastUpdate)) {
+        lastUpdate = dept.lastImport;
+      }
+    }
     
     // Top 10 départements
-    const byDepartment = await collection.aggregate([
-      { 
-        $group: { 
-          _id: '$code_departement', 
-          count: { $sum: 1 },
-          lastImport: { $max: '$imported_at' }
-        } 
-      },
-      { $sort: { count: -1 } },
-      { $limit: 10 }
-    ]).toArray();
-    
-    // Dernière mise à jour
-    const lastDoc = await collection.findOne({}, { sort: { imported_at: -1 } });
-    
-    return {
-      total,
-      byType: byType.reduce((acc, item) => {
-        acc[item._id] = item.count;
-        return acc;
-      }, {}),
-      byDepartment: byDepartment.map(d => ({
+    const byDepartment = [...departments]
+      .sort((a, b) => b.count - a.count)
+      .slice(0, 10)
+      .map(d => ({
         code: d._id,
         count: d.count,
         lastImport: d.lastImport
-      })),
-      lastUpdate: lastDoc?.imported_at || null
+      }));
+    
+    return {
+      total,
+      byType,
+      byDepartment,
+      lastUpdate,
+      rowBytes
     };
   } catch (error) {
     console.error('Error in getDVFStats:', error);
@@ -87,6 +74,22 @@ export async function getDVFStats() {
   }
 }
 
+// Détail par département pour /api/admin/dvf/status
+export async function getDVFDepartmentStatus() {
+  const departments = await listDVFDepartmentStats();
+  return {
+    total: departments.reduce((sum, d) => sum + d.count, 0),
+    byDepartment: departments.map(d => ({
+      _id: d._id,
+      count: d.count,
+      appartements: d.byType.appartement || 0,
+      maisons: d.byType.maison || 0,
+      lastImport: d.lastImport,
+      rowBytes: d.rowBytes
+    }))
+  };
+}
+
 // Fonction d'ingestion en arrière-plan
 async function runIngestionInBackground() {
   console.log('[DVF] 📦 INGESTION DVF - TOUTE LA FRANCE');
@@ -98,26 +101,26 @@ async function runIngestionInBackground() {
   let successCount = 0;
   let failCount = 0;
   
-  for (let i = 0; i < FRENCH_DEPARTMENTS.length; i++) {
-    const dept = FRENCH_DEPARTMENTS[i];
-    const progress = ((i + 1) / FRENCH_DEPARTMENTS.length * 100).toFixed(1);
-    
-    ingestionState.progress = parseInt(progress);
-    ingestionState.message = `Traitement département ${dept} (${progress}%)`;
-    
-    console.log(`[DVF] [${i + 1}/${FRENCH_DEPARTMENTS.length}] Département ${dept} (${progress}%)`);
-    
-    try {
-      await ingestDVFDepartment(dept);
-      successCount++;
-      ingestionState.completed = successCount;
-      console.log(`[DVF] ✅ Département ${dept} : SUCCÈS`);
-    } catch (error) {
-      failCount++;
-      ingestionState.failed = failCount;
-      console.error(`[DVF] ❌ Département ${dept} : ÉCHEC`, error.message);
+  // Pool borné de workers, progression persistée dans le manifeste d'ingestion
+  await runIngestion(FRENCH_DEPARTMENTS, {
+    onProgress: ({ department, result, finished, total }) => {
+      const progress = (finished / total * 100).toFixed(1);
+      
+      if (result.success) {
+        successCount++;
+        ingestionState.completed = successCount;
+        console.log(`[DVF] ✅ Département ${department} : SUCCÈS`);
+      } else {
+        failCount++;
+        ingestionState.failed = failCount;
+        console.error(`[DVF] ❌ Département ${department} : ÉCHEC`, result.error);
+      }
+      
+      ingestionState.progress = parseInt(progress);
+      ingestionState.message = `${finished}/${total} départements traités (${progress}%)`;
+      console.log(`[DVF] [${finished}/${total}] (${progress}%)`);
     }
-  }
+  });
   
   const duration = ((Date.now() - startTime) / 1000 / 60).toFixed(2);
   
@@ -173,6 +176,10 @@ export async function clearDVFData() {
   try {
     const collection = await getCollection('dvf_sales');
     const result = await collection.deleteMany({});
+    await clearDVFAggregates();
+    await clearDVFDepartmentStats();
+    await clearWatermarks();
+    await bumpDVFGenerations();
     
     return {
       deleted: result.deletedCount,
@@ -0,0 +1,203 @@
+import { getCollection } from './mongodb.js';
+import { encodeGeohash } from './dvf-geo.js';
+import { describeSorted, sortedCopy, SURFACE_BANDS, surfaceBand } from './dvf-stats.js';
+
+// Agrégats de prix/m² matérialisés à l'ingestion (collection dvf_aggregates)
+// Un document par (département, niveau, zone, type, tranche de surface) :
+// nombre de ventes, médiane, quartiles, moyenne et, pour la tranche 'all', tendance mensuelle.
+//
+// - niveaux : department, commune (code INSEE), postal (code postal), cell (geohash 6, ~1,2 km x 0,6 km)
+// - recalculés par département après chaque ingestion (rebuildDVFAggregates) : une zone à
+//   cheval sur deux départements (code postal, cellule) a un document par département
+// - lus par l'estimation (repli en zone peu dense, prior de cohérence) et par le tableau de bord,
+//   sans parcourir dvf_sales
+
+export const AGGREGATES_COLLECTION = 'dvf_aggregates';
+export const AGGREGATE_LEVELS = ['department', 'commune', 'postal', 'cell'];
+// Zones avec moins de ventes non matérialisées
+const MIN_SALES = parseInt(process.env.DVF_AGGREGATE_MIN_SALES || '3', 10);
+// Ventes minimales pour qu'un agrégat serve de repli ou de prior à une estimation
+export const PRIOR_MIN_SALES = parseInt(process.env.DVF_PRIOR_MIN_SALES || '10', 10);
+const CELL_PRECISION = 6;
+const WRITE_BATCH_SIZE = 1000;
+
+const SALE_PROJECTION = {
+  _id: 0, type_local: 1, surface_reelle_bati: 1, prix_m2: 1,
+  code_commune: 1, code_postal: 1, geohash: 1, date_mutation: 1
+};
+
+let indexesReady = null;
+
+async function getAggregatesCollection() {
+  const collection = await getCollection(AGGREGATES_COLLECTION);
+  if (!indexesReady) {
+    indexesReady = Promise.all([
+      collection.createIndex({ level: 1, key: 1, type: 1, band: 1 }),
+      collection.createIndex({ code_departement: 1, level: 1, type: 1, band: 1 })
+    ]).catch(error => {
+      indexesReady = null;
+      throw error;
+    });
+  }
+  await indexesReady;
+  return collection;
+}
+
+function saleZones(sale, dept) {
+  return {
+    department: dept,
+    commune: sale.code_commune,
+    postal: sale.code_postal,
+    cell: sale.geohash?.slice(0, CELL_PRECISION)
+  };
+}
+
+// Médiane par mois ('YYYY-MM'), ordre chronologique
+function monthlyTrend(prices, months) {
+  const byMonth = new Map();
+  for (let i = 0; i < prices.length; i++) {
+    if (!byMonth.has(months[i])) byMonth.set(months[i], []);
+    byMonth.get(months[i]).push(prices[i]);
+  }
+  return [...byMonth.keys()].sort().map(month => {
+    const sorted = sortedCopy(byMonth.get(month));
+    const { count, median } = describeSorted(sorted);
+    return { month, count, median: Math.round(median) };
+  });
+}
+
+function toAggregateDoc(dept, groupKey, group, buildId, updatedAt) {
+  const [level, key, type, rawBand] = groupKey.split('|');
+  const band = rawBand === 'all' ? 'all' : Number(rawBand);
+  const d = describeSorted(sortedCopy(group.prices));
+  const doc = {
+    _id: `${dept}|${groupKey}`,
+    code_departement: dept,
+    level,
+    key,
+    type,
+    band,
+    surface_min: band === 'all' ? null : SURFACE_BANDS[band],
+    surface_max: band === 'all' ? null : SURFACE_BANDS[band + 1] ?? null,
+    count: d.count,
+    median: Math.round(d.median),
+    q1: Math.round(d.q1),
+    q3: Math.round(d.q3),
+    mean: Math.round(d.mean),
+    first_date: group.firstDate,
+    last_date: group.lastDate,
+    build_id: buildId,
+    updated_at: updatedAt
+  };
+  if (band === 'all') doc.trend = monthlyTrend(group.prices, group.months);
+  return doc;
+}
+
+// Recalculer les agrégats d'un département à partir de dvf_sales (une lecture en flux)
+// Les documents sont remplacés sur place puis les zones disparues supprimées :
+// les lecteurs voient toujours un jeu complet.
+export async function rebuildDepartmentAggregates(dept) {
+  const sales = await getCollection('dvf_sales');
+  const collection = await getAggregatesCollection();
+  const groups = new Map();
+  let total = 0;
+
+  const add = (groupKey, sale, withMonths) => {
+    let group = groups.get(groupKey);
+    if (!group) {
+      group = { prices: [], months: withMonths ? [] : null, firstDate: sale.date_mutation, lastDate: sale.date_mutation };
+      groups.set(groupKey, group);
+    }
+    group.prices.push(sale.prix_m2);
+    if (withMonths) group.months.push(sale.date_mutation.slice(0, 7));
+    if (sale.date_mutation < group.firstDate) group.firstDate = sale.date_mutation;
+    if (sale.date_mutation > group.lastDate) group.lastDate = sale.date_mutation;
+  };
+
+  const cursor = sales.find({ code_departement: dept, prix_m2: { $gt: 0 } }, { projection: SALE_PROJECTION });
+  for await (const sale of cursor) {
+    total++;
+    const band = surfaceBand(sale.surface_reelle_bati);
+    for (const [level, key] of Object.entries(saleZones(sale, dept))) {
+      if (!key) continue;
+      add(`${level}|${key}|${sale.type_local}|all`, sale, true);
+      add(`${level}|${key}|${sale.type_local}|${band}`, sale, false);
+    }
+  }
+
+  const buildId = `${dept}-${Date.now()}`;
+  const updatedAt = new Date();
+  let written = 0;
+  let operations = [];
+  for (const [groupKey, group] of groups) {
+    if (group.prices.length < MIN_SALES) continue;
+    const doc = toAggregateDoc(dept, groupKey, group, buildId, updatedAt);
+    operations.push({ replaceOne: { filter: { _id: doc._id }, replacement: doc, upsert: true } });
+    if (operations.length >= WRITE_BATCH_SIZE) {
+      await collection.bulkWrite(operations, { ordered: false });
+      written += operations.length;
+      operations = [];
+    }
+  }
+  if (operations.length > 0) {
+    await collection.bulkWrite(operations, { ordered: false });
+    written += operations.length;
+  }
+
+  const { deletedCount } = await collection.deleteMany({ code_departement: dept, build_id: { $ne: buildId } });
+  return { department: dept, sales: total, aggregates: written, removed: deletedCount };
+}
+
+// Recalculer les agrégats des départements rechargés (appelé après chaque ingestion)
+export async function rebuildDVFAggregates(departments) {
+  const results = [];
+  for (const dept of departments) {
+    const result = await rebuildDepartmentAggregates(dept);
+    console.log(`[DVF] ✓ Aggregates for department ${dept}: ${result.aggregates} zones (${result.sales} sales)`);
+    results.push(result);
+  }
+  return results;
+}
+
+export async function clearDVFAggregates() {
+  const collection = await getAggregatesCollection();
+  const { deletedCount } = await collection.deleteMany({});
+  return deletedCount;
+}
+
+// Agrégats d'un niveau pour le tableau de bord / la carte de chaleur
+// `department` est requis sauf au niveau department ; la tendance n'est renvoyée que sur demande.
+export async function listDVFAggregates({ level, type, band = 'all', department = null, includeTrend = false }) {
+  const collection = await getAggregatesCollection();
+  const filter = { level, type, band };
+  if (department) filter.code_departement = department;
+  const projection = { _id: 0, build_id: 0 };
+  if (!includeTrend) projection.trend = 0;
+  return collection.find(filter, { projection }).sort({ key: 1 }).toArray();
+}
+
+// Agrégat de référence pour un bien : la zone la plus fine avec assez de ventes
+// Ordre : cellule + tranche, cellule, code postal + tranche, code postal.
+// Une zone partagée entre départements retient le document le plus fourni.
+export async function findAreaAggregate({ lat, lng, type, surface, postalCode = null }) {
+  const band = surfaceBand(surface);
+  const cell = encodeGeohash(lat, lng, CELL_PRECISION);
+  const zones = [{ level: 'cell', key: cell }];
+  if (postalCode) zones.push({ level: 'postal', key: postalCode });
+
+  const collection = await getAggregatesCollection();
+  const docs = await collection.find(
+    { $or: zones, type, band: { $in: [band, 'all'] }, count: { $gte: PRIOR_MIN_SALES } },
+    { projection: { _id: 0, trend: 0, build_id: 0 } }
+  ).toArray();
+
+  for (const { level } of zones) {
+    for (const wanted of [band, 'all']) {
+      const best = docs
+        .filter(doc => doc.level === level && doc.band === wanted)
+        .sort((a, b) => b.count - a.count)[0];
+      if (best) return best;
+    }
+  }
+  return null;
+}
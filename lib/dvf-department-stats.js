@@ -0,0 +1,152 @@
+import { getCollection } from './mongodb.js';
+
+// Statistiques DVF par département tenues à jour par l'ingestion (collection dvf_department_stats)
+// Un document par département : nombre de ventes, répartition par type, dernier import,
+// taille BSON des lignes et emprise (boîte englobante des ventes, lue par le cache des
+// comparables pour savoir quels départements une recherche peut toucher). Le tableau de bord et /api/admin/dvf/status lisent ces ~100 documents
+// au lieu d'agréger tout dvf_sales à chaque rafraîchissement.
+//
+// - recalculés par département après chaque ingestion (une agrégation sur l'index code_departement)
+// - scripts/rebuild-dvf-department-stats.js les recalcule s'ils divergent (import manuel,
+//   ingestion interrompue)
+// - données chargées avant l'existence de ces documents : tant que le marqueur dvf_meta
+//   'department_stats' est absent (ou d'une version antérieure de STATS_VERSION), le premier
+//   lecteur ou la première ingestion lance un recalcul complet, qui pose le marqueur. Le vide de la collection ne suffit pas : après
+//   une ingestion d'un seul département, les autres resteraient absents du tableau de bord.
+
+export const DEPARTMENT_STATS_COLLECTION = 'dvf_department_stats';
+const MARKER_ID = 'department_stats';
+// Contenu des documents : incrémenté quand un champ est ajouté (2 : bounds)
+const STATS_VERSION = 2;
+const BOUNDS_REFRESH_MS = 30 * 1000;
+
+async function markComplete() {
+  const meta = await getCollection('dvf_meta');
+  await meta.updateOne(
+    { _id: MARKER_ID },
+    { $set: { complete: true, version: STATS_VERSION, rebuilt_at: new Date() } },
+    { upsert: true }
+  );
+}
+
+// Compter les ventes d'un département et mettre à jour son document (supprimé s'il n'en reste aucune)
+export async function rebuildDepartmentStats(dept) {
+  const sales = await getCollection('dvf_sales');
+  const collection = await getCollection(DEPARTMENT_STATS_COLLECTION);
+
+  const groups = await sales.aggregate([
+    { $match: { code_departement: dept } },
+    {
+      $group: {
+        _id: '$type_local',
+        count: { $sum: 1 },
+        lastImport: { $max: '$imported_at' },
+        rowBytes: { $sum: { $bsonSize: '$$ROOT' } },
+        minLat: { $min: '$latitude' },
+        maxLat: { $max: '$latitude' },
+        minLng: { $min: '$longitude' },
+        maxLng: { $max: '$longitude' }
+      }
+    }
+  ]).toArray();
+
+  const count = groups.reduce((sum, g) => sum + g.count, 0);
+  if (count === 0) {
+    await collection.deleteOne({ _id: dept });
+    return { department: dept, count: 0 };
+  }
+
+  // Lignes sans coordonnées ignorées ($min / $max renvoient null pour un groupe sans aucune)
+  const located = groups.filter(g => g.minLat != null && g.minLng != null);
+  const doc = {
+    code_departement: dept,
+    count,
+    byType: Object.fromEntries(groups.map(g => [g._id ?? 'inconnu', g.count])),
+    lastImport: groups.reduce((max, g) => (g.lastImport && (!max || g.lastImport > max) ? g.lastImport : max), null),
+    rowBytes: groups.reduce((sum, g) => sum + g.rowBytes, 0),
+    bounds: located.length > 0
+      ? {
+        minLat: Math.min(...located.map(g => g.minLat)),
+        maxLat: Math.max(...located.map(g => g.maxLat)),
+        minLng: Math.min(...located.map(g => g.minLng)),
+        maxLng: Math.max(...located.map(g => g.maxLng))
+      }
+      : null,
+    updated_at: new Date()
+  };
+  await collection.replaceOne({ _id: dept }, doc, { upsert: true });
+  return { department: dept, ...doc };
+}
+
+// Recalculer les départements rechargés (appelé après chaque ingestion)
+export async function rebuildDVFDepartmentStats(departments) {
+  const results = [];
+  for (const dept of departments) {
+    results.push(await rebuildDepartmentStats(dept));
+  }
+  return results;
+}
+
+// Recalcul complet : départements présents dans dvf_sales et documents orphelins
+export async function rebuildAllDVFDepartmentStats() {
+  const sales = await getCollection('dvf_sales');
+  const collection = await getCollection(DEPARTMENT_STATS_COLLECTION);
+  const [present, tracked] = await Promise.all([
+    sales.distinct('code_departement'),
+    collection.distinct('_id')
+  ]);
+  const departments = [...new Set([...present.filter(Boolean), ...tracked])].sort();
+  const results = await rebuildDVFDepartmentStats(departments);
+  await markComplete();
+  return results;
+}
+
+// dvf_sales est vidé en même temps : aucun document n'est attendu, le marqueur reste valable
+export async function clearDVFDepartmentStats() {
+  const collection = await getCollection(DEPARTMENT_STATS_COLLECTION);
+  await collection.deleteMany({});
+  await markComplete();
+}
+
+let bootstrap = null;
+
+// Recalcul complet, une seule fois, si le marqueur n'a jamais été posé
+export async function ensureDVFDepartmentStats() {
+  const meta = await getCollection('dvf_meta');
+  if (await meta.findOne({ _id: MARKER_ID, complete: true, version: STATS_VERSION }, { projection: { _id: 1 } })) return;
+
+  if (!bootstrap) {
+    console.log('[DVF] Department stats never fully built: rebuilding all departments...');
+    bootstrap = rebuildAllDVFDepartmentStats().finally(() => {
+      bootstrap = null;
+    });
+  }
+  await bootstrap;
+}
+
+// Documents de tous les départements, par code
+export async function listDVFDepartmentStats() {
+  await ensureDVFDepartmentStats();
+  const collection = await getCollection(DEPARTMENT_STATS_COLLECTION);
+  return collection.find({}).sort({ _id: 1 }).toArray();
+}
+
+let bounds = new Map();
+let boundsLoadedAt = 0;
+
+// Emprise de chaque département chargé, par code (null si le document n'en a pas encore)
+// Relue au plus toutes les 30 s, comme les générations (dvf-generations.js).
+export async function getDVFDepartmentBounds() {
+  if (Date.now() - boundsLoadedAt < BOUNDS_REFRESH_MS) {
+    return bounds;
+  }
+  try {
+    const collection = await getCollection(DEPARTMENT_STATS_COLLECTION);
+    const docs = await collection.find({}, { projection: { bounds: 1 } }).toArray();
+    bounds = new Map(docs.map(doc => [doc._id, doc.bounds || null]));
+    boundsLoadedAt = Date.now();
+  } catch (error) {
+    console.error('[DVF] Failed to load department bounds:', error.message);
+  }
+  return bounds;
+}
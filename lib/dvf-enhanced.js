@@ -1,21 +1,42 @@
 import { getCollection } from './mongodb.js';
-import { calculateDistance } from './dvf.js';
-import { cleanOutliers } from './dvf-ingestion.js';
+import { toGeoPoint } from './dvf-geo.js';
+import { epochDayNow, saleEpochDay, summarizeComparables, toEpochDay } from './dvf-stats.js';
 
-// Algorithme de sélection adaptatif des comparables
-export async function getAdaptiveComparables({
-  lat,
-  lng,
-  type,
+// Champs nécessaires aux statistiques (les adresses ne sont lues que pour les 20 comparables affichés)
+const STATS_PROJECTION = { _id: 1, distance: 1, date_mutation: 1, date_epoch_day: 1, surface_reelle_bati: 1, prix_m2: 1, code_departement: 1 };
+const DETAIL_PROJECTION = {
+  numero_voie_masked: 1, type_voie: 1, voie: 1, code_postal: 1, commune: 1,
+  valeur_fonciere: 1, latitude: 1, longitude: 1
+};
+const MAX_RETURNED_COMPARABLES = 20;
+
+// Colonnes en tableaux typés parallèles : prices[i], surfaces[i], days[i] correspondent à candidates[i]
+// (les distances dépendent du bien estimé et sont fournies à part)
+export function toCandidateColumns(candidates) {
+  const prices = new Float64Array(candidates.length);
+  const surfaces = new Float64Array(candidates.length);
+  const days = new Float64Array(candidates.length);
+  candidates.forEach((sale, i) => {
+    prices[i] = sale.prix_m2;
+    surfaces[i] = sale.surface_reelle_bati;
+    days[i] = saleEpochDay(sale);
+  });
+  return { prices, surfaces, days };
+}
+
+// Stratégie adaptative rejouée en mémoire sur des ventes déjà chargées (aucun accès base)
+// Retourne les indices des comparables retenus, triés par distance, et leurs statistiques.
+// `quiet` coupe les logs de chaque tentative (estimations en lot).
+export function selectAdaptiveComparables({ prices, surfaces, days }, distances, {
   surface,
   initialRadiusMeters = 500,
   maxRadiusMeters = 800,
   months = 24,
   maxMonths = 36,
-  minComparables = 8
+  minComparables = 8,
+  quiet = false
 }) {
-  const collection = await getCollection('dvf_sales');
-  
+  const log = quiet ? () => {} : console.log;
   let radius = initialRadiusMeters;
   let monthsWindow = months;
   let comparables = [];
@@ -28,37 +49,27 @@ export async function getAdaptiveComparables({
     
     const cutoffDate = new Date();
     cutoffDate.setMonth(cutoffDate.getMonth() - monthsWindow);
-    
-    // Calcul de la boîte englobante
-    const latDelta = radius / 111000;
-    const lngDelta = radius / (111000 * Math.cos(lat * Math.PI / 180));
+    const minDay = toEpochDay(cutoffDate.toISOString());
     
     // Calcul de la tolérance de surface (±15% initialement, jusqu'à ±25%)
     const surfaceTolerance = attempt <= 2 ? 0.15 : 0.25;
     const minSurface = surface * (1 - surfaceTolerance);
     const maxSurface = surface * (1 + surfaceTolerance);
     
-    console.log(`[DVF] Attempt ${attempt}: radius=${radius}m, months=${monthsWindow}, surface=${minSurface}-${maxSurface}m²`);
+    log(`[DVF] Attempt ${attempt}: radius=${radius}m, months=${monthsWindow}, surface=${minSurface}-${maxSurface}m²`);
     
-    // Query MongoDB
-    const sales = await collection.find({
-      latitude: { $gte: lat - latDelta, $lte: lat + latDelta },
-      longitude: { $gte: lng - lngDelta, $lte: lng + lngDelta },
-      type_local: type === 'appartement' ? 'appartement' : 'maison',
-      date_mutation: { $gte: cutoffDate.toISOString().split('T')[0] },
-      surface_reelle_bati: { $gte: minSurface, $lte: maxSurface },
-      prix_m2: { $gt: 0 }
-    }).toArray();
-    
-    // Filtrer par distance réelle
-    comparables = sales
-      .map(sale => {
-        const distance = calculateDistance(lat, lng, sale.latitude, sale.longitude);
-        return { ...sale, distance };
-      })
-      .filter(sale => sale.distance <= radius);
+    // Les comparables sont des indices dans les colonnes (pas de copie de documents)
+    comparables = [];
+    for (let i = 0; i < distances.length; i++) {
+      if (distances[i] <= radius &&
+          days[i] >= minDay &&
+          surfaces[i] >= minSurface &&
+          surfaces[i] <= maxSurface) {
+        comparables.push(i);
+      }
+    }
     
-    console.log(`[DVF] Found ${comparables.length} raw comparables`);
+    log(`[DVF] Found ${comparables.length} raw comparables`);
     
     if (comparables.length >= minComparables) {
       break;
@@ -75,81 +86,49 @@ export async function getAdaptiveComparables({
   
   if (comparables.length === 0) {
     return {
-      count: 0,
       radius,
       months: monthsWindow,
-      stats: null,
       comparables: [],
-      confidence: 0,
+      stats: null,
       warning: 'Aucun comparable trouvé. Un RDV avec un expert est recommandé.'
     };
   }
   
-  // Nettoyer les outliers statistiques
-  const cleanedComparables = cleanOutliers(comparables);
-  console.log(`[DVF] After outlier cleaning: ${cleanedComparables.length} comparables`);
+  // Nettoyage des outliers et statistiques en un tri + une passe (voir dvf-stats.js)
+  const summary = summarizeComparables({
+    prices: Float64Array.from(comparables, i => prices[i]),
+    distances: Float64Array.from(comparables, i => distances[i]),
+    days: Float64Array.from(comparables, i => days[i]),
+    radius,
+    months: monthsWindow,
+    nowDay: epochDayNow(),
+    cleanOutliers: comparables.length >= 4
+  });
+  log(`[DVF] After outlier cleaning: ${summary.count} comparables`);
   
-  if (cleanedComparables.length === 0) {
+  if (summary.count === 0) {
     return {
-      count: 0,
       radius,
       months: monthsWindow,
-      stats: null,
       comparables: [],
-      confidence: 0,
+      stats: null,
       warning: 'Données insuffisantes après nettoyage. Un RDV est recommandé.'
     };
   }
   
   // Trier par distance
-  cleanedComparables.sort((a, b) => a.distance - b.distance);
-  
-  // Calcul des statistiques
-  const pricesPerM2 = cleanedComparables.map(c => c.prix_m2);
-  const mean = pricesPerM2.reduce((a, b) => a + b, 0) / pricesPerM2.length;
-  
-  const sortedPrices = [...pricesPerM2].sort((a, b) => a - b);
-  const median = sortedPrices.length % 2 === 0
-    ? (sortedPrices[sortedPrices.length / 2 - 1] + sortedPrices[sortedPrices.length / 2]) / 2
-    : sortedPrices[Math.floor(sortedPrices.length / 2)];
-  
-  const variance = pricesPerM2.reduce((sum, price) => sum + Math.pow(price - mean, 2), 0) / pricesPerM2.length;
-  const stdDev = Math.sqrt(variance);
-  
-  // Moyenne pondérée (60% proximité + 40% récence)
-  const now = Date.now();
-  let weightedSum = 0;
-  let weightSum = 0;
-  
-  cleanedComparables.forEach(sale => {
-    const pricePerM2 = sale.prix_m2;
-    const distanceWeight = 1 - (sale.distance / radius);
-    const saleDate = new Date(sale.date_mutation).getTime();
-    const ageMonths = (now - saleDate) / (1000 * 60 * 60 * 24 * 30);
-    const recencyWeight = 1 - (ageMonths / monthsWindow);
-    
-    const totalWeight = (distanceWeight * 0.6 + recencyWeight * 0.4);
-    weightedSum += pricePerM2 * totalWeight;
-    weightSum += totalWeight;
-  });
-  
-  const weightedAverage = weightSum > 0 ? weightedSum / weightSum : mean;
+  const cleanedComparables = Array.from(summary.kept, k => comparables[k]);
+  cleanedComparables.sort((a, b) => distances[a] - distances[b]);
   
   // Indice de confiance (0-100)
   // 40 points: nombre de comparables (max 10)
-  const countScore = Math.min(cleanedComparables.length / 10, 1) * 40;
+  const countScore = Math.min(summary.count / 10, 1) * 40;
   
   // 30 points: proximité du plus proche
-  const closestDistance = cleanedComparables[0].distance;
-  const proximityScore = Math.max(0, 1 - (closestDistance / radius)) * 30;
+  const proximityScore = Math.max(0, 1 - (summary.closestDistance / radius)) * 30;
   
   // 30 points: récence moyenne
-  const avgAge = cleanedComparables.reduce((sum, s) => {
-    const saleDate = new Date(s.date_mutation).getTime();
-    const ageMonths = (now - saleDate) / (1000 * 60 * 60 * 24 * 30);
-    return sum + ageMonths;
-  }, 0) / cleanedComparables.length;
-  const recencyScore = Math.max(0, 1 - (avgAge / monthsWindow)) * 30;
+  const recencyScore = Math.max(0, 1 - (summary.avgAgeMonths / monthsWindow)) * 30;
   
   const confidenceIndex = Math.round(countScore + proximityScore + recencyScore);
   
@@ -162,28 +141,117 @@ export async function getAdaptiveComparables({
   }
   
   return {
-    count: cleanedComparables.length,
     radius,
     months: monthsWindow,
+    comparables: cleanedComparables,
     stats: {
-      meanPricePerM2: Math.round(mean),
-      medianPricePerM2: Math.round(median),
-      stdDev: Math.round(stdDev),
-      weightedAverage: Math.round(weightedAverage),
+      meanPricePerM2: Math.round(summary.mean),
+      medianPricePerM2: Math.round(summary.median),
+      stdDev: Math.round(summary.stdDev),
+      weightedAverage: Math.round(summary.weightedAverage),
       confidenceIndex
     },
-    comparables: cleanedComparables.slice(0, 20).map(c => ({
-      id: c._id,
-      // Masquer le numéro exact (privacy)
-      address: `${c.numero_voie_masked || 'XX'} ${c.type_voie} ${c.voie}, ${c.code_postal} ${c.commune}`.trim(),
-      price: c.valeur_fonciere,
-      surface: c.surface_reelle_bati,
-      pricePerM2: c.prix_m2,
-      date: c.date_mutation,
-      distance: Math.round(c.distance),
-      latitude: c.latitude,
-      longitude: c.longitude
-    })),
     warning
   };
+}
+
+// Algorithme de sélection adaptatif des comparables
+export async function getAdaptiveComparables({
+  lat,
+  lng,
+  type,
+  surface,
+  initialRadiusMeters = 500,
+  maxRadiusMeters = 800,
+  months = 24,
+  maxMonths = 36,
+  minComparables = 8
+}) {
+  const collection = await getCollection('dvf_sales');
+  
+  // Une seule requête sur l'enveloppe maximale (rayon, période et tolérance de surface
+  // les plus larges), puis les élargissements successifs sont rejoués en mémoire
+  const envelopeRadius = Math.max(initialRadiusMeters, maxRadiusMeters);
+  const envelopeMonths = Math.max(months, maxMonths);
+  const envelopeCutoff = new Date();
+  envelopeCutoff.setMonth(envelopeCutoff.getMonth() - envelopeMonths);
+  
+  // Recherche par proximité sur l'index 2dsphere { location, type_local, date_mutation } :
+  // seules les ventes dans le rayon sont lues, triées par distance calculée par MongoDB
+  const candidates = await collection.aggregate([
+    {
+      $geoNear: {
+        near: toGeoPoint(lat, lng),
+        key: 'location',
+        distanceField: 'distance',
+        maxDistance: envelopeRadius,
+        spherical: true,
+        query: {
+          type_local: type === 'appartement' ? 'appartement' : 'maison',
+          date_mutation: { $gte: envelopeCutoff.toISOString().split('T')[0] },
+          surface_reelle_bati: { $gte: surface * 0.75, $lte: surface * 1.25 },
+          prix_m2: { $gt: 0 }
+        }
+      }
+    },
+    { $project: STATS_PROJECTION }
+  ]).toArray();
+  
+  const columns = toCandidateColumns(candidates);
+  const distances = Float64Array.from(candidates, sale => sale.distance);
+  
+  // Départements couverts par l'enveloppe (invalidation du cache des comparables, champ
+  // interne retiré par getCachedComparables avant toute réponse)
+  const departments = [...new Set(candidates.map(sale => sale.code_departement))];
+  
+  console.log(`[DVF] ${candidates.length} candidates within ${envelopeRadius}m / ${envelopeMonths} months`);
+  
+  const selection = selectAdaptiveComparables(columns, distances, {
+    surface, initialRadiusMeters, maxRadiusMeters, months, maxMonths, minComparables
+  });
+  
+  if (!selection.stats) {
+    return {
+      count: 0,
+      radius: selection.radius,
+      months: selection.months,
+      stats: null,
+      comparables: [],
+      confidence: 0,
+      departments,
+      warning: selection.warning
+    };
+  }
+  
+  // Adresses et prix lus uniquement pour les comparables retournés
+  const returned = selection.comparables.slice(0, MAX_RETURNED_COMPARABLES);
+  const details = await collection
+    .find({ _id: { $in: returned.map(i => candidates[i]._id) } }, { projection: DETAIL_PROJECTION })
+    .toArray();
+  const detailsById = new Map(details.map(d => [String(d._id), d]));
+  
+  return {
+    count: selection.comparables.length,
+    radius: selection.radius,
+    months: selection.months,
+    departments,
+    stats: selection.stats,
+    comparables: returned.map(i => {
+      const sale = candidates[i];
+      const c = detailsById.get(String(sale._id)) || {};
+      return {
+        id: sale._id,
+        // Masquer le numéro exact (privacy)
+        address: `${c.numero_voie_masked || 'XX'} ${c.type_voie} ${c.voie}, ${c.code_postal} ${c.commune}`.trim(),
+        price: c.valeur_fonciere,
+        surface: sale.surface_reelle_bati,
+        pricePerM2: sale.prix_m2,
+        date: sale.date_mutation,
+        distance: Math.round(distances[i]),
+        latitude: c.latitude,
+        longitude: c.longitude
+      };
+    }),
+    warning: selection.warning
+  };
 }
\ No newline at end of file
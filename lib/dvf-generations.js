@@ -0,0 +1,47 @@
+import { getCollection } from './mongodb.js';
+
+// Générations du jeu de données DVF, par département
+// Chaque ingestion incrémente la génération des départements rechargés dans dvf_meta ;
+// les caches (comparables, agrégats) comparent la génération enregistrée avec l'entrée
+// à la génération courante. `all` est incrémenté quand toute la base est vidée, `any`
+// à chaque ingestion quel que soit le département.
+
+const GENERATIONS_ID = 'generations';
+const GENERATION_REFRESH_MS = 30 * 1000;
+
+let generations = { all: 0, any: 0, departments: {} };
+let loadedAt = 0;
+
+// Génération courante (relue depuis MongoDB au plus toutes les 30 s : les scripts
+// d'ingestion tournent dans un autre processus que l'API)
+export async function getDVFGenerations() {
+  if (Date.now() - loadedAt < GENERATION_REFRESH_MS) {
+    return generations;
+  }
+  try {
+    const meta = await getCollection('dvf_meta');
+    const doc = await meta.findOne({ _id: GENERATIONS_ID });
+    generations = {
+      all: doc?.all || 0,
+      any: doc?.any || 0,
+      departments: doc?.departments || {}
+    };
+    loadedAt = Date.now();
+  } catch (error) {
+    console.error('[DVF] Failed to load dataset generations:', error.message);
+  }
+  return generations;
+}
+
+// Publier une nouvelle génération pour ces départements (null = toute la base)
+export async function bumpDVFGenerations(departments = null) {
+  const update = departments
+    ? { $inc: { any: 1, ...Object.fromEntries(departments.map(dept => [`departments.${dept}`, 1])) } }
+    : { $inc: { all: 1, any: 1 } };
+
+  const meta = await getCollection('dvf_meta');
+  await meta.updateOne({ _id: GENERATIONS_ID }, update, { upsert: true });
+
+  // Relire immédiatement dans ce processus
+  loadedAt = 0;
+}
@@ -0,0 +1,139 @@
+// Index spatial des ventes DVF : point GeoJSON + clé de cellule geohash
+// Le point `location` alimente l'index 2dsphere utilisé par $geoNear,
+// le geohash sert de clé de regroupement par cellule (agrégats, contrôles).
+
+const GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz';
+
+// Précision 6 : cellules d'environ 1,2 km x 0,6 km
+export const GEOHASH_PRECISION = 6;
+
+// Encoder une position en geohash
+export function encodeGeohash(lat, lng, precision = GEOHASH_PRECISION) {
+  let latMin = -90, latMax = 90;
+  let lngMin = -180, lngMax = 180;
+  let hash = '';
+  let bits = 0;
+  let bitCount = 0;
+  let evenBit = true;
+
+  while (hash.length < precision) {
+    if (evenBit) {
+      const mid = (lngMin + lngMax) / 2;
+      if (lng >= mid) {
+        bits = (bits << 1) | 1;
+        lngMin = mid;
+      } else {
+        bits = bits << 1;
+        lngMax = mid;
+      }
+    } else {
+      const mid = (latMin + latMax) / 2;
+      if (lat >= mid) {
+        bits = (bits << 1) | 1;
+        latMin = mid;
+      } else {
+        bits = bits << 1;
+        latMax = mid;
+      }
+    }
+    evenBit = !evenBit;
+
+    if (++bitCount === 5) {
+      hash += GEOHASH_ALPHABET[bits];
+      bits = 0;
+      bitCount = 0;
+    }
+  }
+
+  return hash;
+}
+
+// Point GeoJSON (attention : longitude en premier)
+export function toGeoPoint(lat, lng) {
+  return { type: 'Point', coordinates: [lng, lat] };
+}
+
+// Ajouter les champs spatiaux à une vente normalisée
+export function withGeoFields(sale) {
+  return {
+    ...sale,
+    location: toGeoPoint(sale.latitude, sale.longitude),
+    geohash: encodeGeohash(sale.latitude, sale.longitude)
+  };
+}
+
+// Index de la collection dvf_sales
+// La recherche de comparables passe par { location: 2dsphere, type_local, date_mutation } :
+// le coût suit le nombre de ventes retournées et non plus la largeur de la boîte englobante.
+export async function ensureDVFIndexes(collection) {
+  await collection.createIndex(
+    { location: '2dsphere', type_local: 1, date_mutation: -1 },
+    { name: 'location_2dsphere_type_date' }
+  );
+  await collection.createIndex({ geohash: 1, type_local: 1, date_mutation: -1 });
+  await ensureMutationKeyIndex(collection);
+  await collection.createIndex({ date_mutation: -1 });
+  await collection.createIndex({ code_postal: 1 });
+  await collection.createIndex({ code_departement: 1 });
+  await collection.createIndex({ prix_m2: 1 });
+}
+
+// Rafraîchissement incrémental : index unique sur la clé de mutation (une ligne DVF = une vente)
+// sparse : les ventes importées avant l'ajout des clés n'en ont pas. Remplace l'ancien index
+// non unique ; si des clés d'un ancien format sont en double, l'index reste non unique
+// jusqu'au rechargement complet des départements concernés.
+export async function ensureMutationKeyIndex(collection) {
+  const indexes = await collection.indexes().catch(() => []);
+  const existing = indexes.find(index => index.name === 'mutation_key_1');
+  if (existing?.unique) return true;
+  if (existing) await collection.dropIndex('mutation_key_1');
+
+  try {
+    await collection.createIndex({ mutation_key: 1 }, { unique: true, sparse: true });
+    return true;
+  } catch (error) {
+    if (error.code !== 11000) throw error;
+    console.warn(`[DVF] ⚠️ Duplicate mutation keys in ${collection.collectionName}, keeping a non-unique index until the affected departments are fully reloaded`);
+    await collection.createIndex({ mutation_key: 1 });
+    return false;
+  }
+}
+
+// Compléter les ventes importées avant l'ajout des champs spatiaux
+export async function backfillGeoFields(collection, { batchSize = 1000 } = {}) {
+  const cursor = collection.find(
+    { location: { $exists: false }, latitude: { $type: 'number' }, longitude: { $type: 'number' } },
+    { projection: { _id: 1, latitude: 1, longitude: 1 } }
+  );
+
+  let updated = 0;
+  let operations = [];
+
+  for await (const sale of cursor) {
+    operations.push({
+      updateOne: {
+        filter: { _id: sale._id },
+        update: {
+          $set: {
+            location: toGeoPoint(sale.latitude, sale.longitude),
+            geohash: encodeGeohash(sale.latitude, sale.longitude)
+          }
+        }
+      }
+    });
+
+    if (operations.length === batchSize) {
+      await collection.bulkWrite(operations, { ordered: false });
+      updated += operations.length;
+      operations = [];
+      console.log(`[DVF] Geo backfill: ${updated} ventes mises à jour...`);
+    }
+  }
+
+  if (operations.length > 0) {
+    await collection.bulkWrite(operations, { ordered: false });
+    updated += operations.length;
+  }
+
+  return updated;
+}
@@ -2,43 +2,64 @@ import https from 'https';
 import http from 'http';
 import fs from 'fs';
 import zlib from 'zlib';
+import crypto from 'crypto';
+import { pipeline } from 'stream';
 import { parse } from 'csv-parse';
-import { getCollection } from './mongodb.js';
+import { connectToDatabase, getCollection } from './mongodb.js';
+import { ensureDVFIndexes, ensureMutationKeyIndex, withGeoFields } from './dvf-geo.js';
+import { bumpDVFGenerations } from './dvf-generations.js';
+import { rebuildDVFAggregates } from './dvf-aggregates.js';
+import { rebuildDVFDepartmentStats, ensureDVFDepartmentStats } from './dvf-department-stats.js';
+import { withDVFWriteLease } from './dvf-lease.js';
+import { outlierBounds, toEpochDay } from './dvf-stats.js';
+
+export const DVF_COLLECTION = 'dvf_sales';
+
+// Fenêtre de ventes conservées
+const RETENTION_YEARS = 5;
+
+// En mode incrémental, les ventes antérieures au watermark moins cette fenêtre
+// sont considérées inchangées et ne sont pas comparées
+export const DELTA_LOOKBACK_MONTHS = parseInt(process.env.DVF_DELTA_LOOKBACK_MONTHS || '12', 10);
+
+// Format de mutation_key, enregistré dans le watermark : un département chargé avec un
+// autre format repasse par un chargement complet
+export const MUTATION_KEY_VERSION = 2;
+
+const DUPLICATE_KEY = 11000;
 
 // URLs des fichiers DVF sur data.gouv.fr
 const DVF_BASE_URL = 'https://files.data.gouv.fr/geo-dvf/latest/csv/2024/departements';
 
-// Télécharger un fichier depuis une URL
-export async function downloadFile(url, destPath) {
+// Ouvrir un flux HTTP(S) sur une URL (redirections suivies, rien n'est écrit sur disque)
+// Résout null sur un 304 (requête conditionnelle via If-None-Match / If-Modified-Since)
+export function openDownloadStream(url, maxRedirects = 5, headers = {}) {
   return new Promise((resolve, reject) => {
     const protocol = url.startsWith('https') ? https : http;
-    const file = fs.createWriteStream(destPath);
     
-    protocol.get(url, (response) => {
-      if (response.statusCode === 302 || response.statusCode === 301) {
+    protocol.get(url, { headers }, (response) => {
+      if ((response.statusCode === 302 || response.statusCode === 301) && response.headers.location) {
         // Handle redirect
-        file.close();
-        fs.unlinkSync(destPath);
-        return downloadFile(response.headers.location, destPath).then(resolve).catch(reject);
+        response.resume();
+        if (maxRedirects === 0) {
+          return reject(new Error(`Too many redirects: ${url}`));
+        }
+        const location = new URL(response.headers.location, url).toString();
+        return openDownloadStream(location, maxRedirects - 1, headers).then(resolve, reject);
+      }
+      
+      if (response.statusCode === 304) {
+        response.resume();
+        return resolve(null);
       }
       
       if (response.statusCode !== 200) {
-        file.close();
-        fs.unlinkSync(destPath);
+        response.resume();
         return reject(new Error(`Failed to download: ${response.statusCode}`));
       }
       
-      response.pipe(file);
-      
-      file.on('finish', () => {
-        file.close();
-        resolve(destPath);
-      });
-    }).on('error', (err) => {
-      file.close();
-      fs.unlinkSync(destPath);
-      reject(err);
-    });
+      resolve(response);
+    }).on('error', reject);
   });
 }
 
@@ -66,6 +87,9 @@ export function normalizeRecord(record) {
   const date = record.date_mutation;
   if (!date) return null;
   
+  // Identité de la ligne (index unique mutation_key)
+  if (!record.id_mutation) return null;
+  
   // Géolocalisation
   const lat = parseFloat(record.latitude);
   const lng = parseFloat(record.longitude);
@@ -79,7 +103,8 @@ export function normalizeRecord(record) {
   // Masquer le numéro exact (privacy)
   const numero = record.adresse_numero ? 'XX' : null;
   
-  return {
+  const sale = {
+    mutation_key: mutationKey(record),
     date_mutation: date,
     numero_voie_masked: numero,
     type_voie: '', // Non disponible dans le nouveau format
@@ -95,198 +120,507 @@ export function normalizeRecord(record) {
     prix_m2: Math.round(pricePerM2),
     latitude: lat,
     longitude: lng,
-    nature_mutation: record.nature_mutation,
-    imported_at: new Date().toISOString()
+    nature_mutation: record.nature_mutation
   };
+  sale.row_hash = hashSale(sale);
+  
+  // Date pré-calculée pour les statistiques (dérivée de date_mutation, hors row_hash)
+  return withGeoFields({ ...sale, date_epoch_day: toEpochDay(date), imported_at: new Date().toISOString() });
+}
+
+// Identité stable d'une ligne DVF : mutation + parcelle + lot + local (type, surface, pièces)
+// Une mutation a souvent plusieurs lignes sur une même parcelle sans lot (plusieurs locaux,
+// ou le même local répété par nature_culture) : le local les distingue. Deux lignes de même
+// clé décrivent la même vente et sont dédoublonnées (createDuplicateFilter).
+// Une correction Etalab de la surface ou des pièces change la clé : le rafraîchissement
+// incrémental supprime alors l'ancienne clé de la mutation relue (refreshDepartmentRows).
+export function mutationKey(record) {
+  if (!record.id_mutation) return null;
+  return [
+    record.id_mutation,
+    record.id_parcelle || '',
+    record.lot1_numero || '',
+    record.type_local || '',
+    record.surface_reelle_bati || '',
+    record.nombre_pieces_principales || ''
+  ].join('|');
+}
+
+// Filtre des doublons : vrai pour une ligne dont la clé a déjà été vue dans sa mutation
+// Le CSV regroupe les lignes par mutation : seul l'ensemble de la mutation courante est gardé
+// en mémoire. L'index unique sur mutation_key rejette les doublons qui échapperaient au filtre.
+export function createDuplicateFilter() {
+  let mutation = null;
+  let seen = new Set();
+  return (sale) => {
+    const mutationId = sale.mutation_key.slice(0, sale.mutation_key.indexOf('|'));
+    if (mutationId !== mutation) {
+      mutation = mutationId;
+      seen = new Set();
+    }
+    if (seen.has(sale.mutation_key)) return true;
+    seen.add(sale.mutation_key);
+    return false;
+  };
+}
+
+function escapeRegExp(value) {
+  return value.replace(/[.*+?^${}()|[\]\\]/g, '\\$&');
+}
+
+// Empreinte du contenu normalisé, pour ne réécrire que les lignes modifiées
+function hashSale(sale) {
+  return crypto.createHash('sha1').update(JSON.stringify(sale)).digest('base64');
+}
+
+function retentionCutoff() {
+  const cutoffDate = new Date();
+  cutoffDate.setFullYear(cutoffDate.getFullYear() - RETENTION_YEARS);
+  return cutoffDate.toISOString().split('T')[0];
 }
 
 // Nettoyer les outliers statistiques
 export function cleanOutliers(sales) {
   if (sales.length < 4) return sales;
   
-  const prices = sales.map(s => s.prix_m2).sort((a, b) => a - b);
-  
-  // 1) Percentiles 1/99
-  const p1Index = Math.floor(prices.length * 0.01);
-  const p99Index = Math.floor(prices.length * 0.99);
-  const p1 = prices[p1Index];
-  const p99 = prices[p99Index];
-  
-  // 2) IQR method
-  const q1Index = Math.floor(prices.length * 0.25);
-  const q3Index = Math.floor(prices.length * 0.75);
-  const q1 = prices[q1Index];
-  const q3 = prices[q3Index];
-  const iqr = q3 - q1;
-  const lowerBound = q1 - 1.5 * iqr;
-  const upperBound = q3 + 1.5 * iqr;
-  
-  // 3) Mean + 2σ
-  const mean = prices.reduce((a, b) => a + b, 0) / prices.length;
-  const variance = prices.reduce((sum, p) => sum + Math.pow(p - mean, 2), 0) / prices.length;
-  const stdDev = Math.sqrt(variance);
-  const lower2Sigma = mean - 2 * stdDev;
-  const upper2Sigma = mean + 2 * stdDev;
+  const { min, max } = outlierBounds(sales.map(s => s.prix_m2));
   
   // Appliquer tous les filtres
-  return sales.filter(s => {
-    const price = s.prix_m2;
-    return price >= p1 && price <= p99 &&
-           price >= lowerBound && price <= upperBound &&
-           price >= lower2Sigma && price <= upper2Sigma;
-  });
+  return sales.filter(s => s.prix_m2 >= min && s.prix_m2 <= max);
 }
 
 // Ingérer les données DVF d'un département
+// Sans collection cible, le département est chargé dans une collection de staging
+// qui remplace ses ventes dans dvf_sales (voir promoteStagingCollection).
 export async function ingestDVFDepartment(departmentCode, options = {}) {
-  const { skipDownload = false, csvPath = null } = options;
+  if (options.collection) {
+    return loadDVFDepartment(departmentCode, options.collection, options);
+  }
+  
+  const staging = await createStagingCollection();
+  try {
+    const stats = await loadDVFDepartment(departmentCode, staging, options);
+    if (stats.inserted > 0) {
+      await promoteStagingCollection(staging, [departmentCode]);
+      await saveWatermark(departmentCode, stats.watermark);
+    } else {
+      await dropStagingCollection(staging);
+    }
+    return stats;
+  } catch (error) {
+    await dropStagingCollection(staging);
+    throw error;
+  }
+}
+
+// Charger un département dans une collection (sans index secondaires : ils sont créés une
+// seule fois à la promotion du staging)
+// Pipeline en flux : HTTP → gunzip → csv-parse → normalisation → écriture par batches.
+// Au plus un batch en cours d'écriture et un batch en remplissage : la mémoire reste
+// constante quelle que soit la taille du département.
+export async function loadDVFDepartment(departmentCode, collection, options = {}) {
+  const { skipDownload = false, csvPath = null, batchSize = 1000 } = options;
   
   console.log(`[DVF] Starting ingestion for department ${departmentCode}...`);
   
-  // Étape 1: Télécharger le CSV (compressé en .gz)
-  let filePath = csvPath;
-  if (!skipDownload) {
-    const url = `${DVF_BASE_URL}/${departmentCode}.csv.gz`;
-    const gzPath = `/tmp/dvf_${departmentCode}.csv.gz`;
-    filePath = `/tmp/dvf_${departmentCode}.csv`;
-    
-    console.log(`[DVF] Downloading from ${url}...`);
+  // Étapes 1-2: Ouvrir la source et parser le CSV au fil de l'eau
+  const { records, etag, lastModified } = await openDVFRecords(departmentCode, { skipDownload, csvPath });
+  const cutoff = retentionCutoff();
+  let maxDate = null;
+  
+  let total = 0;
+  let normalizedCount = 0;
+  let inserted = 0;
+  let duplicates = 0;
+  let rejected = 0;
+  let appartements = 0;
+  let maisons = 0;
+  let pendingWrite = Promise.resolve();
+  let batch = [];
+  const isDuplicate = createDuplicateFilter();
+  
+  const writeBatch = async (docs) => {
     try {
-      await downloadFile(url, gzPath);
-      console.log(`[DVF] Downloaded to ${gzPath}`);
-      
-      // Décompresser le fichier
-      console.log(`[DVF] Decompressing...`);
-      const gunzip = zlib.createGunzip();
-      const source = fs.createReadStream(gzPath);
-      const destination = fs.createWriteStream(filePath);
-      
-      await new Promise((resolve, reject) => {
-        source.pipe(gunzip).pipe(destination)
-          .on('finish', resolve)
-          .on('error', reject);
-      });
-      
-      fs.unlinkSync(gzPath); // Clean up compressed file
-      console.log(`[DVF] Decompressed to ${filePath}`);
+      const result = await collection.insertMany(docs, { ordered: false });
+      inserted += result.insertedCount;
     } catch (error) {
-      console.error(`[DVF] Download/decompress failed:`, error.message);
-      throw error;
+      // Clé déjà présente (doublon hors de sa mutation) : ligne rejetée par l'index unique
+      const writeErrors = error.writeErrors ? [].concat(error.writeErrors) : [];
+      if (writeErrors.length === 0 || writeErrors.some(e => e.code !== DUPLICATE_KEY)) {
+        throw error;
+      }
+      inserted += error.insertedCount ?? error.result?.insertedCount ?? docs.length - writeErrors.length;
+      rejected += writeErrors.length;
+    }
+    console.log(`[DVF] Inserted ${inserted}...`);
+  };
+  
+  // Étapes 3-4: Normaliser et stocker (backpressure : on attend l'écriture précédente
+  // avant d'en lancer une nouvelle, ce qui met le parser en pause)
+  for await (const record of records) {
+    total++;
+    const norm = normalizeRecord(record);
+    if (!norm || norm.date_mutation < cutoff) continue;
+    if (isDuplicate(norm)) {
+      duplicates++;
+      continue;
+    }
+    
+    normalizedCount++;
+    if (!maxDate || norm.date_mutation > maxDate) maxDate = norm.date_mutation;
+    if (norm.type_local === 'appartement') appartements++;
+    else maisons++;
+    
+    batch.push(norm);
+    if (batch.length >= batchSize) {
+      await pendingWrite;
+      pendingWrite = writeBatch(batch);
+      pendingWrite.catch(() => {}); // l'erreur est relancée par le prochain await
+      batch = [];
     }
   }
   
-  // Étape 2: Parser le CSV
-  console.log(`[DVF] Parsing CSV...`);
-  const records = [];
-  const parser = fs.createReadStream(filePath).pipe(
-    parse({
-      columns: true,
-      skip_empty_lines: true,
-      delimiter: ',',
-      relax_column_count: true
-    })
-  );
+  await pendingWrite;
+  if (batch.length > 0) {
+    await writeBatch(batch);
+  }
   
-  for await (const record of parser) {
-    records.push(record);
+  console.log(`[DVF] Parsed ${total} raw records, ${normalizedCount} valid records (5 years), ${duplicates} duplicate rows skipped`);
+  if (rejected > 0) {
+    console.warn(`[DVF] ⚠️ Department ${departmentCode}: ${rejected} rows rejected by the unique mutation_key index (mutation rows not contiguous in the CSV?)`);
   }
   
-  console.log(`[DVF] Parsed ${records.length} raw records`);
+  if (normalizedCount === 0) {
+    console.log(`[DVF] No valid records to import`);
+    return { inserted: 0, total };
+  }
   
-  // Étape 3: Nettoyer et normaliser
-  console.log(`[DVF] Normalizing records...`);
-  const normalized = [];
-  const cutoffDate = new Date();
-  cutoffDate.setFullYear(cutoffDate.getFullYear() - 5); // 5 dernières années
+  console.log(`[DVF] ✓ Successfully ingested ${inserted} records for department ${departmentCode}`);
   
-  for (const record of records) {
-    const norm = normalizeRecord(record);
-    if (norm) {
-      const saleDate = new Date(norm.date_mutation);
-      if (saleDate >= cutoffDate) {
-        normalized.push(norm);
-      }
-    }
+  // Stats (le watermark est enregistré une fois les données promues)
+  const stats = {
+    inserted,
+    total,
+    appartements,
+    maisons,
+    watermark: { max_date_mutation: maxDate, etag, last_modified: lastModified, key_version: MUTATION_KEY_VERSION }
+  };
+  
+  console.log(`[DVF] Stats: ${stats.appartements} appartements, ${stats.maisons} maisons`);
+  
+  return stats;
+}
+
+// Ouvrir le CSV d'un département sous forme de flux d'enregistrements
+// (null si le fichier distant n'a pas changé depuis etag / lastModified)
+async function openDVFRecords(departmentCode, { skipDownload = false, csvPath = null, etag = null, lastModified = null } = {}) {
+  let source;
+  let compressed;
+  if (skipDownload && csvPath) {
+    source = fs.createReadStream(csvPath);
+    compressed = csvPath.endsWith('.gz');
+  } else {
+    const url = `${DVF_BASE_URL}/${departmentCode}.csv.gz`;
+    const headers = {};
+    if (etag) headers['If-None-Match'] = etag;
+    if (lastModified) headers['If-Modified-Since'] = lastModified;
+    
+    console.log(`[DVF] Streaming from ${url}...`);
+    source = await openDownloadStream(url, 5, headers);
+    if (!source) return null;
+    compressed = true;
   }
   
-  console.log(`[DVF] Normalized ${normalized.length} valid records (5 years)`);
+  const parser = parse({
+    columns: true,
+    skip_empty_lines: true,
+    delimiter: ',',
+    relax_column_count: true
+  });
+  const stages = compressed ? [source, zlib.createGunzip(), parser] : [source, parser];
+  // pipeline() détruit tous les flux en cas d'erreur : la boucle for await la relance
+  pipeline(...stages, () => {});
   
-  if (normalized.length === 0) {
-    console.log(`[DVF] No valid records to import`);
-    return { inserted: 0, total: records.length };
+  return {
+    records: parser,
+    etag: source.headers?.etag || null,
+    lastModified: source.headers?.['last-modified'] || null
+  };
+}
+
+// Watermark par département : date de la vente la plus récente et validateurs HTTP du fichier
+export async function getWatermark(departmentCode) {
+  const watermarks = await getCollection('dvf_watermarks');
+  return watermarks.findOne({ _id: departmentCode });
+}
+
+// Sans ventes en base, un watermark ferait passer le département pour chargé (304, delta
+// limité à la fenêtre récente) : il est supprimé en même temps que les données
+export async function clearWatermarks() {
+  const watermarks = await getCollection('dvf_watermarks');
+  await watermarks.deleteMany({});
+}
+
+export async function saveWatermark(departmentCode, watermark) {
+  const watermarks = await getCollection('dvf_watermarks');
+  await watermarks.updateOne(
+    { _id: departmentCode },
+    { $set: { ...watermark, refreshed_at: new Date().toISOString() } },
+    { upsert: true }
+  );
+}
+
+// Agrégats des départements modifiés (dvf-aggregates.js)
+// Un échec n'annule pas l'ingestion : scripts/rebuild-dvf-aggregates.js permet de les recalculer.
+async function refreshAggregates(departments) {
+  try {
+    await rebuildDVFAggregates(departments);
+  } catch (error) {
+    console.error(`[DVF] Aggregates rebuild failed for ${departments.join(', ')}:`, error.message);
+  }
+}
+
+// Compteurs par département lus par le tableau de bord (dvf-department-stats.js)
+// Même principe : scripts/rebuild-dvf-department-stats.js les recalcule après un échec.
+// Première ingestion depuis leur introduction : recalcul complet des autres départements.
+async function refreshDepartmentStats(departments) {
+  try {
+    await rebuildDVFDepartmentStats(departments);
+    await ensureDVFDepartmentStats();
+  } catch (error) {
+    console.error(`[DVF] Department stats rebuild failed for ${departments.join(', ')}:`, error.message);
+  }
+}
+
+// Rafraîchissement incrémental d'un département, directement dans dvf_sales :
+// - upsert des seules lignes nouvelles ou modifiées (clé mutation_key, empreinte row_hash)
+// - suppression des clés disparues de la source pour chaque mutation relue
+// - suppression des ventes sorties de la fenêtre de 5 ans
+// - lignes antérieures au watermark moins DELTA_LOOKBACK_MONTHS ignorées
+// Retourne { needsFullLoad: true } si le département n'a jamais été chargé avec des clés
+// de mutation, ou n'a aucune vente en base (base vidée, chargement perdu) : il doit alors
+// passer par un chargement complet (staging).
+// Sous bail partagé : une promotion ne peut pas remplacer dvf_sales pendant les upserts.
+export function refreshDVFDepartment(departmentCode, options = {}) {
+  return withDVFWriteLease('shared', `refresh ${departmentCode}`, () => refreshDepartmentRows(departmentCode, options));
+}
+
+async function refreshDepartmentRows(departmentCode, options) {
+  const { skipDownload = false, csvPath = null, batchSize = 1000, lookbackMonths = DELTA_LOOKBACK_MONTHS } = options;
+  
+  const collection = await getCollection(DVF_COLLECTION);
+  const watermark = await getWatermark(departmentCode);
+  const [legacy, present] = await Promise.all([
+    collection.findOne({ code_departement: departmentCode, mutation_key: { $exists: false } }, { projection: { _id: 1 } }),
+    collection.findOne({ code_departement: departmentCode }, { projection: { _id: 1 } })
+  ]);
+  if (!watermark?.max_date_mutation || watermark.key_version !== MUTATION_KEY_VERSION || legacy || !present) {
+    console.log(`[DVF] Department ${departmentCode}: no watermark, older mutation keys, legacy rows or no rows, full load required`);
+    return { needsFullLoad: true };
   }
   
-  // Étape 4: Stocker dans MongoDB
-  console.log(`[DVF] Storing in MongoDB...`);
-  const collection = await getCollection('dvf_sales');
+  console.log(`[DVF] Incremental refresh for department ${departmentCode} (watermark ${watermark.max_date_mutation})...`);
   
-  // Créer les index
-  await collection.createIndex({ latitude: 1, longitude: 1 });
-  await collection.createIndex({ date_mutation: -1 });
-  await collection.createIndex({ type_local: 1 });
-  await collection.createIndex({ code_postal: 1 });
-  await collection.createIndex({ code_departement: 1 });
-  await collection.createIndex({ prix_m2: 1 });
+  const opened = await openDVFRecords(departmentCode, {
+    skipDownload,
+    csvPath,
+    etag: watermark.etag,
+    lastModified: watermark.last_modified
+  });
+  if (!opened) {
+    console.log(`[DVF] Department ${departmentCode}: source unchanged`);
+    await saveWatermark(departmentCode, {});
+    return { mode: 'incremental', unchanged: true, inserted: 0, updated: 0, deleted: 0 };
+  }
   
-  // Supprimer les anciennes données de ce département
-  await collection.deleteMany({ code_departement: departmentCode });
-  console.log(`[DVF] Cleared old data for department ${departmentCode}`);
+  const cutoff = retentionCutoff();
+  const floorDate = new Date(watermark.max_date_mutation);
+  floorDate.setMonth(floorDate.getMonth() - lookbackMonths);
+  const floor = floorDate.toISOString().split('T')[0];
   
-  // Insérer par batches
-  const batchSize = 1000;
+  let total = 0;
+  let compared = 0;
   let inserted = 0;
+  let updated = 0;
+  let removed = 0;
+  let maxDate = watermark.max_date_mutation;
+  let pendingWrite = Promise.resolve();
+  let batch = [];
+  // Mutations relues dans le batch courant → clés présentes dans la source
+  let mutations = new Map();
+  const reconciled = new Set();
+  const isDuplicate = createDuplicateFilter();
+  
+  // Comparer un batch aux lignes existantes de ses mutations (index sur mutation_key) :
+  // - n'écrire que les lignes nouvelles ou modifiées (empreinte row_hash)
+  // - supprimer les clés absentes de la source : une correction de surface ou de pièces
+  //   change la clé, l'ancienne ligne compterait sinon la vente deux fois
+  // Une mutation déjà réconciliée dans un batch précédent (lignes non contiguës dans le CSV)
+  // n'est pas réconciliée de nouveau, ses lignes sont seulement écrites.
+  const applyDelta = async (docs, batchMutations) => {
+    const ids = [...batchMutations.keys()];
+    const existing = await collection
+      .find(
+        { mutation_key: { $in: ids.map(id => new RegExp(`^${escapeRegExp(id)}\\|`)) } },
+        { projection: { mutation_key: 1, row_hash: 1 } }
+      )
+      .toArray();
+    const hashes = new Map(existing.map(d => [d.mutation_key, d.row_hash]));
+    
+    const stale = existing
+      .map(d => d.mutation_key)
+      .filter(key => {
+        const id = key.slice(0, key.indexOf('|'));
+        return !reconciled.has(id) && !batchMutations.get(id)?.has(key);
+      });
+    ids.forEach(id => reconciled.add(id));
+    
+    const operations = stale.length > 0 ? [{ deleteMany: { filter: { mutation_key: { $in: stale } } } }] : [];
+    removed += stale.length;
+    for (const doc of docs) {
+      if (hashes.get(doc.mutation_key) === doc.row_hash) continue;
+      if (hashes.has(doc.mutation_key)) updated++;
+      else inserted++;
+      operations.push({
+        updateOne: { filter: { mutation_key: doc.mutation_key }, update: { $set: doc }, upsert: true }
+      });
+    }
+    
+    if (operations.length > 0) {
+      await collection.bulkWrite(operations, { ordered: false });
+    }
+  };
   
-  for (let i = 0; i < normalized.length; i += batchSize) {
-    const batch = normalized.slice(i, i + batchSize);
-    try {
-      await collection.insertMany(batch, { ordered: false });
-      inserted += batch.length;
-      console.log(`[DVF] Inserted ${inserted}/${normalized.length}...`);
-    } catch (error) {
-      // Continue on duplicate key errors
-      inserted += batch.length;
+  for await (const record of opened.records) {
+    total++;
+    const date = record.date_mutation;
+    if (!record.id_mutation || !date || date < cutoff || date < floor) continue;
+    
+    // Batch écrit à la frontière d'une mutation : chaque mutation est réconciliée en entier
+    if (batch.length >= batchSize && !mutations.has(record.id_mutation)) {
+      await pendingWrite;
+      pendingWrite = applyDelta(batch, mutations);
+      pendingWrite.catch(() => {}); // l'erreur est relancée par le prochain await
+      batch = [];
+      mutations = new Map();
     }
+    // Mutation relue même si aucune de ses lignes n'est retenue (type ou surface devenus invalides)
+    if (!mutations.has(record.id_mutation)) mutations.set(record.id_mutation, new Set());
+    
+    const norm = normalizeRecord(record);
+    if (!norm || isDuplicate(norm)) continue;
+    
+    compared++;
+    if (norm.date_mutation > maxDate) maxDate = norm.date_mutation;
+    
+    mutations.get(record.id_mutation).add(norm.mutation_key);
+    batch.push(norm);
   }
   
-  console.log(`[DVF] ✓ Successfully ingested ${inserted} records for department ${departmentCode}`);
+  await pendingWrite;
+  if (mutations.size > 0) {
+    await applyDelta(batch, mutations);
+  }
+  
+  // Ventes sorties de la fenêtre de rétention
+  const { deletedCount } = await collection.deleteMany({
+    code_departement: departmentCode,
+    date_mutation: { $lt: cutoff }
+  });
   
-  // Cleanup
-  if (!skipDownload && filePath) {
-    fs.unlinkSync(filePath);
+  if (inserted + updated + removed + deletedCount > 0) {
+    await bumpDVFGenerations([departmentCode]);
+    await refreshAggregates([departmentCode]);
+    await refreshDepartmentStats([departmentCode]);
   }
   
-  // Stats
-  const stats = {
-    inserted,
-    total: records.length,
-    appartements: await collection.countDocuments({ 
-      code_departement: departmentCode, 
-      type_local: 'appartement' 
-    }),
-    maisons: await collection.countDocuments({ 
-      code_departement: departmentCode, 
-      type_local: 'maison' 
-    })
-  };
+  await saveWatermark(departmentCode, {
+    max_date_mutation: maxDate,
+    etag: opened.etag,
+    last_modified: opened.lastModified
+  });
   
-  console.log(`[DVF] Stats: ${stats.appartements} appartements, ${stats.maisons} maisons`);
+  const stats = { mode: 'incremental', total, compared, inserted, updated, removed, deleted: deletedCount };
+  console.log(`[DVF] ✓ Department ${departmentCode}: ${inserted} new, ${updated} changed, ${removed} removed from source, ${deletedCount} expired (${compared} compared)`);
   
   return stats;
 }
 
-// Télécharger et ingérer plusieurs départements
-export async function ingestMultipleDepartments(departments) {
-  const results = [];
-  
-  for (const dept of departments) {
-    try {
-      const stats = await ingestDVFDepartment(dept);
-      results.push({ department: dept, success: true, stats });
-    } catch (error) {
-      console.error(`[DVF] Failed to ingest department ${dept}:`, error.message);
-      results.push({ department: dept, success: false, error: error.message });
-    }
+// Collection de staging : chargée avec le seul index unique sur mutation_key (les doublons
+// sont rejetés à l'insertion), les autres index sont créés à la promotion
+export async function createStagingCollection(name = `${DVF_COLLECTION}_staging_${Date.now()}`) {
+  const { db } = await connectToDatabase();
+  const exists = await db.listCollections({ name }, { nameOnly: true }).hasNext();
+  const staging = exists ? db.collection(name) : await db.createCollection(name);
+  await ensureMutationKeyIndex(staging);
+  return staging;
+}
+
+export async function dropStagingCollection(staging) {
+  try {
+    await staging.drop();
+  } catch (error) {
+    // Déjà supprimée
   }
+}
+
+// Promouvoir le staging en dvf_sales, sous bail exclusif (aucun rafraîchissement en cours) :
+// 1. copie côté serveur des départements non rechargés depuis dvf_sales vers le staging,
+//    qui devient un jeu complet (rien à copier pour une ingestion France entière)
+// 2. index construits sur le staging
+// 3. renommage avec dropTarget : les lectures basculent de façon atomique, aucun
+//    département n'est vide ou partiel à aucun moment
+// Le bail couvre la copie : un rafraîchissement écrit dans dvf_sales après la copie serait
+// perdu au renommage. DVF_LEASE_MS doit dépasser la durée de la copie et des index.
+export async function promoteStagingCollection(staging, refreshedDepartments) {
+  const { db } = await connectToDatabase();
+  
+  await withDVFWriteLease('exclusive', `promote ${staging.collectionName}`, async () => {
+    const copied = await copyUntouchedDepartments(db, staging, refreshedDepartments);
+    if (copied > 0) {
+      console.log(`[DVF] ${copied} rows of untouched departments copied into ${staging.collectionName}`);
+    }
+    console.log(`[DVF] Building indexes on ${staging.collectionName}...`);
+    await ensureDVFIndexes(staging);
+    await staging.rename(DVF_COLLECTION, { dropTarget: true });
+  });
+  
+  // Version du jeu de données servi (nom du staging promu)
+  await db.collection('dvf_meta').updateOne(
+    { _id: DVF_COLLECTION },
+    {
+      $set: {
+        dataset_version: staging.collectionName,
+        promoted_at: new Date().toISOString(),
+        refreshed_departments: refreshedDepartments
+      }
+    },
+    { upsert: true }
+  );
+  await bumpDVFGenerations(refreshedDepartments);
+  await refreshAggregates(refreshedDepartments);
+  await refreshDepartmentStats(refreshedDepartments);
   
-  return results;
-}
\ No newline at end of file
+  console.log(`[DVF] ✓ ${staging.collectionName} promoted to ${DVF_COLLECTION} (${refreshedDepartments.length} departments refreshed)`);
+}
+
+// Compléter le staging avec les ventes des départements non rechargés ($merge côté serveur)
+// Les lignes partielles d'un département en échec sont d'abord retirées du staging : ce
+// département garde ses données actuelles. Retourne le nombre de lignes copiées.
+async function copyUntouchedDepartments(db, staging, refreshedDepartments) {
+  const untouched = { code_departement: { $nin: refreshedDepartments } };
+  await staging.deleteMany(untouched);
+  
+  const liveExists = await db.listCollections({ name: DVF_COLLECTION }, { nameOnly: true }).hasNext();
+  if (!liveExists) return 0;
+  
+  const live = db.collection(DVF_COLLECTION);
+  if (!(await live.findOne(untouched, { projection: { _id: 1 } }))) return 0;
+  
+  const before = await staging.estimatedDocumentCount();
+  await live.aggregate([
+    { $match: untouched },
+    { $merge: { into: staging.collectionName, whenMatched: 'fail', whenNotMatched: 'insert' } }
+  ]).toArray();
+  return (await staging.estimatedDocumentCount()) - before;
+}
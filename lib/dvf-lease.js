@@ -0,0 +1,99 @@
+import crypto from 'crypto';
+import { getCollection } from './mongodb.js';
+
+// Bail d'écriture sur dvf_sales (document dvf_meta, partagé entre processus)
+// - partagé : rafraîchissements incrémentaux, plusieurs en parallèle (un département chacun)
+// - exclusif : promotion d'un staging (copie des autres départements puis renommage sur
+//   dvf_sales) ; attend la fin des rafraîchissements en cours et bloque les suivants
+// Un bail expire au bout de DVF_LEASE_MS : un processus arrêté en cours de route ne bloque
+// pas les ingestions suivantes. Une prise refusée (clé dupliquée sur l'upsert conditionnel,
+// comme issueOTP) est retentée jusqu'à l'expiration du délai d'attente.
+
+const LEASE_ID = 'dvf_sales_lease';
+const LEASE_MS = parseInt(process.env.DVF_LEASE_MS || String(30 * 60 * 1000), 10);
+const POLL_MS = 2000;
+const DUPLICATE_KEY = 11000;
+
+function notExclusive(now) {
+  return { $or: [{ exclusive: null }, { 'exclusive.expiresAt': { $lte: now } }] };
+}
+
+async function tryAcquire(meta, mode, owner) {
+  const now = new Date();
+  const expiresAt = new Date(now.getTime() + LEASE_MS);
+  try {
+    if (mode === 'exclusive') {
+      await meta.updateOne(
+        {
+          _id: LEASE_ID,
+          ...notExclusive(now),
+          shared: { $not: { $elemMatch: { expiresAt: { $gt: now } } } }
+        },
+        { $set: { exclusive: { owner, expiresAt }, shared: [] } },
+        { upsert: true }
+      );
+    } else {
+      await meta.updateOne(
+        { _id: LEASE_ID, ...notExclusive(now) },
+        [
+          {
+            $set: {
+              exclusive: null,
+              // Purger les baux partagés expirés au passage
+              shared: {
+                $concatArrays: [
+                  { $filter: { input: { $ifNull: ['$shared', []] }, cond: { $gt: ['$$this.expiresAt', now] } } },
+                  [{ owner, expiresAt }]
+                ]
+              }
+            }
+          }
+        ],
+        { upsert: true }
+      );
+    }
+    return true;
+  } catch (error) {
+    if (error.code === DUPLICATE_KEY) return false;
+    throw error;
+  }
+}
+
+async function release(meta, mode, owner) {
+  if (mode === 'exclusive') {
+    await meta.updateOne({ _id: LEASE_ID, 'exclusive.owner': owner }, { $set: { exclusive: null } });
+  } else {
+    await meta.updateOne({ _id: LEASE_ID }, { $pull: { shared: { owner } } });
+  }
+}
+
+/**
+ * Exécuter fn sous le bail d'écriture dvf_sales
+ * @param {'shared' | 'exclusive'} mode
+ * @param {string} label - Pour les logs et l'identifiant du détenteur
+ */
+export async function withDVFWriteLease(mode, label, fn, { waitMs = LEASE_MS } = {}) {
+  const meta = await getCollection('dvf_meta');
+  const owner = `${label}:${process.pid}:${crypto.randomUUID()}`;
+  const deadline = Date.now() + waitMs;
+
+  let waiting = false;
+  while (!(await tryAcquire(meta, mode, owner))) {
+    if (Date.now() >= deadline) {
+      throw new Error(`DVF write lease (${mode}) unavailable after ${Math.round(waitMs / 1000)}s`);
+    }
+    if (!waiting) {
+      console.log(`[DVF] ${label}: waiting for the dvf_sales write lease (${mode})...`);
+      waiting = true;
+    }
+    await new Promise(resolve => setTimeout(resolve, POLL_MS));
+  }
+
+  try {
+    return await fn();
+  } finally {
+    await release(meta, mode, owner).catch(error => {
+      console.error(`[DVF] ${label}: failed to release the write lease:`, error.message);
+    });
+  }
+}
@@ -0,0 +1,198 @@
+import fs from 'fs';
+import path from 'path';
+import {
+  createStagingCollection,
+  dropStagingCollection,
+  ingestDVFDepartment,
+  promoteStagingCollection,
+  refreshDVFDepartment,
+  saveWatermark
+} from './dvf-ingestion.js';
+
+// Liste complète des départements français (métropole + DOM-TOM)
+export const FRENCH_DEPARTMENTS = [
+  '01', '02', '03', '04', '05', '06', '07', '08', '09', '10',
+  '11', '12', '13', '14', '15', '16', '17', '18', '19', '21',
+  '22', '23', '24', '25', '26', '27', '28', '29', '2A', '2B',
+  '30', '31', '32', '33', '34', '35', '36', '37', '38', '39',
+  '40', '41', '42', '43', '44', '45', '46', '47', '48', '49',
+  '50', '51', '52', '53', '54', '55', '56', '57', '58', '59',
+  '60', '61', '62', '63', '64', '65', '66', '67', '68', '69',
+  '70', '71', '72', '73', '74', '75', '76', '77', '78', '79',
+  '80', '81', '82', '83', '84', '85', '86', '87', '88', '89',
+  '90', '91', '92', '93', '94', '95',
+  '971', '972', '973', '974', '976'
+];
+
+export const DEFAULT_CONCURRENCY = parseInt(process.env.DVF_INGEST_CONCURRENCY || '4', 10);
+export const DEFAULT_RETRIES = parseInt(process.env.DVF_INGEST_RETRIES || '2', 10);
+export const DEFAULT_MANIFEST_PATH = process.env.DVF_MANIFEST_PATH || 'dvf-ingestion-manifest.json';
+
+// Lire le manifeste d'une exécution précédente (null s'il n'existe pas)
+export function loadManifest(manifestPath = DEFAULT_MANIFEST_PATH) {
+  if (!fs.existsSync(manifestPath)) return null;
+  return JSON.parse(fs.readFileSync(manifestPath, 'utf-8'));
+}
+
+// Écriture atomique : fichier temporaire puis rename, le manifeste n'est jamais tronqué
+function writeManifest(manifestPath, manifest) {
+  manifest.updatedAt = new Date().toISOString();
+  const tmpPath = path.join(path.dirname(path.resolve(manifestPath)), `.${path.basename(manifestPath)}.tmp`);
+  fs.writeFileSync(tmpPath, JSON.stringify(manifest, null, 2));
+  fs.renameSync(tmpPath, manifestPath);
+}
+
+// Départements à reprendre : tout ce qui n'est pas terminé avec succès
+export function pendingDepartments(manifest) {
+  return Object.entries(manifest.departments)
+    .filter(([, entry]) => entry.status !== 'done')
+    .map(([dept]) => dept);
+}
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Ingestion concurrente avec un pool borné de workers.
+// Chaque département est retenté `retries` fois (backoff exponentiel) ; l'état de chaque
+// département est persisté dans le manifeste après chaque transition, ce qui permet
+// de reprendre une exécution interrompue (scripts/retry-failed.js).
+// Avec `resume`, les départements déjà terminés sont ignorés sauf si `force` est passé.
+// Tous les départements sont chargés dans une même collection de staging, promue en
+// dvf_sales en fin d'exécution par un swap atomique (les départements non rechargés, ou
+// en échec, sont d'abord copiés depuis dvf_sales dans le staging).
+// Avec `incremental`, les départements déjà chargés sont mis à jour par delta directement
+// dans dvf_sales ; seuls ceux sans watermark passent par le staging.
+export async function runIngestion(departments, options = {}) {
+  const {
+    concurrency = DEFAULT_CONCURRENCY,
+    retries = DEFAULT_RETRIES,
+    retryDelayMs = 5000,
+    manifestPath = DEFAULT_MANIFEST_PATH,
+    resume = false,
+    force = false,
+    incremental = false,
+    ingest = ingestDVFDepartment,
+    refresh = refreshDVFDepartment,
+    onProgress = () => {}
+  } = options;
+
+  const previous = resume && manifestPath ? loadManifest(manifestPath) : null;
+  const manifest = previous || {
+    startedAt: new Date().toISOString(),
+    departments: {}
+  };
+  manifest.concurrency = concurrency;
+
+  // Reprendre le staging d'une exécution interrompue avant sa promotion,
+  // sinon repartir d'un nouveau staging
+  const resumeStaging = Boolean(previous?.staging && !previous.promoted);
+  const staging = await createStagingCollection(resumeStaging ? previous.staging : undefined);
+  if (!resumeStaging) {
+    Object.values(manifest.departments).forEach(entry => { entry.staged = false; });
+  }
+  manifest.staging = staging.collectionName;
+  manifest.promoted = false;
+
+  for (const dept of departments) {
+    const entry = manifest.departments[dept];
+    if (force || !entry || entry.status !== 'done') {
+      manifest.departments[dept] = { status: 'pending', attempts: entry?.attempts || 0, staged: false };
+    }
+  }
+
+  const save = () => {
+    if (manifestPath) writeManifest(manifestPath, manifest);
+  };
+  save();
+
+  const queue = departments.filter(dept => manifest.departments[dept].status !== 'done');
+  const skipped = departments.filter(dept => !queue.includes(dept));
+  const results = skipped.map(dept => ({ department: dept, success: true, skipped: true }));
+  let finished = skipped.length;
+
+  if (skipped.length > 0) {
+    console.log(`[DVF] Reprise : ${skipped.length} départements déjà ingérés ignorés`);
+  }
+
+  const ingestWithRetry = async (dept) => {
+    const entry = manifest.departments[dept];
+    entry.status = 'running';
+    entry.startedAt = new Date().toISOString();
+    save();
+
+    for (let attempt = 0; attempt <= retries; attempt++) {
+      entry.attempts++;
+      try {
+        // Repartir d'un staging propre si une tentative précédente a écrit partiellement
+        if (entry.attempts > 1) {
+          await staging.deleteMany({ code_departement: dept });
+        }
+        let stats = incremental ? await refresh(dept) : null;
+        if (!stats || stats.needsFullLoad) {
+          stats = await ingest(dept, { collection: staging });
+          entry.staged = true;
+        }
+        entry.status = 'done';
+        entry.stats = stats;
+        entry.error = null;
+        entry.finishedAt = new Date().toISOString();
+        save();
+        return { department: dept, success: true, stats };
+      } catch (error) {
+        entry.error = error.message;
+        console.error(`[DVF] ❌ Département ${dept} : tentative ${attempt + 1}/${retries + 1} échouée - ${error.message}`);
+        if (attempt < retries) {
+          save();
+          await sleep(retryDelayMs * 2 ** attempt);
+        }
+      }
+    }
+
+    entry.status = 'failed';
+    entry.finishedAt = new Date().toISOString();
+    save();
+    return { department: dept, success: false, error: entry.error };
+  };
+
+  // Chaque worker prend le prochain département de la file : téléchargement, parsing
+  // et insertions de départements différents se chevauchent
+  const worker = async () => {
+    while (queue.length > 0) {
+      const dept = queue.shift();
+      const result = await ingestWithRetry(dept);
+      results.push(result);
+      finished++;
+      onProgress({ department: dept, result, finished, total: departments.length });
+    }
+  };
+
+  const workerCount = Math.max(1, Math.min(concurrency, queue.length));
+  await Promise.all(Array.from({ length: workerCount }, worker));
+
+  // Promotion : seuls les départements rechargés avec des données remplacent l'existant,
+  // les échecs conservent les données actuelles
+  const refreshed = Object.entries(manifest.departments)
+    .filter(([, entry]) => entry.staged && entry.stats?.inserted > 0)
+    .map(([dept]) => dept);
+
+  if (refreshed.length > 0) {
+    await promoteStagingCollection(staging, refreshed);
+    for (const dept of refreshed) {
+      await saveWatermark(dept, manifest.departments[dept].stats.watermark);
+    }
+  } else {
+    await dropStagingCollection(staging);
+  }
+
+  manifest.promoted = true;
+  manifest.finishedAt = new Date().toISOString();
+  save();
+
+  // Résultats dans l'ordre des départements demandés
+  const order = new Map(departments.map((dept, i) => [dept, i]));
+  return results.sort((a, b) => order.get(a.department) - order.get(b.department));
+}
+
+// Télécharger et ingérer plusieurs départements (sans manifeste)
+export async function ingestMultipleDepartments(departments, options = {}) {
+  return runIngestion(departments, { manifestPath: null, ...options });
+}
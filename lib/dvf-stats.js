@@ -0,0 +1,187 @@
+// Noyau statistique des comparables DVF
+// Entrées en tableaux typés parallèles (prix/m², distances, dates en jours epoch) :
+// un seul tri des prix fournit toutes les statistiques d'ordre (médiane, percentiles, IQR),
+// les moments et les pondérations distance/récence sont calculés dans une même boucle.
+// Les dates sont stockées à l'ingestion en jours depuis l'epoch (date_epoch_day) :
+// aucun new Date(...) dans la boucle.
+
+export const MS_PER_DAY = 24 * 60 * 60 * 1000;
+const DAYS_PER_MONTH = 30;
+
+// 'YYYY-MM-DD' -> jours depuis le 1970-01-01 (UTC)
+export function toEpochDay(date) {
+  const year = +date.slice(0, 4);
+  const month = +date.slice(5, 7);
+  const day = +date.slice(8, 10);
+  return Date.UTC(year, month - 1, day) / MS_PER_DAY;
+}
+
+// Jour courant, fractionnaire (même origine que Date.now())
+export function epochDayNow() {
+  return Date.now() / MS_PER_DAY;
+}
+
+// Date de vente en jours epoch (ventes importées avant date_epoch_day : parsing de secours)
+export function saleEpochDay(sale) {
+  return sale.date_epoch_day ?? toEpochDay(sale.date_mutation);
+}
+
+// Tranches de surface (m²) : bornes basses, la dernière tranche est ouverte
+// Partagées par les instantanés marché et les agrégats DVF
+export const SURFACE_BANDS = [0, 25, 40, 55, 70, 90, 120, 160, 220, 320];
+
+export function surfaceBand(surface) {
+  let band = 0;
+  while (band + 1 < SURFACE_BANDS.length && surface >= SURFACE_BANDS[band + 1]) band++;
+  return band;
+}
+
+// Copie triée (tri numérique natif des tableaux typés)
+export function sortedCopy(values) {
+  return Float64Array.from(values).sort();
+}
+
+// Percentile par rang inférieur : sorted[floor(n * q)]
+export function quantileSorted(sorted, q) {
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * q))];
+}
+
+// Médiane d'une plage [start, end) d'un tableau trié
+export function medianSorted(sorted, start = 0, end = sorted.length) {
+  const n = end - start;
+  const mid = start + (n >> 1);
+  return n % 2 === 0 ? (sorted[mid - 1] + sorted[mid]) / 2 : sorted[mid];
+}
+
+// Moyenne et variance (population) en une passe (Welford)
+function moments(values, start = 0, end = values.length) {
+  let mean = 0;
+  let m2 = 0;
+  for (let i = start; i < end; i++) {
+    const delta = values[i] - mean;
+    mean += delta / (i - start + 1);
+    m2 += delta * (values[i] - mean);
+  }
+  const n = end - start;
+  return { mean, variance: n > 0 ? m2 / n : 0 };
+}
+
+// Statistiques descriptives d'une série triée
+export function describeSorted(sorted) {
+  const { mean, variance } = moments(sorted);
+  const q1 = quantileSorted(sorted, 0.25);
+  const q3 = quantileSorted(sorted, 0.75);
+  return {
+    count: sorted.length,
+    mean,
+    variance,
+    stdDev: Math.sqrt(variance),
+    min: sorted[0],
+    max: sorted[sorted.length - 1],
+    median: medianSorted(sorted),
+    p1: quantileSorted(sorted, 0.01),
+    q1,
+    q3,
+    iqr: q3 - q1,
+    p99: quantileSorted(sorted, 0.99)
+  };
+}
+
+// Bornes de prix/m² hors outliers : la plus stricte de percentiles 1/99, IQR et moyenne ± 2σ
+export function outlierBoundsSorted(sorted) {
+  const d = describeSorted(sorted);
+  return {
+    min: Math.max(d.p1, d.q1 - 1.5 * d.iqr, d.mean - 2 * d.stdDev),
+    max: Math.min(d.p99, d.q3 + 1.5 * d.iqr, d.mean + 2 * d.stdDev)
+  };
+}
+
+export function outlierBounds(pricesPerM2) {
+  return outlierBoundsSorted(sortedCopy(pricesPerM2));
+}
+
+// Premier indice i tel que sorted[i] >= value (ou > value si `strict`)
+function lowerBound(sorted, value, strict = false) {
+  let lo = 0;
+  let hi = sorted.length;
+  while (lo < hi) {
+    const mid = (lo + hi) >> 1;
+    if (strict ? sorted[mid] <= value : sorted[mid] < value) lo = mid + 1; else hi = mid;
+  }
+  return lo;
+}
+
+// Statistiques d'un jeu de comparables
+// prices, distances, days : tableaux parallèles (Float64Array de préférence)
+// radius / months : fenêtre de recherche utilisée pour les poids (60 % proximité, 40 % récence)
+// Avec cleanOutliers (et au moins 4 ventes), les prix hors outlierBounds sont écartés.
+// kept : indices conservés dans l'ordre d'entrée.
+export function summarizeComparables({
+  prices,
+  distances,
+  days,
+  radius,
+  months,
+  nowDay = epochDayNow(),
+  cleanOutliers = true
+}) {
+  const n = prices.length;
+  const sorted = sortedCopy(prices);
+
+  // Plage conservée : contiguë dans le tableau trié, pas de second tri
+  let min = -Infinity;
+  let max = Infinity;
+  let start = 0;
+  let end = n;
+  if (cleanOutliers && n >= 4) {
+    ({ min, max } = outlierBoundsSorted(sorted));
+    start = lowerBound(sorted, min);
+    end = lowerBound(sorted, max, true);
+  }
+
+  const count = Math.max(0, end - start);
+  const kept = new Uint32Array(count);
+  if (count === 0) {
+    return { count: 0, kept, bounds: { min, max } };
+  }
+
+  // Une passe : moments (Welford), moyenne pondérée, âge moyen, plus proche
+  let k = 0;
+  let mean = 0;
+  let m2 = 0;
+  let weightedSum = 0;
+  let weightSum = 0;
+  let ageSum = 0;
+  let closestDistance = Infinity;
+
+  for (let i = 0; i < n; i++) {
+    const price = prices[i];
+    if (price < min || price > max) continue;
+    kept[k++] = i;
+
+    const delta = price - mean;
+    mean += delta / k;
+    m2 += delta * (price - mean);
+
+    const ageMonths = (nowDay - days[i]) / DAYS_PER_MONTH;
+    const distance = distances[i];
+    const weight = (1 - distance / radius) * 0.6 + (1 - ageMonths / months) * 0.4;
+    weightedSum += price * weight;
+    weightSum += weight;
+    ageSum += ageMonths;
+    if (distance < closestDistance) closestDistance = distance;
+  }
+
+  const stdDev = Math.sqrt(m2 / count);
+  return {
+    count,
+    kept,
+    bounds: { min, max },
+    mean,
+    median: medianSorted(sorted, start, end),
+    stdDev,
+    weightedAverage: weightSum > 0 ? weightedSum / weightSum : mean,
+    avgAgeMonths: ageSum / count,
+    closestDistance
+  };
+}
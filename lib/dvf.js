@@ -1,5 +1,6 @@
 import { getCollection } from './mongodb';
 import { parse } from 'csv-parse/sync';
+import { epochDayNow, saleEpochDay, summarizeComparables } from './dvf-stats.js';
 
 // Haversine formula to calculate distance between two coordinates
 export function calculateDistance(lat1, lon1, lat2, lon2) {
@@ -42,20 +43,28 @@ export async function getDVFComparables({
     date_mutation: { $gte: cutoffDate.toISOString().split('T')[0] },
     surface_reelle_bati: { $gt: 0 },
     valeur_fonciere: { $gt: 0 }
+  }, {
+    // Only the fields needed for statistics; addresses are fetched for the returned comparables
+    projection: { _id: 1, latitude: 1, longitude: 1, date_mutation: 1, date_epoch_day: 1, surface_reelle_bati: 1, valeur_fonciere: 1 }
   }).toArray();
   
-  // Filter by actual distance and surface similarity
-  const comparables = sales
-    .map(sale => {
-      const distance = calculateDistance(lat, lng, sale.latitude, sale.longitude);
-      return { ...sale, distance };
-    })
-    .filter(sale => 
-      sale.distance <= radiusMeters &&
-      sale.surface_reelle_bati >= surface * 0.7 &&
-      sale.surface_reelle_bati <= surface * 1.3
-    )
-    .sort((a, b) => a.distance - b.distance);
+  // Distances kept in a typed array parallel to sales (distances[i] <-> sales[i])
+  const distances = new Float64Array(sales.length);
+  sales.forEach((sale, i) => {
+    distances[i] = calculateDistance(lat, lng, sale.latitude, sale.longitude);
+  });
+  
+  // Filter by actual distance and surface similarity (indices into sales)
+  const comparables = [];
+  for (let i = 0; i < sales.length; i++) {
+    const sale = sales[i];
+    if (distances[i] <= radiusMeters &&
+        sale.surface_reelle_bati >= surface * 0.7 &&
+        sale.surface_reelle_bati <= surface * 1.3) {
+      comparables.push(i);
+    }
+  }
+  comparables.sort((a, b) => distances[a] - distances[b]);
   
   // Calculate statistics
   if (comparables.length === 0) {
@@ -66,64 +75,58 @@ export async function getDVFComparables({
     };
   }
   
-  const pricesPerM2 = comparables.map(c => c.valeur_fonciere / c.surface_reelle_bati);
-  const mean = pricesPerM2.reduce((a, b) => a + b, 0) / pricesPerM2.length;
-  const sortedPrices = [...pricesPerM2].sort((a, b) => a - b);
-  const median = sortedPrices.length % 2 === 0
-    ? (sortedPrices[sortedPrices.length / 2 - 1] + sortedPrices[sortedPrices.length / 2]) / 2
-    : sortedPrices[Math.floor(sortedPrices.length / 2)];
-  
-  // Standard deviation
-  const variance = pricesPerM2.reduce((sum, price) => sum + Math.pow(price - mean, 2), 0) / pricesPerM2.length;
-  const stdDev = Math.sqrt(variance);
-  
-  // Weighted average (by proximity and recency)
-  const now = Date.now();
-  let weightedSum = 0;
-  let weightSum = 0;
-  
-  comparables.forEach(sale => {
-    const pricePerM2 = sale.valeur_fonciere / sale.surface_reelle_bati;
-    const distanceWeight = 1 - (sale.distance / radiusMeters); // Closer = higher weight
-    const saleDate = new Date(sale.date_mutation).getTime();
-    const ageMonths = (now - saleDate) / (1000 * 60 * 60 * 24 * 30);
-    const recencyWeight = 1 - (ageMonths / months); // More recent = higher weight
-    
-    const totalWeight = (distanceWeight * 0.6 + recencyWeight * 0.4);
-    weightedSum += pricePerM2 * totalWeight;
-    weightSum += totalWeight;
+  // Mean, median, standard deviation and proximity/recency weighted average in one sort + one pass
+  const summary = summarizeComparables({
+    prices: Float64Array.from(comparables, i => sales[i].valeur_fonciere / sales[i].surface_reelle_bati),
+    distances: Float64Array.from(comparables, i => distances[i]),
+    days: Float64Array.from(comparables, i => saleEpochDay(sales[i])),
+    radius: radiusMeters,
+    months,
+    nowDay: epochDayNow(),
+    cleanOutliers: false
   });
   
-  const weightedAverage = weightSum > 0 ? weightedSum / weightSum : mean;
-  
   // Confidence index (0-100)
   const countScore = Math.min(comparables.length / 10, 1) * 40; // Max 40 points for count
-  const proximityScore = Math.min(1 - (comparables[0].distance / radiusMeters), 1) * 30; // Max 30 points for proximity
+  const proximityScore = Math.min(1 - (distances[comparables[0]] / radiusMeters), 1) * 30; // Max 30 points for proximity
   const recencyScore = Math.min(1, 1) * 30; // Max 30 points for recency
   const confidenceIndex = Math.round(countScore + proximityScore + recencyScore);
   
+  // Address fields only for the comparables we return
+  const returned = comparables.slice(0, 20);
+  const details = await collection
+    .find({ _id: { $in: returned.map(i => sales[i]._id) } }, {
+      projection: { numero_voie: 1, type_voie: 1, voie: 1, code_postal: 1, commune: 1 }
+    })
+    .toArray();
+  const detailsById = new Map(details.map(d => [String(d._id), d]));
+  
   return {
     count: comparables.length,
     radius: radiusMeters,
     months,
     stats: {
-      meanPricePerM2: Math.round(mean),
-      medianPricePerM2: Math.round(median),
-      stdDev: Math.round(stdDev),
-      weightedAverage: Math.round(weightedAverage),
+      meanPricePerM2: Math.round(summary.mean),
+      medianPricePerM2: Math.round(summary.median),
+      stdDev: Math.round(summary.stdDev),
+      weightedAverage: Math.round(summary.weightedAverage),
       confidenceIndex
     },
-    comparables: comparables.slice(0, 20).map(c => ({
-      id: c._id,
-      address: `${c.numero_voie || ''} ${c.type_voie || ''} ${c.voie || ''}, ${c.code_postal || ''} ${c.commune || ''}`.trim(),
-      price: c.valeur_fonciere,
-      surface: c.surface_reelle_bati,
-      pricePerM2: Math.round(c.valeur_fonciere / c.surface_reelle_bati),
-      date: c.date_mutation,
-      distance: Math.round(c.distance),
-      latitude: c.latitude,
-      longitude: c.longitude
-    }))
+    comparables: returned.map(i => {
+      const c = sales[i];
+      const d = detailsById.get(String(c._id)) || {};
+      return {
+        id: c._id,
+        address: `${d.numero_voie || ''} ${d.type_voie || ''} ${d.voie || ''}, ${d.code_postal || ''} ${d.commune || ''}`.trim(),
+        price: c.valeur_fonciere,
+        surface: c.surface_reelle_bati,
+        pricePerM2: Math.round(c.valeur_fonciere / c.surface_reelle_bati),
+        date: c.date_mutation,
+        distance: Math.round(distances[i]),
+        latitude: c.latitude,
+        longitude: c.longitude
+      };
+    })
   };
 }
 
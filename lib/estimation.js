@@ -0,0 +1,181 @@
+import { getCachedComparables } from './comparables-cache.js';
+import { calculateAdjustments, calculateAdjustedPrice } from './dvf-adjustments.js';
+import { getMarketSnapshot } from './market-snapshots.js';
+import { findAreaAggregate } from './dvf-aggregates.js';
+import { extractPostalCode } from './scraper.js';
+
+// Pipeline d'estimation (DVF + marché)
+// La recherche DVF et le marché SeLoger sont indépendants : ils démarrent ensemble, chacun
+// avec sa propre échéance. La latence est celle de la branche la plus lente (bornée),
+// et une branche en retard donne un résultat partiel (partial: true) plutôt qu'une erreur.
+
+export const DVF_DEADLINE_MS = parseInt(process.env.ESTIMATE_DVF_DEADLINE_MS || '8000', 10);
+export const MARKET_DEADLINE_MS = parseInt(process.env.MARKET_WAIT_MS || '3000', 10);
+
+export const ESTIMATE_DISCLAIMER = 'Estimations basées sur DVF (open data) et ajustements selon caractéristiques — valeurs indicatives, non contractuelles.';
+
+// Paramètres de recherche des comparables pour une estimation
+export const ESTIMATE_SEARCH = {
+  initialRadiusMeters: 500,
+  maxRadiusMeters: 800,
+  months: 24,
+  maxMonths: 36,
+  minComparables: 8
+};
+
+// { status: 'ok', value } | { status: 'timeout' } | { status: 'error', error }
+function settleWithin(promise, deadlineMs) {
+  let timer;
+  const timeout = new Promise(resolve => {
+    timer = setTimeout(() => resolve({ status: 'timeout' }), deadlineMs);
+  });
+  const settled = promise.then(
+    value => ({ status: 'ok', value }),
+    error => ({ status: 'error', error })
+  );
+  return Promise.race([settled, timeout]).finally(() => clearTimeout(timer));
+}
+
+// Ajustements et fourchette de prix à partir des comparables
+export function priceFromComparables(dvfResult, { type, surface, characteristics }) {
+  if (!dvfResult?.stats) {
+    return { adjustments: null, finalPrice: null };
+  }
+
+  const adjustmentResult = calculateAdjustments(
+    { ...characteristics, type, surface },
+    dvfResult
+  );
+
+  const priceData = calculateAdjustedPrice(
+    dvfResult.stats.weightedAverage,
+    surface,
+    adjustmentResult,
+    dvfResult
+  );
+
+  return {
+    adjustments: {
+      ...adjustmentResult,
+      ...priceData
+    },
+    finalPrice: {
+      mid: priceData.priceMid,
+      low: priceData.priceLow,
+      high: priceData.priceHigh,
+      confidence: priceData.confidence
+    }
+  };
+}
+
+// Écart relatif au-delà duquel le prix des comparables est signalé face à la médiane du secteur
+const PRIOR_MAX_DEVIATION = 0.35;
+
+// Confronter le résultat DVF à l'agrégat du secteur (dvf_aggregates)
+// - aucun comparable : repli sur la médiane du secteur (dvf.fallback)
+// - sinon : prior de cohérence (dvf.prior), avertissement si l'écart est important
+// Le résultat DVF peut venir du cache : il est copié, jamais modifié.
+export function applyAreaPrior(dvfResult, aggregate) {
+  if (!dvfResult || !aggregate) return dvfResult;
+  const area = {
+    level: aggregate.level,
+    key: aggregate.key,
+    band: aggregate.band,
+    count: aggregate.count,
+    median: aggregate.median,
+    q1: aggregate.q1,
+    q3: aggregate.q3
+  };
+
+  if (!dvfResult.stats) {
+    return {
+      ...dvfResult,
+      stats: {
+        meanPricePerM2: aggregate.mean,
+        medianPricePerM2: aggregate.median,
+        // Écart-type approché par l'écart interquartile (loi normale)
+        stdDev: Math.round((aggregate.q3 - aggregate.q1) / 1.35),
+        weightedAverage: aggregate.median,
+        confidenceIndex: 30
+      },
+      fallback: area,
+      warning: 'Aucun comparable proche : estimation fondée sur les prix médians du secteur. Un RDV avec un expert est recommandé.'
+    };
+  }
+
+  const deviation = (dvfResult.stats.weightedAverage - aggregate.median) / aggregate.median;
+  return {
+    ...dvfResult,
+    prior: { ...area, deviation: Number((deviation * 100).toFixed(1)) },
+    warning: dvfResult.warning || (Math.abs(deviation) > PRIOR_MAX_DEVIATION
+      ? 'Écart important avec les prix médians du secteur - estimation à considérer avec précaution.'
+      : null)
+  };
+}
+
+// Écart (%) entre le marché affiché et le prix ajusté
+export function marketDelta(adjustments, marketStats) {
+  if (!adjustments || !marketStats) return null;
+  const adjustedPrice = adjustments.adjustedPricePerM2;
+  const marketPrice = marketStats.medianPricePerM2;
+  return ((marketPrice - adjustedPrice) / adjustedPrice * 100).toFixed(1);
+}
+
+// Estimation complète d'un bien
+// sources.dvf / sources.market : 'ok' | 'timeout' | 'error'
+// market.pending : le marché n'était pas prêt à l'échéance ; le scrape continue et le
+// client peut le récupérer via /api/market/listings
+export async function runEstimate(
+  { address, lat, lng, type, surface, characteristics },
+  { dvfDeadlineMs = DVF_DEADLINE_MS, marketDeadlineMs = MARKET_DEADLINE_MS, includeMarket = true } = {}
+) {
+  // L'agrégat du secteur est lu en parallèle des comparables ; son absence ne bloque rien
+  const postalCode = address ? extractPostalCode(address) : '';
+  const areaTask = findAreaAggregate({ lat, lng, type, surface, postalCode: postalCode || null })
+    .catch(error => {
+      console.error('DVF area aggregate lookup failed:', error.message);
+      return null;
+    });
+  const dvfTask = Promise.all([getCachedComparables({ lat, lng, type, surface, ...ESTIMATE_SEARCH }), areaTask])
+    .then(([comparables, aggregate]) => {
+      const dvf = applyAreaPrior(comparables, aggregate);
+      return { dvf, ...priceFromComparables(dvf, { type, surface, characteristics }) };
+    });
+
+  let marketTask = null;
+  if (includeMarket) {
+    // Pas encore démarré à l'échéance, le scrape est retiré de la file
+    marketTask = getMarketSnapshot({ address, lat, lng, type, surface }, { queueWaitMs: marketDeadlineMs });
+    marketTask.catch(error => console.error('Market scraping failed:', error.message));
+  }
+
+  const [dvfOutcome, marketOutcome] = await Promise.all([
+    settleWithin(dvfTask, dvfDeadlineMs),
+    marketTask ? settleWithin(marketTask, marketDeadlineMs) : { status: 'skipped' }
+  ]);
+
+  let dvfPart = { dvf: null, adjustments: null, finalPrice: null };
+  if (dvfOutcome.status === 'ok') {
+    dvfPart = dvfOutcome.value;
+  } else if (dvfOutcome.status === 'error') {
+    console.error('DVF lookup failed:', dvfOutcome.error);
+  } else {
+    console.error(`DVF lookup exceeded ${dvfDeadlineMs}ms`);
+  }
+
+  let market = { listings: [], stats: null };
+  if (marketOutcome.status === 'ok') {
+    market = marketOutcome.value;
+  } else if (marketOutcome.status === 'timeout') {
+    market.pending = true;
+  }
+
+  return {
+    ...dvfPart,
+    market,
+    delta: marketDelta(dvfPart.adjustments, market.stats),
+    partial: dvfOutcome.status !== 'ok' || (includeMarket && marketOutcome.status !== 'ok'),
+    sources: { dvf: dvfOutcome.status, market: marketOutcome.status },
+    disclaimer: ESTIMATE_DISCLAIMER
+  };
+}
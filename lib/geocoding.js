@@ -0,0 +1,164 @@
+import { getCollection } from './mongodb.js';
+
+// Géocodage BAN (api-adresse.data.gouv.fr) avec cache à deux niveaux
+// 1) LRU en mémoire, 2) collection MongoDB geocode_cache (TTL index), partagée entre
+//    instances et conservée aux redémarrages.
+// Les requêtes identiques en cours sont fusionnées (single-flight) et l'appel amont, corps
+// de la réponse compris, est coupé après GEOCODE_TIMEOUT_MS.
+//
+// BAN_API_URL permet de pointer vers un stand-in local (ban_mock.py) pour les tests.
+
+export const BAN_API_URL = process.env.BAN_API_URL || 'https://api-adresse.data.gouv.fr';
+
+const GEOCODE_TIMEOUT_MS = parseInt(process.env.GEOCODE_TIMEOUT_MS || '2500', 10);
+const CACHE_TTL_MS = 24 * 60 * 60 * 1000;
+const NEGATIVE_TTL_MS = 10 * 60 * 1000; // adresse introuvable : durée plus courte
+const CACHE_MAX_ENTRIES = parseInt(process.env.GEOCODE_CACHE_MAX_ENTRIES || '5000', 10);
+const SUGGESTION_LIMIT = 5;
+
+const memoryCache = new Map(); // ordre d'insertion = ordre LRU
+const inFlight = new Map();
+let indexesReady = null;
+
+export class GeocodingError extends Error {
+  constructor(message, status) {
+    super(message);
+    this.name = 'GeocodingError';
+    this.status = status;
+  }
+}
+
+// Clé de cache : minuscules, sans accents ni ponctuation, espaces normalisés
+export function normalizeAddressQuery(address) {
+  return address
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+    .replace(/[^a-z0-9]+/g, ' ')
+    .trim();
+}
+
+function readMemory(key) {
+  const entry = memoryCache.get(key);
+  if (!entry) return null;
+  if (entry.expiresAt <= Date.now()) {
+    memoryCache.delete(key);
+    return null;
+  }
+  memoryCache.delete(key);
+  memoryCache.set(key, entry);
+  return entry.suggestions;
+}
+
+function writeMemory(key, suggestions, expiresAt) {
+  memoryCache.delete(key);
+  memoryCache.set(key, { suggestions, expiresAt });
+  while (memoryCache.size > CACHE_MAX_ENTRIES) {
+    memoryCache.delete(memoryCache.keys().next().value);
+  }
+}
+
+async function getCacheCollection() {
+  const collection = await getCollection('geocode_cache');
+  if (!indexesReady) {
+    indexesReady = collection.createIndex({ expires_at: 1 }, { expireAfterSeconds: 0 })
+      .catch(error => {
+        indexesReady = null;
+        throw error;
+      });
+  }
+  await indexesReady;
+  return collection;
+}
+
+// Le cache MongoDB est un accélérateur : une erreur ne doit pas bloquer le géocodage
+async function readStore(key) {
+  try {
+    const collection = await getCacheCollection();
+    const doc = await collection.findOne({ _id: key, expires_at: { $gt: new Date() } });
+    return doc ? { suggestions: doc.suggestions, expiresAt: doc.expires_at.getTime() } : null;
+  } catch (error) {
+    console.error('[Geo] Cache read failed:', error.message);
+    return null;
+  }
+}
+
+async function writeStore(key, suggestions, expiresAt) {
+  try {
+    const collection = await getCacheCollection();
+    await collection.updateOne(
+      { _id: key },
+      { $set: { suggestions, expires_at: new Date(expiresAt) } },
+      { upsert: true }
+    );
+  } catch (error) {
+    console.error('[Geo] Cache write failed:', error.message);
+  }
+}
+
+async function fetchSuggestions(address) {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), GEOCODE_TIMEOUT_MS);
+
+  // Le corps est lu sous la même échéance que les en-têtes : une réponse lente à transmettre
+  // bloquerait sinon l'entrée single-flight et tous les appels fusionnés sur elle
+  let data;
+  try {
+    const response = await fetch(
+      `${BAN_API_URL}/search/?q=${encodeURIComponent(address)}&limit=${SUGGESTION_LIMIT}`,
+      { signal: controller.signal }
+    );
+    if (!response.ok) {
+      throw new GeocodingError(`Geocoding upstream error: ${response.status}`, response.status === 429 ? 503 : 502);
+    }
+    data = await response.json();
+  } catch (error) {
+    if (error instanceof GeocodingError) throw error;
+    if (error.name === 'AbortError') {
+      throw new GeocodingError(`Geocoding timed out after ${GEOCODE_TIMEOUT_MS}ms`, 504);
+    }
+    throw new GeocodingError(`Geocoding unavailable: ${error.message}`, 502);
+  } finally {
+    clearTimeout(timer);
+  }
+
+  return (data.features || []).map(f => ({
+    address: f.properties.label,
+    lat: f.geometry.coordinates[1],
+    lng: f.geometry.coordinates[0],
+    city: f.properties.city,
+    postalCode: f.properties.postcode
+  }));
+}
+
+async function resolveUncached(key, address) {
+  const stored = await readStore(key);
+  if (stored) {
+    writeMemory(key, stored.suggestions, stored.expiresAt);
+    return stored.suggestions;
+  }
+
+  const suggestions = await fetchSuggestions(address);
+  const expiresAt = Date.now() + (suggestions.length > 0 ? CACHE_TTL_MS : NEGATIVE_TTL_MS);
+  writeMemory(key, suggestions, expiresAt);
+  await writeStore(key, suggestions, expiresAt);
+  return suggestions;
+}
+
+// Suggestions pour une adresse ([] si introuvable)
+// Lève GeocodingError (status 502/503/504) si l'API amont échoue ou ne répond pas à temps
+export async function resolveAddress(address) {
+  const key = normalizeAddressQuery(address);
+  if (!key) return [];
+
+  const cached = readMemory(key);
+  if (cached) return cached;
+
+  // Single-flight : une seule requête amont par clé, partagée par les appels concurrents
+  let pending = inFlight.get(key);
+  if (!pending) {
+    pending = resolveUncached(key, address).finally(() => inFlight.delete(key));
+    inFlight.set(key, pending);
+  }
+  return pending;
+}
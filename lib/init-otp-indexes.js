@@ -17,6 +17,8 @@ export async function initOTPIndexes() {
       { expireAfterSeconds: 0, name: 'otp_expiration_index' }
     );
     
+    // Les OTP sont indexés par _id (numéro normalisé, voir otp-state.js) ;
+    // les index par téléphone servent aux documents créés avant ce schéma
     // Index pour les recherches rapides par téléphone
     await collection.createIndex(
       { phone: 1 },
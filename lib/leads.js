@@ -0,0 +1,139 @@
+import { getCollection } from './mongodb.js';
+
+// Liste des leads pour l'administration : pagination par curseur, filtres côté serveur
+// et projection réduite. Le temps de chargement d'une page ne dépend pas du nombre de leads :
+//
+// - tri (createdAt desc, id desc) ; le curseur encode le dernier couple renvoyé et la page
+//   suivante repart de là par l'index, sans skip
+// - filtres statut / raison / période servis par des index composés préfixés par le filtre
+// - la vue liste ne reçoit pas le détail de l'estimation (comparables, annonces...) :
+//   le lead complet est lu par getLead (GET /api/admin/leads/detail)
+
+export const LEADS_PAGE_SIZE = 50;
+export const LEADS_MAX_PAGE_SIZE = 200;
+
+// Champs affichés sur les cartes et dans l'export CSV
+export const LEAD_LIST_PROJECTION = {
+  _id: 0,
+  id: 1,
+  createdAt: 1,
+  name: 1,
+  email: 1,
+  phone: 1,
+  estimationReason: 1,
+  status: 1,
+  syncStatus: 1,
+  'property.address': 1,
+  'property.type': 1,
+  'property.surface': 1,
+  'estimation.finalPrice': 1,
+  commentCount: { $size: { $ifNull: ['$comments', []] } }
+};
+
+const SORT = { createdAt: -1, id: -1 };
+const DATE_ONLY = /^\d{4}-\d{2}-\d{2}$/;
+
+export class LeadQueryError extends Error {
+  constructor(message) {
+    super(message);
+    this.name = 'LeadQueryError';
+    this.status = 400;
+  }
+}
+
+let indexesReady = null;
+
+async function getLeadsCollection() {
+  const collection = await getCollection('leads');
+  if (!indexesReady) {
+    indexesReady = Promise.all([
+      collection.createIndex({ id: 1 }),
+      collection.createIndex({ createdAt: -1, id: -1 }),
+      collection.createIndex({ status: 1, createdAt: -1, id: -1 }),
+      collection.createIndex({ estimationReason: 1, createdAt: -1, id: -1 })
+    ]).catch(error => {
+      indexesReady = null;
+      throw error;
+    });
+  }
+  await indexesReady;
+  return collection;
+}
+
+export function encodeLeadCursor(lead) {
+  return Buffer.from(JSON.stringify([lead.createdAt, lead.id])).toString('base64url');
+}
+
+export function decodeLeadCursor(cursor) {
+  try {
+    const [createdAt, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    if (typeof createdAt === 'string' && typeof id === 'string') return { createdAt, id };
+  } catch {
+    // curseur illisible : erreur ci-dessous
+  }
+  throw new LeadQueryError('Invalid cursor');
+}
+
+// createdAt est une date ISO (chaîne) : les bornes sont comparées au même format.
+// Une date seule en borne haute inclut toute la journée.
+function dateBound(value, { endOfDay = false } = {}) {
+  const date = new Date(value);
+  if (Number.isNaN(date.getTime())) {
+    throw new LeadQueryError(`Invalid date: ${value}`);
+  }
+  if (endOfDay && DATE_ONLY.test(value)) {
+    date.setUTCDate(date.getUTCDate() + 1);
+    return { $lt: date.toISOString() };
+  }
+  return endOfDay ? { $lte: date.toISOString() } : { $gte: date.toISOString() };
+}
+
+export function buildLeadsFilter({ status, reason, type, from, to } = {}) {
+  const filter = {};
+  if (status) filter.status = status;
+  if (reason) filter.estimationReason = reason;
+  if (type) filter['property.type'] = type;
+  if (from || to) {
+    filter.createdAt = {
+      ...(from && dateBound(from)),
+      ...(to && dateBound(to, { endOfDay: true }))
+    };
+  }
+  return filter;
+}
+
+/**
+ * Une page de leads, du plus récent au plus ancien
+ * @param {Object} options - { cursor, limit, status, reason, type, from, to }
+ * @returns {Promise<{leads: Object[], nextCursor: string|null}>}
+ */
+export async function listLeads({ cursor = null, limit = LEADS_PAGE_SIZE, ...filters } = {}) {
+  const pageSize = Math.min(Math.max(parseInt(limit, 10) || LEADS_PAGE_SIZE, 1), LEADS_MAX_PAGE_SIZE);
+  const filter = buildLeadsFilter(filters);
+
+  if (cursor) {
+    const after = decodeLeadCursor(cursor);
+    filter.$or = [
+      { createdAt: { $lt: after.createdAt } },
+      { createdAt: after.createdAt, id: { $lt: after.id } }
+    ];
+  }
+
+  const collection = await getLeadsCollection();
+  // Un lead de plus que la page : indique s'il reste une page suivante
+  const leads = await collection
+    .find(filter, { projection: LEAD_LIST_PROJECTION })
+    .sort(SORT)
+    .limit(pageSize + 1)
+    .toArray();
+
+  const hasMore = leads.length > pageSize;
+  if (hasMore) leads.pop();
+  return { leads, nextCursor: hasMore ? encodeLeadCursor(leads[leads.length - 1]) : null };
+}
+
+// Lead complet (estimation comprise) pour la fiche détail
+export async function getLead(id) {
+  const collection = await getLeadsCollection();
+  return collection.findOne({ id }, { projection: { _id: 0 } });
+}
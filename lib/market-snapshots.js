@@ -0,0 +1,254 @@
+import { getCollection } from './mongodb.js';
+import { scrapeSeLoger, calculateMarketStats, extractPostalCode } from './scraper.js';
+import { SURFACE_BANDS, surfaceBand } from './dvf-stats.js';
+
+// Instantanés du marché SeLoger persistés dans MongoDB (collection market_snapshots)
+// Les annonces ne dépendent que du code postal, du type et de la tranche de surface :
+// une clé (code postal, type, tranche) est scrapée une fois puis partagée.
+//
+// - frais (< MARKET_SNAPSHOT_FRESH_MS) : servi tel quel
+// - périmé (< MARKET_SNAPSHOT_MAX_STALE_MS) : servi immédiatement, rafraîchi en arrière-plan
+//   (stale-while-revalidate)
+// - absent ou trop ancien : scrapé pendant la requête
+// Les scrapes passent par une file à concurrence bornée (MARKET_SCRAPE_CONCURRENCY), en
+// deux voies FIFO bornées : requêtes utilisateur d'abord, puis rafraîchissements de fond.
+// Une requête utilisateur porte une échéance : non démarrée à temps (client reparti, ou
+// estimation qui a renoncé au marché), elle est abandonnée sans lancer Chromium.
+
+const FRESH_MS = parseInt(process.env.MARKET_SNAPSHOT_FRESH_MS || String(6 * 60 * 60 * 1000), 10);
+const MAX_STALE_MS = parseInt(process.env.MARKET_SNAPSHOT_MAX_STALE_MS || String(7 * 24 * 60 * 60 * 1000), 10);
+const SCRAPE_CONCURRENCY = parseInt(process.env.MARKET_SCRAPE_CONCURRENCY || '2', 10);
+const REFRESH_QUEUE_MAX = parseInt(process.env.MARKET_REFRESH_QUEUE_MAX || '50', 10);
+const PRIORITY_QUEUE_MAX = parseInt(process.env.MARKET_PRIORITY_QUEUE_MAX || '20', 10);
+// Attente maximale d'une requête utilisateur dans la file avant le début du scrape
+const PRIORITY_WAIT_MS = parseInt(process.env.MARKET_PRIORITY_WAIT_MS || '30000', 10);
+// Bail de rafraîchissement : une seule instance scrape une clé périmée à la fois
+const REFRESH_LEASE_MS = 2 * 60 * 1000;
+const MAX_STORED_LISTINGS = 20;
+
+// clé → { promise, job } (job.started une fois retiré de la file)
+const inFlight = new Map();
+const queue = [];
+const priorityQueue = [];
+let running = 0;
+let indexesReady = null;
+
+// Fourchette de recherche SeLoger d'une tranche (±10 % pour couvrir les bords)
+function bandRange(band) {
+  const min = SURFACE_BANDS[band];
+  const max = SURFACE_BANDS[band + 1] ?? min * 2;
+  return { min: Math.floor(min * 0.9), max: Math.ceil(max * 1.1) };
+}
+
+// null sans code postal : la recherche SeLoger ne serait pas localisée (annonces de toute la
+// France) et la clé serait partagée par toutes les adresses dans ce cas
+export function marketSnapshotKey({ address, type, surface }) {
+  const postalCode = extractPostalCode(address);
+  return postalCode ? `${postalCode}|${type}|${surfaceBand(surface)}` : null;
+}
+
+const NO_MARKET = { listings: [], stats: null, fetchedAt: null, stale: false };
+
+async function getSnapshotCollection() {
+  const collection = await getCollection('market_snapshots');
+  if (!indexesReady) {
+    indexesReady = Promise.all([
+      collection.createIndex({ last_hit_at: -1, hits: -1 }),
+      collection.createIndex({ fetched_at: 1 })
+    ]).catch(error => {
+      indexesReady = null;
+      throw error;
+    });
+  }
+  await indexesReady;
+  return collection;
+}
+
+// File de scrapes : `priority` (requête utilisateur en attente) passe devant les rafraîchissements
+// `deadline` (timestamp) : au-delà, un job pas encore démarré est abandonné
+function enqueueScrape(task, { priority = false, deadline = null } = {}) {
+  const lane = priority ? priorityQueue : queue;
+  if (lane.length >= (priority ? PRIORITY_QUEUE_MAX : REFRESH_QUEUE_MAX)) {
+    return { promise: Promise.reject(new Error(priority ? 'Market scrape queue full' : 'Market refresh queue full')), job: null };
+  }
+  const job = { task, deadline };
+  const promise = new Promise((resolve, reject) => {
+    Object.assign(job, { resolve, reject });
+  });
+  lane.push(job);
+  drainQueue();
+  return { promise, job };
+}
+
+function nextJob() {
+  while (priorityQueue.length > 0) {
+    const job = priorityQueue.shift();
+    if (!job.deadline || job.deadline > Date.now()) return job;
+    job.reject(new Error('Market scrape expired in queue'));
+  }
+  return queue.shift();
+}
+
+function drainQueue() {
+  while (running < SCRAPE_CONCURRENCY) {
+    const job = nextJob();
+    if (!job) return;
+    job.started = true;
+    running++;
+    job.task()
+      .then(job.resolve, job.reject)
+      .finally(() => {
+        running--;
+        drainQueue();
+      });
+  }
+}
+
+function toResult(doc, now = Date.now()) {
+  return {
+    listings: doc.listings,
+    stats: doc.stats,
+    fetchedAt: doc.fetched_at.toISOString(),
+    stale: now - doc.fetched_at.getTime() > FRESH_MS
+  };
+}
+
+// Scraper une clé et enregistrer l'instantané
+async function scrapeAndStore(key, params) {
+  const [postalCode, type, band] = key.split('|');
+  const listings = await scrapeSeLoger({ ...params, surfaceRange: bandRange(Number(band)) });
+  const doc = {
+    postal_code: postalCode,
+    type,
+    band: Number(band),
+    address: params.address,
+    surface: params.surface,
+    listings: listings.slice(0, MAX_STORED_LISTINGS),
+    stats: calculateMarketStats(listings),
+    fetched_at: new Date()
+  };
+
+  const collection = await getSnapshotCollection();
+  await collection.updateOne(
+    { _id: key },
+    { $set: doc, $unset: { refreshing_until: '' } },
+    { upsert: true }
+  );
+  return toResult(doc);
+}
+
+// Un seul scrape par clé dans ce process
+// Une requête qui rejoint un job en attente repousse son échéance à la sienne.
+function scrapeOnce(key, params, options) {
+  const pending = inFlight.get(key);
+  if (pending) {
+    const { job } = pending;
+    if (job && !job.started && job.deadline && options.deadline) {
+      job.deadline = Math.max(job.deadline, options.deadline);
+    }
+    return pending.promise;
+  }
+  const { promise, job } = enqueueScrape(() => scrapeAndStore(key, params), options);
+  const entry = { promise: promise.finally(() => inFlight.delete(key)), job };
+  inFlight.set(key, entry);
+  return entry.promise;
+}
+
+async function refreshInBackground(key, params) {
+  if (inFlight.has(key)) return;
+  const collection = await getSnapshotCollection();
+  const now = new Date();
+  // Prendre le bail : les autres instances servent l'instantané périmé sans scraper
+  const lease = await collection.updateOne(
+    { _id: key, $or: [{ refreshing_until: { $exists: false } }, { refreshing_until: { $lt: now } }] },
+    { $set: { refreshing_until: new Date(now.getTime() + REFRESH_LEASE_MS) } }
+  );
+  if (lease.modifiedCount === 0) return;
+  await scrapeOnce(key, params, { priority: false });
+}
+
+// Annonces et statistiques du marché pour un bien ({ listings, stats, fetchedAt, stale })
+// queueWaitMs : attente maximale dans la file si un scrape est nécessaire
+export async function getMarketSnapshot(params, { queueWaitMs = PRIORITY_WAIT_MS } = {}) {
+  const key = marketSnapshotKey(params);
+  if (!key) return NO_MARKET;
+  const collection = await getSnapshotCollection();
+  const snapshot = await collection.findOneAndUpdate(
+    { _id: key },
+    { $inc: { hits: 1 }, $set: { last_hit_at: new Date() } },
+    { returnDocument: 'after', projection: { listings: 1, stats: 1, fetched_at: 1 } }
+  );
+
+  if (snapshot?.fetched_at) {
+    const age = Date.now() - snapshot.fetched_at.getTime();
+    if (age <= FRESH_MS) return toResult(snapshot);
+    if (age <= MAX_STALE_MS) {
+      refreshInBackground(key, params).catch(error => {
+        console.error(`[Market] Refresh ${key} failed:`, error.message);
+      });
+      return toResult(snapshot);
+    }
+  }
+
+  return scrapeOnce(key, params, { priority: true, deadline: Date.now() + queueWaitMs });
+}
+
+// Lecture sans attente (estimations en lot) : l'instantané existant, même périmé, ou null.
+// Les clés absentes ou périmées sont rafraîchies en arrière-plan, dans la limite de la file.
+export async function peekMarketSnapshot(params) {
+  const key = marketSnapshotKey(params);
+  if (!key) return null;
+  const collection = await getSnapshotCollection();
+  const snapshot = await collection.findOne(
+    { _id: key },
+    { projection: { listings: 1, stats: 1, fetched_at: 1 } }
+  );
+
+  if (snapshot?.fetched_at && Date.now() - snapshot.fetched_at.getTime() <= FRESH_MS) {
+    return toResult(snapshot);
+  }
+
+  const refresh = snapshot
+    ? refreshInBackground(key, params)
+    : inFlight.has(key) ? Promise.resolve() : scrapeOnce(key, params, { priority: false });
+  refresh.catch(error => console.error(`[Market] Refresh ${key} failed:`, error.message));
+
+  return snapshot?.fetched_at && Date.now() - snapshot.fetched_at.getTime() <= MAX_STALE_MS
+    ? toResult(snapshot)
+    : null;
+}
+
+// Rafraîchir à l'avance les clés les plus demandées (appelé par un job planifié)
+export async function refreshHotSnapshots({ limit = 50, hitWindowMs = 24 * 60 * 60 * 1000 } = {}) {
+  const collection = await getSnapshotCollection();
+  const now = Date.now();
+  const hot = await collection
+    .find(
+      {
+        last_hit_at: { $gte: new Date(now - hitWindowMs) },
+        fetched_at: { $lt: new Date(now - FRESH_MS * 0.8) }
+      },
+      { projection: { address: 1, type: 1, surface: 1 } }
+    )
+    .sort({ hits: -1 })
+    .limit(limit)
+    .toArray();
+
+  const results = await Promise.allSettled(
+    hot.map(doc => refreshInBackground(doc._id, { address: doc.address, type: doc.type, surface: doc.surface }))
+  );
+  return {
+    candidates: hot.length,
+    failed: results.filter(r => r.status === 'rejected').length
+  };
+}
+
+export function getMarketScrapeStats() {
+  return {
+    running,
+    queued: queue.length + priorityQueue.length,
+    priorityQueued: priorityQueue.length,
+    inFlight: inFlight.size,
+    concurrency: SCRAPE_CONCURRENCY
+  };
+}
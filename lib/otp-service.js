@@ -2,6 +2,9 @@
  * Service de gestion des OTP avec Brevo SMS
  */
 
+// URL de l'API Brevo (surchargeable pour pointer vers un stub local en test/charge)
+export const BREVO_API_URL = process.env.BREVO_API_URL || 'https://api.brevo.com/v3';
+
 /**
  * Génère un code OTP aléatoire
  * @param {number} length - Longueur du code (par défaut 6)
@@ -88,7 +91,7 @@ export async function sendOTPSMS(phone, code) {
   }
   
   try {
-    const response = await fetch('https://api.brevo.com/v3/transactionalSMS/sms', {
+    const response = await fetch(`${BREVO_API_URL}/transactionalSMS/sms`, {
       method: 'POST',
       headers: {
         'accept': 'application/json',
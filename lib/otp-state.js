@@ -0,0 +1,128 @@
+/**
+ * Cycle de vie des OTP : un document par numéro (_id = numéro E.164)
+ * Chaque appel fait une seule opération MongoDB atomique ; le cooldown, l'expiration et
+ * le compteur de tentatives sont évalués dans le prédicat ou le pipeline de mise à jour,
+ * ce qui supprime les courses « lecture puis écriture » entre requêtes concurrentes.
+ *
+ *   (absent | vérifié | créé il y a plus de 30 s) --issueOTP--> en attente
+ *   en attente --verifyOTP(code correct)--> vérifié
+ *   en attente --verifyOTP(code faux)--> en attente (attempts + 1)
+ *
+ * L'index TTL sur expiresAt (init-otp-indexes.js, créé au premier accès) supprime les
+ * documents expirés ; un code bloqué reste bloqué jusqu'à son expiration.
+ */
+
+import { getCollection } from './mongodb.js';
+import { generateOTP, calculateExpirationTime } from './otp-service.js';
+import { initOTPIndexes } from './init-otp-indexes.js';
+
+export const OTP_COOLDOWN_MS = 30 * 1000;
+export const OTP_TTL_MINUTES = 5;
+export const MAX_OTP_ATTEMPTS = parseInt(process.env.MAX_OTP_ATTEMPTS) || 5;
+
+const DUPLICATE_KEY = 11000;
+
+let indexesReady = null;
+
+async function getOTPCollection() {
+  if (!indexesReady) {
+    // initOTPIndexes journalise ses erreurs : nouvel essai au prochain appel
+    indexesReady = initOTPIndexes().then(ok => {
+      if (!ok) indexesReady = null;
+    });
+  }
+  await indexesReady;
+  return getCollection('otp_verifications');
+}
+
+/**
+ * Émet un nouveau code pour ce numéro, sauf pendant le cooldown
+ * Upsert conditionnel : si un code en attente a moins de 30 s, le filtre ne correspond pas,
+ * l'insertion bute sur _id et l'erreur de clé dupliquée signale le cooldown.
+ * @param {string} phone - Numéro normalisé (+33...)
+ * @returns {Promise<{status: 'issued', code: string, expiresAt: Date} | {status: 'cooldown'}>}
+ */
+export async function issueOTP(phone) {
+  const collection = await getOTPCollection();
+  const now = new Date();
+  const code = generateOTP(6);
+  const expiresAt = calculateExpirationTime(OTP_TTL_MINUTES);
+
+  try {
+    await collection.updateOne(
+      {
+        _id: phone,
+        $or: [{ verified: true }, { createdAt: { $lte: new Date(now.getTime() - OTP_COOLDOWN_MS) } }]
+      },
+      {
+        $set: { phone, code, createdAt: now, expiresAt, verified: false, attempts: 0 },
+        $unset: { verifiedAt: '', lastOutcome: '' }
+      },
+      { upsert: true }
+    );
+  } catch (error) {
+    if (error.code === DUPLICATE_KEY) {
+      return { status: 'cooldown' };
+    }
+    throw error;
+  }
+
+  return { status: 'issued', code, expiresAt };
+}
+
+/**
+ * Annule un code dont le SMS n'a pas pu partir (le cooldown ne bloque pas un nouvel essai)
+ * Ne supprime que ce code : une émission concurrente plus récente est conservée.
+ */
+export async function cancelOTP(phone, code) {
+  const collection = await getOTPCollection();
+  await collection.deleteOne({ _id: phone, code, verified: false });
+}
+
+/**
+ * Vérifie un code en une mise à jour par pipeline
+ * L'issue est calculée à partir de l'état du document au moment de la mise à jour :
+ * deux vérifications concurrentes ne peuvent pas dépasser le nombre de tentatives.
+ * @returns {Promise<{outcome: 'not_found' | 'expired' | 'locked' | 'invalid' | 'verified', attemptsRemaining?: number}>}
+ */
+export async function verifyOTP(phone, code, maxAttempts = MAX_OTP_ATTEMPTS) {
+  const collection = await getOTPCollection();
+  const now = new Date();
+
+  const record = await collection.findOneAndUpdate(
+    { _id: phone, verified: false },
+    [
+      {
+        $set: {
+          lastOutcome: {
+            $switch: {
+              // Blocage avant expiration : après la limite, chaque essai reste « locked »
+              branches: [
+                { case: { $gte: ['$attempts', maxAttempts] }, then: 'locked' },
+                { case: { $lte: ['$expiresAt', now] }, then: 'expired' },
+                { case: { $eq: ['$code', { $literal: String(code) }] }, then: 'verified' }
+              ],
+              default: 'invalid'
+            }
+          }
+        }
+      },
+      {
+        $set: {
+          verified: { $eq: ['$lastOutcome', 'verified'] },
+          verifiedAt: { $cond: [{ $eq: ['$lastOutcome', 'verified'] }, now, '$$REMOVE'] },
+          attempts: { $cond: [{ $eq: ['$lastOutcome', 'invalid'] }, { $add: ['$attempts', 1] }, '$attempts'] }
+        }
+      }
+    ],
+    { returnDocument: 'after', projection: { lastOutcome: 1, attempts: 1 } }
+  );
+
+  if (!record) {
+    return { outcome: 'not_found' };
+  }
+  if (record.lastOutcome === 'invalid') {
+    return { outcome: 'invalid', attemptsRemaining: Math.max(0, maxAttempts - record.attempts) };
+  }
+  return { outcome: record.lastOutcome };
+}
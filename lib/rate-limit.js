@@ -0,0 +1,199 @@
+import { getCollection } from './mongodb.js';
+
+// Limitation de débit par client (IP) et par route : seau à jetons
+// Chaque politique a une capacité (rafale autorisée) et un débit de recharge.
+// Un client au-delà de sa limite reçoit 429 + Retry-After avant tout accès à MongoDB,
+// au scraper ou à Brevo.
+//
+// - seau en mémoire (toujours consulté en premier) : limite par instance, sans I/O
+// - magasin partagé optionnel (RATE_LIMIT_BACKEND=mongo) : limite commune à toutes les
+//   instances, une mise à jour atomique par requête ; en cas d'erreur, la décision locale
+//   s'applique (fail-open)
+// Un autre magasin (Redis, ...) peut être branché avec setRateLimitStore : il suffit d'une
+// méthode take(key, policy, now) -> { allowed, tokens }.
+
+export const RATE_LIMIT_ENABLED = process.env.RATE_LIMIT_DISABLED !== 'true';
+const BACKEND = process.env.RATE_LIMIT_BACKEND || 'memory';
+// IP du client : chaque proxy ajoute à droite de X-Forwarded-For l'adresse qui l'a contacté,
+// le client contrôle tout ce qui est à gauche. Avec N proxys de confiance devant l'application,
+// l'IP du client est la N-ième entrée en partant de la droite.
+// RATE_LIMIT_IP_HEADER désigne à la place un en-tête à valeur unique écrit par le proxy
+// (x-real-ip, cf-connecting-ip...). Avec 0 proxy, request.ip (absent en runtime Node).
+const TRUSTED_PROXIES = parseInt(process.env.RATE_LIMIT_TRUSTED_PROXIES || '1', 10);
+const IP_HEADER = process.env.RATE_LIMIT_IP_HEADER?.toLowerCase() || null;
+const MAX_MEMORY_KEYS = parseInt(process.env.RATE_LIMIT_MAX_KEYS || '10000', 10);
+
+const MINUTE = 60;
+
+// Politiques par « MÉTHODE chemin » : capacity jetons, rechargés de capacity par `per` secondes
+export const RATE_LIMIT_POLICIES = {
+  'POST /api/estimate': { capacity: 10, per: MINUTE },
+  'POST /api/estimate/batch': { capacity: 3, per: 10 * MINUTE },
+  'GET /api/market/listings': { capacity: 20, per: MINUTE },
+  'GET /api/dvf/comparables': { capacity: 30, per: MINUTE },
+  'GET /api/geo/resolve': { capacity: 60, per: MINUTE },
+  'POST /api/verification/send-otp': { capacity: 5, per: 10 * MINUTE },
+  'POST /api/verification/resend-otp': { capacity: 5, per: 10 * MINUTE },
+  'POST /api/verification/verify-otp': { capacity: 20, per: 10 * MINUTE },
+  'POST /api/auth/login': { capacity: 10, per: 10 * MINUTE },
+  'POST /api/leads': { capacity: 10, per: 10 * MINUTE }
+};
+
+function refillRate(policy) {
+  return policy.capacity / policy.per; // jetons par seconde
+}
+
+// Seau en mémoire ; l'ordre d'insertion de la Map sert d'ordre LRU
+export class MemoryBucketStore {
+  constructor(maxKeys = MAX_MEMORY_KEYS) {
+    this.buckets = new Map();
+    this.maxKeys = maxKeys;
+  }
+
+  take(key, policy, now = Date.now()) {
+    const rate = refillRate(policy);
+    const bucket = this.buckets.get(key);
+    let tokens = policy.capacity;
+    if (bucket) {
+      tokens = Math.min(policy.capacity, bucket.tokens + ((now - bucket.updatedAt) / 1000) * rate);
+      this.buckets.delete(key);
+    }
+    const allowed = tokens >= 1;
+    if (allowed) tokens -= 1;
+    this.buckets.set(key, { tokens, updatedAt: now });
+
+    while (this.buckets.size > this.maxKeys) {
+      this.buckets.delete(this.buckets.keys().next().value);
+    }
+    return { allowed, tokens };
+  }
+}
+
+// Seau partagé dans MongoDB (collection rate_limits) : recharge et prélèvement calculés
+// dans une seule mise à jour par pipeline, sans course entre instances
+export class MongoBucketStore {
+  constructor(collectionName = 'rate_limits') {
+    this.collectionName = collectionName;
+    this.indexesReady = null;
+  }
+
+  async collection() {
+    const collection = await getCollection(this.collectionName);
+    if (!this.indexesReady) {
+      this.indexesReady = collection.createIndex({ expiresAt: 1 }, { expireAfterSeconds: 0 }).catch(error => {
+        this.indexesReady = null;
+        throw error;
+      });
+    }
+    await this.indexesReady;
+    return collection;
+  }
+
+  async take(key, policy, now = Date.now()) {
+    const collection = await this.collection();
+    const at = new Date(now);
+    const rate = refillRate(policy);
+    const bucket = await collection.findOneAndUpdate(
+      { _id: key },
+      [
+        {
+          $set: {
+            tokens: {
+              $min: [
+                policy.capacity,
+                {
+                  $add: [
+                    { $ifNull: ['$tokens', policy.capacity] },
+                    { $multiply: [{ $divide: [{ $subtract: [at, { $ifNull: ['$updatedAt', at] }] }, 1000] }, rate] }
+                  ]
+                }
+              ]
+            }
+          }
+        },
+        { $set: { allowed: { $gte: ['$tokens', 1] } } },
+        {
+          $set: {
+            tokens: { $cond: ['$allowed', { $subtract: ['$tokens', 1] }, '$tokens'] },
+            updatedAt: at,
+            // Seau plein à nouveau : le document peut disparaître
+            expiresAt: new Date(now + policy.per * 1000)
+          }
+        }
+      ],
+      { upsert: true, returnDocument: 'after', projection: { allowed: 1, tokens: 1 } }
+    );
+    return { allowed: bucket.allowed, tokens: bucket.tokens };
+  }
+}
+
+const localStore = new MemoryBucketStore();
+let sharedStore = BACKEND === 'mongo' ? new MongoBucketStore() : null;
+
+export function setRateLimitStore(store) {
+  sharedStore = store;
+}
+
+export class ClientIpError extends Error {
+  constructor(message) {
+    super(message);
+    this.name = 'ClientIpError';
+  }
+}
+
+// Pas de repli sur une clé commune : tous les clients partageraient la même limite
+export function clientIp(request, { trustedProxies = TRUSTED_PROXIES, ipHeader = IP_HEADER } = {}) {
+  if (ipHeader) {
+    const value = request.headers.get(ipHeader)?.trim();
+    if (value) return value;
+    throw new ClientIpError(`Missing ${ipHeader} header (RATE_LIMIT_IP_HEADER)`);
+  }
+
+  if (trustedProxies > 0) {
+    const hops = (request.headers.get('x-forwarded-for') || '')
+      .split(',')
+      .map(hop => hop.trim())
+      .filter(Boolean);
+    if (hops.length >= trustedProxies) return hops[hops.length - trustedProxies];
+    throw new ClientIpError(
+      `X-Forwarded-For has ${hops.length} hop(s), expected at least ${trustedProxies} (RATE_LIMIT_TRUSTED_PROXIES)`
+    );
+  }
+
+  if (request.ip) return request.ip;
+  throw new ClientIpError('request.ip unavailable: set RATE_LIMIT_TRUSTED_PROXIES or RATE_LIMIT_IP_HEADER');
+}
+
+function decision(policy, { allowed, tokens }) {
+  const retryAfter = allowed ? 0 : Math.max(1, Math.ceil((1 - tokens) / refillRate(policy)));
+  return { allowed, limit: policy.capacity, remaining: Math.max(0, Math.floor(tokens)), retryAfter };
+}
+
+// Décision pour une requête, null si la route n'a pas de politique
+// { allowed, limit, remaining, retryAfter (secondes) }
+export async function checkRateLimit(request, pathname) {
+  const routeKey = `${request.method} ${pathname}`;
+  const policy = RATE_LIMIT_POLICIES[routeKey];
+  if (!RATE_LIMIT_ENABLED || !policy) return null;
+
+  const key = `${routeKey}|${clientIp(request)}`;
+  const local = decision(policy, localStore.take(key, policy));
+  if (!local.allowed || !sharedStore) return local;
+
+  try {
+    return decision(policy, await sharedStore.take(key, policy));
+  } catch (error) {
+    console.error('[RateLimit] Shared store unavailable, using local limit:', error.message);
+    return local;
+  }
+}
+
+// En-têtes à joindre à la réponse (429 ou non)
+export function rateLimitHeaders(result) {
+  const headers = {
+    'X-RateLimit-Limit': String(result.limit),
+    'X-RateLimit-Remaining': String(result.remaining)
+  };
+  if (!result.allowed) headers['Retry-After'] = String(result.retryAfter);
+  return headers;
+}
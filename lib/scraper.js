@@ -1,80 +1,82 @@
-import puppeteer from 'puppeteer';
+import { withPage } from './browser-pool.js';
+
+// Échéance stricte d'un scrape (file d'attente du pool comprise)
+export const SCRAPE_DEADLINE_MS = parseInt(process.env.SCRAPE_DEADLINE_MS || '12000', 10);
+
+// Extract postal code from address ('' si absent)
+// Parties lues de la fin vers le début : « …, 75009 Paris, France » donne 75009
+export function extractPostalCode(address) {
+  const addressParts = address.split(',').reverse();
+  for (const part of addressParts) {
+    const postalMatch = part.match(/\b(\d{5})\b/);
+    if (postalMatch) return postalMatch[1];
+  }
+  return '';
+}
+
+// Build SeLoger search URL
+// surfaceRange ({ min, max }) remplace la fourchette par défaut de ±30 % autour de surface
+export function buildSeLogerUrl({ address, type, surface, surfaceRange }) {
+  const postalCode = extractPostalCode(address);
+  const propertyType = type === 'appartement' ? 'appartement' : 'maison';
+  const minSurface = surfaceRange ? surfaceRange.min : Math.floor(surface * 0.7);
+  const maxSurface = surfaceRange ? surfaceRange.max : Math.ceil(surface * 1.3);
+
+  return `https://www.seloger.com/list.htm?types=${propertyType === 'appartement' ? '1' : '2'}&projects=2&places=[{%22inseeCodes%22:[${postalCode}]}]&surface=${minSurface}/${maxSurface}&sort=d_dt_crea`;
+}
 
 // Scrape SeLoger for active listings
-export async function scrapeSeLoger({ address, lat, lng, type, surface }) {
-  let browser;
-  
+// S'exécute sur une page du navigateur partagé (lib/browser-pool.js) ; lève
+// ScrapeTimeoutError au-delà de deadlineMs
+export async function scrapeSeLoger({ address, lat, lng, type, surface, surfaceRange }, { deadlineMs = SCRAPE_DEADLINE_MS } = {}) {
+  const searchUrl = buildSeLogerUrl({ address, type, surface, surfaceRange });
+
   try {
-    browser = await puppeteer.launch({
-      headless: 'new',
-      args: [
-        '--no-sandbox',
-        '--disable-setuid-sandbox',
-        '--disable-dev-shm-usage',
-        '--disable-gpu'
-      ]
-    });
-    
-    const page = await browser.newPage();
-    
-    // Set user agent to avoid detection
-    await page.setUserAgent('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36');
-    
-    // Extract city and postal code from address
-    const addressParts = address.split(',');
-    const cityPart = addressParts[addressParts.length - 1]?.trim() || '';
-    const postalMatch = cityPart.match(/(\d{5})/);
-    const postalCode = postalMatch ? postalMatch[1] : '';
-    
-    const propertyType = type === 'appartement' ? 'appartement' : 'maison';
-    
-    // Build SeLoger search URL
-    const searchUrl = `https://www.seloger.com/list.htm?types=${propertyType === 'appartement' ? '1' : '2'}&projects=2&places=[{%22inseeCodes%22:[${postalCode}]}]&surface=${Math.floor(surface * 0.7)}/${Math.ceil(surface * 1.3)}&sort=d_dt_crea`;
-    
-    await page.goto(searchUrl, { waitUntil: 'networkidle2', timeout: 30000 });
-    
-    // Wait for listings to load
-    await page.waitForSelector('.CardList-wrapper', { timeout: 10000 }).catch(() => {});
-    
-    // Extract listings
-    const listings = await page.evaluate(() => {
-      const items = [];
-      const cards = document.querySelectorAll('.SingleCard');
-      
-      cards.forEach(card => {
-        try {
-          const titleEl = card.querySelector('.SingleCard-title');
-          const priceEl = card.querySelector('.SingleCard-price');
-          const surfaceEl = card.querySelector('.SingleCard-surface');
-          const linkEl = card.querySelector('a');
-          
-          if (titleEl && priceEl && surfaceEl) {
-            const title = titleEl.textContent.trim();
-            const priceText = priceEl.textContent.trim().replace(/\s/g, '');
-            const price = parseInt(priceText.replace(/[^0-9]/g, ''));
-            const surfaceText = surfaceEl.textContent.trim();
-            const surfaceMatch = surfaceText.match(/(\d+)/);
-            const surface = surfaceMatch ? parseInt(surfaceMatch[1]) : 0;
-            const url = linkEl ? 'https://www.seloger.com' + linkEl.getAttribute('href') : '';
-            
-            if (price && surface && url) {
-              items.push({ title, price, surface, url });
+    const listings = await withPage(async (page) => {
+      // Les CSS/images sont bloqués : le DOM suffit, inutile d'attendre networkidle
+      await page.goto(searchUrl, { waitUntil: 'domcontentloaded' });
+
+      // Wait for listings to load
+      await page.waitForSelector('.CardList-wrapper', { timeout: 5000 }).catch(() => {});
+
+      // Extract listings
+      return page.evaluate(() => {
+        const items = [];
+        const cards = document.querySelectorAll('.SingleCard');
+
+        cards.forEach(card => {
+          try {
+            const titleEl = card.querySelector('.SingleCard-title');
+            const priceEl = card.querySelector('.SingleCard-price');
+            const surfaceEl = card.querySelector('.SingleCard-surface');
+            const linkEl = card.querySelector('a');
+
+            if (titleEl && priceEl && surfaceEl) {
+              const title = titleEl.textContent.trim();
+              const priceText = priceEl.textContent.trim().replace(/\s/g, '');
+              const price = parseInt(priceText.replace(/[^0-9]/g, ''));
+              const surfaceText = surfaceEl.textContent.trim();
+              const surfaceMatch = surfaceText.match(/(\d+)/);
+              const surface = surfaceMatch ? parseInt(surfaceMatch[1]) : 0;
+              const url = linkEl ? 'https://www.seloger.com' + linkEl.getAttribute('href') : '';
+
+              if (price && surface && url) {
+                items.push({ title, price, surface, url });
+              }
             }
+          } catch (e) {
+            // Skip invalid cards
           }
-        } catch (e) {
-          // Skip invalid cards
-        }
+        });
+
+        return items;
       });
-      
-      return items;
-    });
-    
-    await browser.close();
-    
+    }, { deadlineMs });
+
     // Deduplicate by URL
     const uniqueListings = [];
     const seenUrls = new Set();
-    
+
     for (const listing of listings) {
       if (!seenUrls.has(listing.url)) {
         seenUrls.add(listing.url);
@@ -86,13 +88,10 @@ export async function scrapeSeLoger({ address, lat, lng, type, surface }) {
         });
       }
     }
-    
+
     return uniqueListings;
   } catch (error) {
-    if (browser) {
-      await browser.close();
-    }
-    console.error('SeLoger scraping error:', error);
+    console.error('SeLoger scraping error:', error.message);
     throw error;
   }
 }
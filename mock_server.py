@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio HTTP/1.1 server shared by the local upstream stand-ins
+(brevo_mock.py, ban_mock.py): keep-alive JSON request/response handling,
+a configurable latency/failure/throttle profile and background-thread
+lifecycle for tests.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+REASONS = {
+    200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request",
+    401: "Unauthorized", 402: "Payment Required", 404: "Not Found",
+    429: "Too Many Requests", 500: "Internal Server Error", 502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+class Profile:
+    """Upstream behaviour: latency, random failures and throttling"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, error_status=500, max_rps=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_rps = max_rps
+
+    def update(self, **values):
+        for key, value in values.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+    def as_dict(self):
+        return {
+            'latency_ms': self.latency_ms,
+            'jitter_ms': self.jitter_ms,
+            'error_rate': self.error_rate,
+            'error_status': self.error_status,
+            'max_rps': self.max_rps,
+        }
+
+class TokenBucket:
+    """Throttle shared by all API calls, refilled at max_rps"""
+
+    def __init__(self):
+        self.tokens = None
+        self.updated = time.monotonic()
+
+    def take(self, rate):
+        now = time.monotonic()
+        if self.tokens is None:
+            self.tokens = rate
+        self.tokens = min(rate, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class MockServer:
+    """Base class: subclasses implement handle(method, target, headers, body)"""
+
+    name = "mock"
+
+    def __init__(self, host, port, profile=None, seed=None):
+        self.host = host
+        self.port = port
+        self.profile = profile or Profile()
+        self.random = random.Random(seed)
+        self.bucket = TokenBucket()
+        self.lock = threading.Lock()
+        self._loop = None
+        self._task = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def handle(self, method, target, headers, body):
+        raise NotImplementedError
+
+    def error_payload(self, status):
+        """Body returned for a failure injected by the profile"""
+        if status == 429:
+            return {'code': 'too_many_requests', 'message': 'Rate limit exceeded'}
+        return {'code': 'internal_error', 'message': 'Simulated upstream failure'}
+
+    async def apply_profile(self):
+        """Return an error response tuple when the profile says so, else None"""
+        profile = self.profile
+        delay = profile.latency_ms + (self.random.uniform(0, profile.jitter_ms) if profile.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if profile.max_rps and not self.bucket.take(profile.max_rps):
+            return 429, self.error_payload(429)
+        if profile.error_rate and self.random.random() < profile.error_rate:
+            return profile.error_status, self.error_payload(profile.error_status)
+        return None
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+                try:
+                    body = json.loads(raw) if raw else None
+                except json.JSONDecodeError:
+                    status, payload = 400, {'code': 'bad_request', 'message': 'Invalid JSON'}
+                else:
+                    status, payload = await self.handle(method, target, headers, body)
+
+                data = json.dumps(payload).encode() if payload is not None else b""
+                response = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+                            f"Content-Length: {len(data)}"]
+                if data:
+                    response.append("Content-Type: application/json")
+                writer.write(("\r\n".join(response) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        # Port 0 picks a free port; expose the real one
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            # Drop keep-alive connections still waiting for a request
+            current = asyncio.current_task()
+            for task in asyncio.all_tasks():
+                if task is not current:
+                    task.cancel()
+
+    def start(self):
+        """Run the server on a background thread; returns once it is listening"""
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._task = self._loop.create_task(self.serve())
+            try:
+                self._loop.run_until_complete(self._task)
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.run_until_complete(asyncio.sleep(0))
+                self._loop.close()
+
+        self._thread = threading.Thread(target=run, name=f"{self.name}-mock", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(5):
+            raise RuntimeError(f"{self.name} mock failed to start")
+        return self
+
+    def stop(self):
+        if self._loop and self._task:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread:
+            self._thread.join(5)
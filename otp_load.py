@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Load generation for the OTP endpoints: send-otp, verify-otp, resend-otp
+Drives a fixed concurrency (closed loop) or request rate (open loop) for a
+set duration and reports latency percentiles, throughput, error and 429
+rates per endpoint.
+
+Must run against a local stack whose Brevo calls go to a stub
+(BREVO_API_URL on the Next.js side), so no SMS credits are spent.
+"""
+
+import itertools
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import api_client
+from api_client import API_BASE, make_request
+
+BYPASS_PHONE = "0698793430"
+ENDPOINTS = ["send-otp", "verify-otp", "resend-otp"]
+REAL_BREVO_HOST = "api.brevo.com"
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0"}
+
+def generate_phone_pool(size, prefix="07"):
+    """Deterministic pool of valid French mobile numbers (07 00 00 00 00, ...)"""
+    numbers = []
+    for i in range(size):
+        digits = f"{prefix}{i:08d}"
+        numbers.append(" ".join(digits[j:j + 2] for j in range(0, 10, 2)))
+    return numbers
+
+def to_e164(phone):
+    """French number as the API stores it (+33XXXXXXXXX)"""
+    digits = "".join(c for c in phone if c.isdigit())
+    return "+33" + digits[1:] if digits.startswith("0") else "+" + digits
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile over an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class EndpointStats:
+    """Thread-safe latency/status accumulator for one endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.count = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def record(self, result, latency_ms):
+        status = result['status_code']
+        with self.lock:
+            self.count += 1
+            self.latencies.append(latency_ms)
+            if status == 429:
+                self.rate_limited += 1
+            elif not result['success'] or status is None or status >= 500:
+                self.errors += 1
+
+    def summary(self, duration):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            count = self.count
+            errors = self.errors
+            rate_limited = self.rate_limited
+        return {
+            'requests': count,
+            'throughput_rps': count / duration if duration > 0 else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': latencies[-1] if latencies else None,
+            'error_rate': errors / count if count else 0.0,
+            'rate_limited_rate': rate_limited / count if count else 0.0,
+        }
+
+def check_target(bypass_only=False, allow_remote=False):
+    """Refuse to generate load unless the target is local and Brevo is stubbed.
+
+    Returns an error message, or None when it is safe to proceed.
+    """
+    host = urlparse(API_BASE).hostname
+    if host not in LOCAL_HOSTS and not allow_remote:
+        return f"Refusing to load {host}: load mode targets a local stack (use --allow-remote to override)"
+    result = make_request("GET", "/test-env", timeout=5)
+    if not result['success'] or result['status_code'] != 200:
+        return f"Could not read /api/test-env: {result.get('error') or result['status_code']}"
+    if result['data'].get('rateLimitEnabled'):
+        return ("Server rate limiting would turn most load away as 429. Start Next.js with "
+                "RATE_LIMIT_DISABLED=true (rate_limit_load.py tests the limiter itself)")
+    if bypass_only:
+        return None
+    brevo_url = result['data'].get('brevoApiUrl')
+    if not brevo_url or urlparse(brevo_url).hostname == REAL_BREVO_HOST:
+        return ("Server is configured for the real Brevo API. Start Next.js with "
+                "BREVO_API_URL pointing at a stub, or use --bypass-only")
+    return None
+
+class LoadRunner:
+    """Issues OTP requests for a fixed duration and collects per-endpoint stats"""
+
+    def __init__(self, duration, concurrency=10, rps=None, pool_size=200,
+                 bypass_ratio=0.1, bypass_only=False, endpoints=ENDPOINTS, seed=None,
+                 code_lookup=None):
+        self.duration = duration
+        self.concurrency = concurrency
+        self.rps = rps
+        self.bypass_ratio = 1.0 if bypass_only else bypass_ratio
+        self.endpoints = list(endpoints)
+        self.stats = {endpoint: EndpointStats() for endpoint in self.endpoints}
+        self.phones = itertools.cycle(generate_phone_pool(pool_size))
+        self.phone_lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        # Optional phone (E.164) -> last code sent, e.g. read from the Brevo mock
+        self.code_lookup = code_lookup
+
+    def _next_call(self):
+        with self.random_lock:
+            endpoint = self.random.choice(self.endpoints)
+            use_bypass = self.random.random() < self.bypass_ratio
+        if use_bypass:
+            phone = BYPASS_PHONE
+        else:
+            with self.phone_lock:
+                phone = next(self.phones)
+        payload = {"phone": phone}
+        if endpoint == "verify-otp":
+            # Without a code source this exercises the lookup + failed attempt path
+            code = self.code_lookup(to_e164(phone)) if self.code_lookup and phone != BYPASS_PHONE else None
+            payload["code"] = code or "000000"
+        return endpoint, payload
+
+    def _issue(self, scheduled_at=None):
+        endpoint, payload = self._next_call()
+        result = make_request("POST", f"/verification/{endpoint}", payload)
+        if scheduled_at is None:
+            latency_ms = result['elapsed_ms']
+        else:
+            # Open loop: measure from the intended send time so queueing delay is not hidden
+            latency_ms = (time.perf_counter() - scheduled_at) * 1000
+        self.stats[endpoint].record(result, latency_ms)
+
+    def _closed_loop_worker(self, deadline):
+        while time.perf_counter() < deadline:
+            self._issue()
+
+    def run(self):
+        api_client.configure(pool_size=max(self.concurrency, 1))
+        start = time.perf_counter()
+        deadline = start + self.duration
+
+        if self.rps:
+            interval = 1.0 / self.rps
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                next_at = start
+                while next_at < deadline:
+                    now = time.perf_counter()
+                    if next_at > now:
+                        time.sleep(next_at - now)
+                    executor.submit(self._issue, next_at)
+                    next_at += interval
+        else:
+            workers = [
+                threading.Thread(target=self._closed_loop_worker, args=(deadline,), daemon=True)
+                for _ in range(self.concurrency)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        elapsed = time.perf_counter() - start
+        return {endpoint: stats.summary(elapsed) for endpoint, stats in self.stats.items()}, elapsed
+
+def format_report(report, elapsed):
+    """Render the per-endpoint summary as a text table"""
+    def ms(value):
+        return f"{value:8.1f}" if value is not None else "       -"
+
+    lines = [
+        f"Duration: {elapsed:.1f}s",
+        f"{'endpoint':<12} {'reqs':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'429':>7}",
+    ]
+    for endpoint, row in report.items():
+        lines.append(
+            f"{endpoint:<12} {row['requests']:>7} {row['throughput_rps']:>8.1f} "
+            f"{ms(row['p50_ms'])} {ms(row['p95_ms'])} {ms(row['p99_ms'])} "
+            f"{row['error_rate']:>7.1%} {row['rate_limited_rate']:>7.1%}"
+        )
+    return "\n".join(lines)
+
+def add_load_arguments(parser):
+    """Register the --load options on an argparse parser"""
+    group = parser.add_argument_group("load mode")
+    group.add_argument("--duration", type=float, default=30, help="seconds to run (default: 30)")
+    group.add_argument("--concurrency", type=int, default=10,
+                       help="concurrent virtual users / max in-flight requests (default: 10)")
+    group.add_argument("--rps", type=float, default=None,
+                       help="target request rate (open loop); default is closed loop at --concurrency")
+    group.add_argument("--phone-pool", type=int, default=200,
+                       help="number of generated phone numbers (default: 200)")
+    group.add_argument("--bypass-ratio", type=float, default=0.1,
+                       help=f"share of requests using the bypass number {BYPASS_PHONE} (default: 0.1)")
+    group.add_argument("--bypass-only", action="store_true",
+                       help="only use the bypass number (no Brevo stub required)")
+    group.add_argument("--allow-remote", action="store_true",
+                       help="allow a non-local API target")
+
+def run_load_from_args(args, code_lookup=None):
+    """Run load mode from parsed arguments; returns True on a completed run"""
+    problem = check_target(bypass_only=args.bypass_only, allow_remote=args.allow_remote)
+    if problem:
+        print(f"❌ {problem}")
+        return False
+
+    mode = f"{args.rps:g} req/s" if args.rps else f"{args.concurrency} concurrent users"
+    print(f"🚀 OTP load: {mode} for {args.duration:g}s against {API_BASE}")
+    runner = LoadRunner(
+        duration=args.duration,
+        concurrency=args.concurrency,
+        rps=args.rps,
+        pool_size=args.phone_pool,
+        bypass_ratio=args.bypass_ratio,
+        bypass_only=args.bypass_only,
+        code_lookup=code_lookup,
+    )
+    report, elapsed = runner.run()
+    print(format_report(report, elapsed))
+    return True
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="OTP endpoint load generator")
+    add_load_arguments(parser)
+    sys.exit(0 if run_load_from_args(parser.parse_args()) else 1)
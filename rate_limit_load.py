@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Load test for the per-client rate limiter (lib/rate-limit.js)
+Fires a concurrent burst at a rate-limited route from one simulated client
+(X-Forwarded-For) and checks that the limit holds: no more requests get
+through than the bucket capacity plus what refills during the burst, every
+429 carries Retry-After, and another client is not affected.
+
+Usage:
+    python rate_limit_load.py                      # estimate + send-otp bursts
+    python rate_limit_load.py --route estimate --requests 100 --concurrency 50
+
+Run it against the app directly, not through the deployment proxy: the script
+plays the proxy's role, sending a one-hop X-Forwarded-For that the server reads
+with the default RATE_LIMIT_TRUSTED_PROXIES=1. Behind a real proxy that hop is
+replaced by the load generator's own address, so every simulated client shares
+one bucket and the "different client" check fails.
+"""
+
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+from api_client import BASE_URL, make_request
+
+# Mirrors RATE_LIMIT_POLICIES in lib/rate-limit.js: capacity is read from the
+# X-RateLimit-Limit header, `per` (refill period in seconds) bounds the refill
+ROUTES = {
+    'estimate': {
+        'method': 'POST',
+        'endpoint': '/estimate',
+        'per': 60,
+        'payload': {
+            'address': '8 Rue des Italiens 75009 Paris', 'lat': 48.8717, 'lng': 2.3373,
+            'type': 'appartement', 'surface': 65, 'characteristics': {},
+        },
+    },
+    'send-otp': {
+        'method': 'POST',
+        'endpoint': '/verification/send-otp',
+        'per': 600,
+        # Bypass number: allowed requests never reach MongoDB or Brevo
+        'payload': {'phone': '0698793430'},
+    },
+}
+
+def random_client_ip(rng=random):
+    """Fresh documentation-range IPv6 address so runs never share a bucket"""
+    return f"2001:db8::{rng.getrandbits(16):x}:{rng.getrandbits(16):x}"
+
+def burst(route, total, concurrency, client_ip, send=make_request):
+    """Send `total` requests with up to `concurrency` in flight, all from `client_ip`"""
+    headers = {'X-Forwarded-For': client_ip}
+
+    def call(_):
+        if route['method'] == 'GET':
+            return send('GET', route['endpoint'], headers=headers, params=route.get('params'))
+        return send(route['method'], route['endpoint'], route.get('payload'), headers=headers)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, range(total)))
+    elapsed = time.perf_counter() - start
+
+    summary = {'allowed': 0, 'limited': 0, 'errors': 0, 'missing_retry_after': 0,
+               'limit': None, 'elapsed': elapsed}
+    for result in results:
+        response = result.get('response')
+        response_headers = response.headers if response is not None else {}
+        if response_headers.get('X-RateLimit-Limit'):
+            summary['limit'] = int(response_headers['X-RateLimit-Limit'])
+        if result['status_code'] == 429:
+            summary['limited'] += 1
+            if not response_headers.get('Retry-After'):
+                summary['missing_retry_after'] += 1
+        elif result['success'] and result['status_code'] is not None and result['status_code'] < 500:
+            summary['allowed'] += 1
+        else:
+            summary['errors'] += 1
+    return summary
+
+def evaluate(summary, total, per):
+    """List of violated expectations (empty when the limit held)"""
+    failures = []
+    limit = summary['limit']
+    if limit is None:
+        return ["no X-RateLimit-Limit header: route not rate limited"]
+    # Tokens refilled while the burst ran, plus one for rounding at the boundary
+    ceiling = limit + int(limit / per * summary['elapsed']) + 1
+    if summary['allowed'] > ceiling:
+        failures.append(f"{summary['allowed']} requests allowed, limit {limit} (max {ceiling} with refill)")
+    if total > ceiling and summary['limited'] == 0:
+        failures.append(f"no 429 after {total} requests")
+    if summary['missing_retry_after']:
+        failures.append(f"{summary['missing_retry_after']} responses with 429 but no Retry-After")
+    if summary['errors']:
+        failures.append(f"{summary['errors']} failed requests")
+    return failures
+
+def run_route(name, total, concurrency, send=make_request, rng=random):
+    """Burst one route, then check a different client still gets through"""
+    route = ROUTES[name]
+    summary = burst(route, total, concurrency, random_client_ip(rng), send)
+    failures = evaluate(summary, total, route['per'])
+
+    other = burst(route, 1, 1, random_client_ip(rng), send)
+    if other['allowed'] != 1:
+        failures.append("a different client was rejected")
+    return summary, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter load test")
+    parser.add_argument("--route", choices=sorted(ROUTES), action="append",
+                        help="route to burst (repeatable, default: all)")
+    parser.add_argument("--requests", type=int, default=60, help="requests per burst (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=30, help="in-flight requests (default: %(default)s)")
+    args = parser.parse_args()
+
+    api_client.configure(pool_size=args.concurrency)
+    print(f"🚦 Rate limit bursts on {BASE_URL}: {args.requests} requests, {args.concurrency} concurrent")
+    ok = True
+    for name in args.route or sorted(ROUTES):
+        summary, failures = run_route(name, args.requests, args.concurrency)
+        status = "✅" if not failures else "❌"
+        print(f"{status} {name:<10} limit={summary['limit']} allowed={summary['allowed']} "
+              f"429={summary['limited']} errors={summary['errors']} in {summary['elapsed']:.2f}s")
+        for failure in failures:
+            print(f"     - {failure}")
+        ok = ok and not failures
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
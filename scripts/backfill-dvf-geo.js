@@ -0,0 +1,34 @@
+#!/usr/bin/env node
+
+/**
+ * Ajoute le point GeoJSON et le geohash aux ventes DVF importées avant
+ * l'index spatial, puis crée les index de dvf_sales.
+ * Usage: node scripts/backfill-dvf-geo.js
+ */
+
+import { connectToDatabase, getCollection } from '../lib/mongodb.js';
+import { backfillGeoFields, ensureDVFIndexes } from '../lib/dvf-geo.js';
+
+process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
+
+async function main() {
+  try {
+    await connectToDatabase();
+    console.log('✓ Connected to MongoDB\n');
+
+    const collection = await getCollection('dvf_sales');
+    const updated = await backfillGeoFields(collection);
+    console.log(`✓ ${updated} ventes complétées (location + geohash)`);
+
+    await ensureDVFIndexes(collection);
+    console.log('✓ Index créés');
+
+    process.exit(0);
+  } catch (error) {
+    console.error('\n✗ Backfill failed:', error);
+    process.exit(1);
+  }
+}
+
+main();
@@ -0,0 +1,161 @@
+#!/usr/bin/env node
+
+/**
+ * Micro-benchmark du noyau statistique des comparables (lib/dvf-stats.js)
+ * Compare l'implémentation précédente (map/reduce/sort répétés + new Date(...) par vente)
+ * au noyau en tableaux typés, sur des jeux synthétiques de tailles croissantes,
+ * et vérifie que les deux donnent les mêmes statistiques arrondies.
+ * Usage: node scripts/bench-dvf-stats.js [--sizes 20,200,2000,20000] [--min-time-ms 200]
+ */
+
+import { MS_PER_DAY, epochDayNow, summarizeComparables, toEpochDay } from '../lib/dvf-stats.js';
+
+function argValue(name, fallback) {
+  const index = process.argv.indexOf(name);
+  return index !== -1 ? process.argv[index + 1] : fallback;
+}
+
+const SIZES = argValue('--sizes', '20,200,2000,20000').split(',').map(Number);
+const MIN_TIME_MS = parseInt(argValue('--min-time-ms', '200'), 10);
+const RADIUS = 800;
+const MONTHS = 36;
+
+// Générateur pseudo-aléatoire déterministe (mulberry32)
+function random(seed) {
+  return () => {
+    seed |= 0;
+    seed = (seed + 0x6D2B79F5) | 0;
+    let t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+function makeSales(n, seed = 42) {
+  const rand = random(seed);
+  const now = Date.now();
+  return Array.from({ length: n }, () => {
+    const date = new Date(now - rand() * MONTHS * 30 * MS_PER_DAY).toISOString().split('T')[0];
+    // Quelques valeurs extrêmes pour exercer le nettoyage des outliers
+    const price = rand() < 0.03 ? 500 + rand() * 29500 : 8000 + (rand() - 0.5) * 4000;
+    return {
+      prix_m2: Math.round(price),
+      distance: rand() * RADIUS,
+      date_mutation: date,
+      date_epoch_day: toEpochDay(date)
+    };
+  });
+}
+
+// Implémentation précédente de getAdaptiveComparables (outliers + statistiques)
+function legacyStats(sales) {
+  const sortedForBounds = sales.map(s => s.prix_m2).sort((a, b) => a - b);
+  const p1 = sortedForBounds[Math.floor(sortedForBounds.length * 0.01)];
+  const p99 = sortedForBounds[Math.floor(sortedForBounds.length * 0.99)];
+  const q1 = sortedForBounds[Math.floor(sortedForBounds.length * 0.25)];
+  const q3 = sortedForBounds[Math.floor(sortedForBounds.length * 0.75)];
+  const iqr = q3 - q1;
+  const boundsMean = sortedForBounds.reduce((a, b) => a + b, 0) / sortedForBounds.length;
+  const boundsVariance = sortedForBounds.reduce((sum, p) => sum + Math.pow(p - boundsMean, 2), 0) / sortedForBounds.length;
+  const boundsStdDev = Math.sqrt(boundsVariance);
+  const min = Math.max(p1, q1 - 1.5 * iqr, boundsMean - 2 * boundsStdDev);
+  const max = Math.min(p99, q3 + 1.5 * iqr, boundsMean + 2 * boundsStdDev);
+  const cleaned = sales.filter(s => s.prix_m2 >= min && s.prix_m2 <= max);
+
+  const pricesPerM2 = cleaned.map(s => s.prix_m2);
+  const mean = pricesPerM2.reduce((a, b) => a + b, 0) / pricesPerM2.length;
+  const sortedPrices = [...pricesPerM2].sort((a, b) => a - b);
+  const median = sortedPrices.length % 2 === 0
+    ? (sortedPrices[sortedPrices.length / 2 - 1] + sortedPrices[sortedPrices.length / 2]) / 2
+    : sortedPrices[Math.floor(sortedPrices.length / 2)];
+  const variance = pricesPerM2.reduce((sum, price) => sum + Math.pow(price - mean, 2), 0) / pricesPerM2.length;
+  const stdDev = Math.sqrt(variance);
+
+  const now = Date.now();
+  let weightedSum = 0;
+  let weightSum = 0;
+  cleaned.forEach(sale => {
+    const distanceWeight = 1 - (sale.distance / RADIUS);
+    const ageMonths = (now - new Date(sale.date_mutation).getTime()) / (1000 * 60 * 60 * 24 * 30);
+    const recencyWeight = 1 - (ageMonths / MONTHS);
+    const totalWeight = (distanceWeight * 0.6 + recencyWeight * 0.4);
+    weightedSum += sale.prix_m2 * totalWeight;
+    weightSum += totalWeight;
+  });
+  const avgAge = cleaned.reduce((sum, sale) => {
+    return sum + (now - new Date(sale.date_mutation).getTime()) / (1000 * 60 * 60 * 24 * 30);
+  }, 0) / cleaned.length;
+
+  return {
+    count: cleaned.length,
+    mean: Math.round(mean),
+    median: Math.round(median),
+    stdDev: Math.round(stdDev),
+    weightedAverage: Math.round(weightSum > 0 ? weightedSum / weightSum : mean),
+    avgAgeMonths: Math.round(avgAge * 100) / 100
+  };
+}
+
+// Noyau : colonnes typées préparées une fois (comme dans getAdaptiveComparables)
+function kernelStats(columns) {
+  const summary = summarizeComparables({ ...columns, radius: RADIUS, months: MONTHS, nowDay: epochDayNow() });
+  return {
+    count: summary.count,
+    mean: Math.round(summary.mean),
+    median: Math.round(summary.median),
+    stdDev: Math.round(summary.stdDev),
+    weightedAverage: Math.round(summary.weightedAverage),
+    avgAgeMonths: Math.round(summary.avgAgeMonths * 100) / 100
+  };
+}
+
+function toColumns(sales) {
+  return {
+    prices: Float64Array.from(sales, s => s.prix_m2),
+    distances: Float64Array.from(sales, s => s.distance),
+    days: Float64Array.from(sales, s => s.date_epoch_day)
+  };
+}
+
+// Temps moyen par appel (µs) sur au moins MIN_TIME_MS après un échauffement
+function measure(fn) {
+  for (let i = 0; i < 50; i++) fn();
+  let iterations = 0;
+  const start = process.hrtime.bigint();
+  let elapsedMs = 0;
+  while (elapsedMs < MIN_TIME_MS) {
+    for (let i = 0; i < 10; i++) fn();
+    iterations += 10;
+    elapsedMs = Number(process.hrtime.bigint() - start) / 1e6;
+  }
+  return (elapsedMs * 1000) / iterations;
+}
+
+function main() {
+  console.log('size      legacy µs   kernel µs   speedup');
+  let mismatches = 0;
+
+  for (const size of SIZES) {
+    const sales = makeSales(size);
+    const columns = toColumns(sales);
+
+    const expected = legacyStats(sales);
+    const actual = kernelStats(columns);
+    for (const key of Object.keys(expected)) {
+      if (Math.abs(expected[key] - actual[key]) > (key === 'avgAgeMonths' ? 0.01 : 0)) {
+        console.error(`✗ size ${size}: ${key} legacy=${expected[key]} kernel=${actual[key]}`);
+        mismatches++;
+      }
+    }
+
+    const legacyUs = measure(() => legacyStats(sales));
+    const kernelUs = measure(() => kernelStats(columns));
+    console.log(
+      `${String(size).padEnd(10)}${legacyUs.toFixed(1).padStart(9)}   ${kernelUs.toFixed(1).padStart(9)}   ${(legacyUs / kernelUs).toFixed(1).padStart(6)}x`
+    );
+  }
+
+  process.exit(mismatches > 0 ? 1 : 0);
+}
+
+main();
@@ -0,0 +1,61 @@
+#!/usr/bin/env node
+
+/**
+ * Worker de synchronisation des contacts Brevo (leads en syncStatus: 'sync_pending').
+ * L'API draine aussi la file après chaque lead ; ce worker sert en déploiement
+ * multi-instances, après un redémarrage, ou pour rejouer les lettres mortes.
+ * Usage: node scripts/brevo-sync-worker.js [--once] [--requeue-dead]
+ */
+
+import { connectToDatabase } from '../lib/mongodb.js';
+import {
+  drainBrevoSyncQueue,
+  getBrevoSyncStats,
+  nudgeBrevoSyncWorker,
+  requeueDeadContacts
+} from '../lib/brevo-sync-queue.js';
+
+process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
+
+const once = process.argv.includes('--once');
+const requeueDead = process.argv.includes('--requeue-dead');
+
+async function main() {
+  try {
+    await connectToDatabase();
+    console.log('✓ Connected to MongoDB\n');
+
+    if (!process.env.BREVO_API_KEY) {
+      console.error('✗ BREVO_API_KEY not configured');
+      process.exit(1);
+    }
+
+    if (requeueDead) {
+      const requeued = await requeueDeadContacts();
+      console.log(`✓ ${requeued} lettres mortes remises en file`);
+    }
+
+    const before = await getBrevoSyncStats();
+    console.log(`File : ${before.pending} en attente, ${before.dead} en lettre morte`);
+
+    if (!once) {
+      // Boucle de fond (timer non bloquant) : maintenir le processus en vie
+      nudgeBrevoSyncWorker();
+      setInterval(() => {}, 60 * 60 * 1000);
+      return;
+    }
+
+    const processed = await drainBrevoSyncQueue();
+    const after = await getBrevoSyncStats();
+    console.log(`✓ ${processed} leads traités (${after.processed.synced} synchronisés, ` +
+      `${after.processed.retried} à réessayer, ${after.processed.dead} en lettre morte)`);
+    if (after.pausedUntil) console.log(`⚠️  Limite Brevo atteinte, reprise après ${after.pausedUntil}`);
+    process.exit(0);
+  } catch (error) {
+    console.error('\n✗ Brevo sync failed:', error);
+    process.exit(1);
+  }
+}
+
+main();
@@ -2,74 +2,72 @@
 
 /**
  * Script pour ingérer les données DVF de toute la France
- * Usage: node scripts/ingest-all-france.js
+ * Usage: node scripts/ingest-all-france.js [--incremental] [--concurrency N] [--retries N] [--manifest fichier.json]
+ *
+ * Les départements sont traités en parallèle par un pool borné de workers
+ * (DVF_INGEST_CONCURRENCY, 4 par défaut). La progression est enregistrée dans
+ * un manifeste : en cas d'interruption, `node scripts/retry-failed.js` reprend
+ * là où l'exécution s'est arrêtée.
+ *
+ * --incremental : seules les ventes nouvelles ou modifiées depuis le dernier
+ * chargement sont écrites (départements sans watermark : chargement complet).
  */
 
-import { ingestDVFDepartment } from '../lib/dvf-ingestion.js';
 import { connectToDatabase } from '../lib/mongodb.js';
+import {
+  DEFAULT_CONCURRENCY,
+  DEFAULT_MANIFEST_PATH,
+  DEFAULT_RETRIES,
+  FRENCH_DEPARTMENTS,
+  runIngestion
+} from '../lib/dvf-scheduler.js';
 
-// Liste complète des départements français (métropole + DOM-TOM)
-const FRENCH_DEPARTMENTS = [
-  // Métropole
-  '01', '02', '03', '04', '05', '06', '07', '08', '09', '10',
-  '11', '12', '13', '14', '15', '16', '17', '18', '19', '21',
-  '22', '23', '24', '25', '26', '27', '28', '29', '2A', '2B',
-  '30', '31', '32', '33', '34', '35', '36', '37', '38', '39',
-  '40', '41', '42', '43', '44', '45', '46', '47', '48', '49',
-  '50', '51', '52', '53', '54', '55', '56', '57', '58', '59',
-  '60', '61', '62', '63', '64', '65', '66', '67', '68', '69',
-  '70', '71', '72', '73', '74', '75', '76', '77', '78', '79',
-  '80', '81', '82', '83', '84', '85', '86', '87', '88', '89',
-  '90', '91', '92', '93', '94', '95',
-  // DOM-TOM (si disponibles)
-  '971', '972', '973', '974', '976'
-];
+function parseOptions(argv) {
+  const options = {
+    concurrency: DEFAULT_CONCURRENCY,
+    retries: DEFAULT_RETRIES,
+    manifestPath: DEFAULT_MANIFEST_PATH,
+    incremental: false
+  };
+  for (let i = 0; i < argv.length; i++) {
+    if (argv[i] === '--concurrency') options.concurrency = parseInt(argv[++i], 10);
+    else if (argv[i] === '--retries') options.retries = parseInt(argv[++i], 10);
+    else if (argv[i] === '--manifest') options.manifestPath = argv[++i];
+    else if (argv[i] === '--incremental') options.incremental = true;
+  }
+  return options;
+}
 
 async function ingestAllFrance() {
+  const options = parseOptions(process.argv.slice(2));
+  
   console.log('='.repeat(80));
   console.log('📦 INGESTION DVF - TOUTE LA FRANCE');
   console.log('='.repeat(80));
   console.log(`Départements à traiter : ${FRENCH_DEPARTMENTS.length}`);
-  console.log('⚠️  ATTENTION : Cette opération peut prendre plusieurs heures');
+  console.log(`Parallélisme : ${options.concurrency} workers, ${options.retries} réessais par département`);
+  console.log(`Mode : ${options.incremental ? 'incrémental' : 'complet'}`);
+  console.log(`Manifeste : ${options.manifestPath}`);
   console.log('='.repeat(80));
   
   // Se connecter à MongoDB
   await connectToDatabase();
   
   const startTime = Date.now();
-  let successCount = 0;
-  let failCount = 0;
-  const failedDepartments = [];
   
-  // Traiter chaque département
-  for (let i = 0; i < FRENCH_DEPARTMENTS.length; i++) {
-    const dept = FRENCH_DEPARTMENTS[i];
-    const progress = ((i + 1) / FRENCH_DEPARTMENTS.length * 100).toFixed(1);
-    
-    console.log('');
-    console.log('-'.repeat(80));
-    console.log(`[${i + 1}/${FRENCH_DEPARTMENTS.length}] Département ${dept} (${progress}%)`);
-    console.log('-'.repeat(80));
-    
-    try {
-      await ingestDVFDepartment(dept);
-      successCount++;
-      console.log(`✅ Département ${dept} : SUCCÈS`);
-    } catch (error) {
-      failCount++;
-      failedDepartments.push(dept);
-      console.error(`❌ Département ${dept} : ÉCHEC - ${error.message}`);
-      // Continue avec le prochain département même en cas d'erreur
-    }
-    
-    // Pause de 2 secondes entre chaque département pour ne pas surcharger le serveur
-    if (i < FRENCH_DEPARTMENTS.length - 1) {
-      await new Promise(resolve => setTimeout(resolve, 2000));
+  const results = await runIngestion(FRENCH_DEPARTMENTS, {
+    ...options,
+    onProgress: ({ department, result, finished, total }) => {
+      const progress = (finished / total * 100).toFixed(1);
+      const status = result.success ? '✅ SUCCÈS' : `❌ ÉCHEC - ${result.error}`;
+      console.log(`[${finished}/${total}] Département ${department} : ${status} (${progress}%)`);
     }
-  }
+  });
   
   const endTime = Date.now();
   const duration = ((endTime - startTime) / 1000 / 60).toFixed(2);
+  const failedDepartments = results.filter(r => !r.success).map(r => r.department);
+  const successCount = results.length - failedDepartments.length;
   
   // Résumé final
   console.log('');
@@ -78,22 +76,22 @@ async function ingestAllFrance() {
   console.log('='.repeat(80));
   console.log(`⏱️  Durée totale : ${duration} minutes`);
   console.log(`✅ Succès : ${successCount} départements`);
-  console.log(`❌ Échecs : ${failCount} départements`);
+  console.log(`❌ Échecs : ${failedDepartments.length} départements`);
   
   if (failedDepartments.length > 0) {
     console.log('');
     console.log('Départements en échec :');
     failedDepartments.forEach(dept => console.log(`  - ${dept}`));
     console.log('');
-    console.log('💡 Vous pouvez ré-essayer les départements en échec avec :');
-    console.log(`   node scripts/retry-failed.js ${failedDepartments.join(' ')}`);
+    console.log('💡 Vous pouvez reprendre les départements restants avec :');
+    console.log(`   node scripts/retry-failed.js --manifest ${options.manifestPath}`);
   }
   
   console.log('='.repeat(80));
   console.log('✨ Ingestion terminée !');
   console.log('='.repeat(80));
   
-  process.exit(failCount > 0 ? 1 : 0);
+  process.exit(failedDepartments.length > 0 ? 1 : 0);
 }
 
 // Lancer l'ingestion
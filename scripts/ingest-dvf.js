@@ -1,21 +1,24 @@
 // Script CLI pour ingérer les données DVF
-import { ingestDVFDepartment, ingestMultipleDepartments } from '../lib/dvf-ingestion.js';
+import { ingestDVFDepartment } from '../lib/dvf-ingestion.js';
+import { ingestMultipleDepartments } from '../lib/dvf-scheduler.js';
 import { connectToDatabase } from '../lib/mongodb.js';
 
 // Load env vars manually
 process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
 process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
 
-const args = process.argv.slice(2);
+const incremental = process.argv.includes('--incremental');
+const args = process.argv.slice(2).filter(arg => arg !== '--incremental');
 
 if (args.length === 0) {
   console.log(`
-Usage: node scripts/ingest-dvf.js <department_code> [department_code2 ...]
+Usage: node scripts/ingest-dvf.js [--incremental] <department_code> [department_code2 ...]
 
 Examples:
   node scripts/ingest-dvf.js 78
   node scripts/ingest-dvf.js 75 92 93 94
   node scripts/ingest-dvf.js all-idf  # Paris + Île-de-France
+  node scripts/ingest-dvf.js --incremental 75  # Delta depuis le dernier chargement
 `);
   process.exit(1);
 }
@@ -35,7 +38,7 @@ async function main() {
     }
     
     // Ingest departments
-    if (departments.length === 1) {
+    if (departments.length === 1 && !incremental) {
       const stats = await ingestDVFDepartment(departments[0]);
       console.log('\n=== INGESTION COMPLETE ===');
       console.log(`Department: ${departments[0]}`);
@@ -43,10 +46,12 @@ async function main() {
       console.log(`Appartements: ${stats.appartements}`);
       console.log(`Maisons: ${stats.maisons}`);
     } else {
-      const results = await ingestMultipleDepartments(departments);
+      const results = await ingestMultipleDepartments(departments, { incremental });
       console.log('\n=== INGESTION COMPLETE ===');
       results.forEach(result => {
-        if (result.success) {
+        if (result.success && result.stats.mode === 'incremental') {
+          console.log(`\n✓ ${result.department}: ${result.stats.inserted || 0} new, ${result.stats.updated || 0} changed, ${result.stats.deleted || 0} expired`);
+        } else if (result.success) {
           console.log(`\n✓ ${result.department}: ${result.stats.inserted} records`);
           console.log(`  Appartements: ${result.stats.appartements}`);
           console.log(`  Maisons: ${result.stats.maisons}`);
@@ -0,0 +1,30 @@
+#!/usr/bin/env node
+
+/**
+ * Migration ponctuelle : supprime les instantanés marché enregistrés sans code postal par les
+ * versions précédentes (recherche SeLoger non localisée, clé partagée par toutes ces adresses).
+ * Les versions actuelles ne créent plus de tels instantanés ; à lancer une fois après déploiement.
+ * Usage: node scripts/purge-unlocalized-market-snapshots.js
+ */
+
+import { connectToDatabase, getCollection } from '../lib/mongodb.js';
+
+process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
+
+async function main() {
+  try {
+    await connectToDatabase();
+    console.log('✓ Connected to MongoDB\n');
+
+    const collection = await getCollection('market_snapshots');
+    const { deletedCount } = await collection.deleteMany({ postal_code: '' });
+    console.log(`✓ ${deletedCount} instantanés sans code postal supprimés`);
+    process.exit(0);
+  } catch (error) {
+    console.error('\n✗ Purge failed:', error);
+    process.exit(1);
+  }
+}
+
+main();
@@ -0,0 +1,37 @@
+#!/usr/bin/env node
+
+/**
+ * Recalcule les agrégats de prix DVF (collection dvf_aggregates) à partir de dvf_sales.
+ * Normalement tenus à jour par l'ingestion ; utile après un import manuel ou un échec.
+ * Usage: node scripts/rebuild-dvf-aggregates.js [75 69 ...]  (tous les départements par défaut)
+ */
+
+import { connectToDatabase, getCollection } from '../lib/mongodb.js';
+import { rebuildDVFAggregates } from '../lib/dvf-aggregates.js';
+
+process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
+
+async function main() {
+  try {
+    await connectToDatabase();
+    console.log('✓ Connected to MongoDB\n');
+
+    let departments = process.argv.slice(2);
+    if (departments.length === 0) {
+      const sales = await getCollection('dvf_sales');
+      departments = (await sales.distinct('code_departement')).filter(Boolean).sort();
+    }
+
+    const start = Date.now();
+    const results = await rebuildDVFAggregates(departments);
+    const zones = results.reduce((sum, r) => sum + r.aggregates, 0);
+    console.log(`\n✓ ${zones} agrégats pour ${results.length} départements en ${((Date.now() - start) / 1000).toFixed(1)}s`);
+    process.exit(0);
+  } catch (error) {
+    console.error('\n✗ Rebuild failed:', error);
+    process.exit(1);
+  }
+}
+
+main();
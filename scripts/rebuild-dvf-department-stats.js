@@ -0,0 +1,38 @@
+#!/usr/bin/env node
+
+/**
+ * Recalcule les compteurs DVF par département (collection dvf_department_stats) à partir de dvf_sales.
+ * Normalement tenus à jour par l'ingestion ; utile après un import manuel, un échec ou une dérive.
+ * Usage: node scripts/rebuild-dvf-department-stats.js [75 69 ...]  (tous les départements par défaut)
+ */
+
+import { connectToDatabase } from '../lib/mongodb.js';
+import { rebuildDVFDepartmentStats, rebuildAllDVFDepartmentStats } from '../lib/dvf-department-stats.js';
+
+process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
+
+async function main() {
+  try {
+    await connectToDatabase();
+    console.log('✓ Connected to MongoDB\n');
+
+    const departments = process.argv.slice(2);
+    const start = Date.now();
+    const results = departments.length > 0
+      ? await rebuildDVFDepartmentStats(departments)
+      : await rebuildAllDVFDepartmentStats();
+
+    for (const result of results) {
+      console.log(`  ${result.department.padEnd(3)} ${String(result.count).padStart(9)} ventes${result.count === 0 ? ' (supprimé)' : ''}`);
+    }
+    const total = results.reduce((sum, r) => sum + r.count, 0);
+    console.log(`\n✓ ${total} ventes pour ${results.length} départements en ${((Date.now() - start) / 1000).toFixed(1)}s`);
+    process.exit(0);
+  } catch (error) {
+    console.error('\n✗ Rebuild failed:', error);
+    process.exit(1);
+  }
+}
+
+main();
@@ -0,0 +1,36 @@
+#!/usr/bin/env node
+
+/**
+ * Rafraîchit les instantanés marché les plus demandés avant qu'ils ne soient périmés.
+ * À lancer périodiquement (cron), par exemple toutes les heures.
+ * Usage: node scripts/refresh-market-snapshots.js [--limit 50]
+ */
+
+import { connectToDatabase } from '../lib/mongodb.js';
+import { refreshHotSnapshots } from '../lib/market-snapshots.js';
+import { closeBrowserPool } from '../lib/browser-pool.js';
+
+process.env.MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+process.env.DB_NAME = process.env.DB_NAME || 'alterego_db';
+
+const limitIndex = process.argv.indexOf('--limit');
+const limit = limitIndex !== -1 ? parseInt(process.argv[limitIndex + 1], 10) : 50;
+
+async function main() {
+  try {
+    await connectToDatabase();
+    console.log('✓ Connected to MongoDB\n');
+
+    const { candidates, failed } = await refreshHotSnapshots({ limit });
+    console.log(`✓ ${candidates - failed}/${candidates} instantanés rafraîchis`);
+
+    await closeBrowserPool();
+    process.exit(failed > 0 ? 1 : 0);
+  } catch (error) {
+    console.error('\n✗ Refresh failed:', error);
+    await closeBrowserPool();
+    process.exit(1);
+  }
+}
+
+main();
@@ -2,17 +2,54 @@
 
 /**
  * Script pour ré-essayer l'ingestion DVF de départements spécifiques
- * Usage: node scripts/retry-failed.js 75 92 93
+ * Usage:
+ *   node scripts/retry-failed.js                 # reprend le manifeste (échecs + non traités)
+ *   node scripts/retry-failed.js 75 92 93        # départements explicites
+ * Options: --concurrency N, --retries N, --manifest fichier.json
  */
 
-import { ingestDVFDepartment } from '../lib/dvf-ingestion.js';
 import { connectToDatabase } from '../lib/mongodb.js';
+import {
+  DEFAULT_CONCURRENCY,
+  DEFAULT_MANIFEST_PATH,
+  DEFAULT_RETRIES,
+  loadManifest,
+  pendingDepartments,
+  runIngestion
+} from '../lib/dvf-scheduler.js';
 
-async function retryDepartments(departments) {
+function parseArgs(argv) {
+  const options = {
+    concurrency: DEFAULT_CONCURRENCY,
+    retries: DEFAULT_RETRIES,
+    manifestPath: DEFAULT_MANIFEST_PATH
+  };
+  const departments = [];
+  for (let i = 0; i < argv.length; i++) {
+    if (argv[i] === '--concurrency') options.concurrency = parseInt(argv[++i], 10);
+    else if (argv[i] === '--retries') options.retries = parseInt(argv[++i], 10);
+    else if (argv[i] === '--manifest') options.manifestPath = argv[++i];
+    else departments.push(argv[i]);
+  }
+  return { departments, options };
+}
+
+async function retryDepartments(argv) {
+  let { departments, options } = parseArgs(argv);
+  const explicit = departments.length > 0;
+  
   if (departments.length === 0) {
-    console.log('❌ Erreur : Aucun département spécifié');
-    console.log('Usage: node scripts/retry-failed.js 75 92 93');
-    process.exit(1);
+    const manifest = loadManifest(options.manifestPath);
+    if (!manifest) {
+      console.log(`❌ Erreur : Aucun département spécifié et aucun manifeste trouvé (${options.manifestPath})`);
+      console.log('Usage: node scripts/retry-failed.js 75 92 93');
+      process.exit(1);
+    }
+    departments = pendingDepartments(manifest);
+    if (departments.length === 0) {
+      console.log('✅ Tous les départements du manifeste sont déjà ingérés');
+      process.exit(0);
+    }
   }
   
   console.log('='.repeat(80));
@@ -24,27 +61,20 @@ async function retryDepartments(departments) {
   // Se connecter à MongoDB
   await connectToDatabase();
   
-  let successCount = 0;
-  let failCount = 0;
-  
-  for (const dept of departments) {
-    console.log('');
-    console.log('-'.repeat(80));
-    console.log(`Département ${dept}`);
-    console.log('-'.repeat(80));
-    
-    try {
-      await ingestDVFDepartment(dept);
-      successCount++;
-      console.log(`✅ Département ${dept} : SUCCÈS`);
-    } catch (error) {
-      failCount++;
-      console.error(`❌ Département ${dept} : ÉCHEC - ${error.message}`);
+  // Le manifeste existant est mis à jour ; les départements passés explicitement
+  // sont relancés même s'ils étaient déjà terminés
+  const results = await runIngestion(departments, {
+    ...options,
+    resume: true,
+    force: explicit,
+    onProgress: ({ department, result }) => {
+      if (result.success) console.log(`✅ Département ${department} : SUCCÈS`);
+      else console.error(`❌ Département ${department} : ÉCHEC - ${result.error}`);
     }
-    
-    // Pause entre départements
-    await new Promise(resolve => setTimeout(resolve, 2000));
-  }
+  });
+  
+  const failCount = results.filter(r => !r.success).length;
+  const successCount = results.length - failCount;
   
   console.log('');
   console.log('='.repeat(80));
@@ -58,8 +88,7 @@ async function retryDepartments(departments) {
 }
 
 // Récupérer les départements depuis les arguments
-const departments = process.argv.slice(2);
-retryDepartments(departments).catch(error => {
+retryDepartments(process.argv.slice(2)).catch(error => {
   console.error('❌ ERREUR FATALE:', error);
   process.exit(1);
 });
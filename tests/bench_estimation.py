@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark and regression gate for the estimation API
+Replays tests/estimation_corpus.json against /api/geo/resolve,
+/api/dvf/comparables and /api/estimate, stores per-endpoint HDR-style
+histograms in a JSON results file and fails when p95 regresses beyond the
+allowed threshold compared with a saved baseline.
+
+Usage (from the repository root):
+    python -m tests.bench_estimation --save-baseline      # record a baseline
+    python -m tests.bench_estimation                      # compare against it
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+from api_client import BASE_URL, make_request
+from tests.latency_histogram import LatencyHistogram
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CORPUS_PATH = os.path.join(HERE, "estimation_corpus.json")
+RESULTS_PATH = os.path.join(HERE, "bench_results.json")
+BASELINE_PATH = os.path.join(HERE, "bench_baseline.json")
+MAX_REGRESSION = float(os.environ.get("BENCH_MAX_REGRESSION", "0.20"))
+GATED_PERCENTILE = "p95_ms"
+
+ENDPOINTS = ["geo/resolve", "dvf/comparables", "estimate"]
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def build_request(endpoint, prop, characteristics):
+    """(method, path, body, params) for one corpus entry"""
+    if endpoint == "geo/resolve":
+        return "GET", "/geo/resolve", None, {"address": prop["address"]}
+    if endpoint == "dvf/comparables":
+        return "GET", "/dvf/comparables", None, {
+            "lat": prop["lat"], "lng": prop["lng"], "type": prop["type"], "surface": prop["surface"],
+        }
+    return "POST", "/estimate", {
+        "address": prop["address"],
+        "lat": prop["lat"],
+        "lng": prop["lng"],
+        "type": prop["type"],
+        "surface": prop["surface"],
+        "characteristics": characteristics.get(prop["type"], {}),
+    }, None
+
+def run_benchmark(corpus, endpoints=ENDPOINTS, iterations=3, warmup=1, timeout=60):
+    """Replay the corpus and return {endpoint: (histogram, errors)}"""
+    results = {endpoint: (LatencyHistogram(), []) for endpoint in endpoints}
+    characteristics = corpus.get("characteristics", {})
+
+    for iteration in range(warmup + iterations):
+        measured = iteration >= warmup
+        for prop in corpus["properties"]:
+            for endpoint in endpoints:
+                method, path, body, params = build_request(endpoint, prop, characteristics)
+                result = make_request(method, path, body, params=params, timeout=timeout)
+                if not measured:
+                    continue
+                histogram, errors = results[endpoint]
+                # 404 is a valid answer for geo/resolve on an unknown address
+                if not result['success'] or result['status_code'] >= 500:
+                    errors.append(f"{prop['address']}: {result.get('error') or result['status_code']}")
+                    continue
+                histogram.record(result['elapsed_ms'])
+    return results
+
+def to_report(results, iterations):
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'base_url': BASE_URL,
+        'iterations': iterations,
+        'endpoints': {
+            endpoint: {
+                **histogram.summary(),
+                'errors': len(errors),
+                'histogram': histogram.to_dict(),
+            }
+            for endpoint, (histogram, errors) in results.items()
+        },
+    }
+
+def compare_to_baseline(report, baseline, max_regression=MAX_REGRESSION, metric=GATED_PERCENTILE):
+    """List of regression messages; empty when every endpoint is within threshold"""
+    regressions = []
+    for endpoint, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous or previous.get(metric) is None:
+            continue
+        if current.get(metric) is None:
+            regressions.append(f"{endpoint}: no successful samples (baseline {metric} {previous[metric]:.1f} ms)")
+            continue
+        limit = previous[metric] * (1 + max_regression)
+        if current[metric] > limit:
+            change = (current[metric] / previous[metric] - 1) * 100
+            regressions.append(
+                f"{endpoint}: {metric} {current[metric]:.1f} ms vs baseline {previous[metric]:.1f} ms "
+                f"(+{change:.0f}%, limit +{max_regression * 100:.0f}%)"
+            )
+    return regressions
+
+def format_report(report):
+    lines = [f"{'endpoint':<18} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}"]
+    for endpoint, row in report['endpoints'].items():
+        def ms(key):
+            return f"{row[key]:9.1f}" if row[key] is not None else "        -"
+        lines.append(f"{endpoint:<18} {row['count']:>5} {ms('p50_ms')} {ms('p95_ms')} "
+                     f"{ms('p99_ms')} {ms('max_ms')} {row['errors']:>7}")
+    return "\n".join(lines)
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimation API latency benchmark / regression gate")
+    parser.add_argument("--iterations", type=int, default=3, help="measured passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured passes first")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--output", default=RESULTS_PATH, help="results JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION,
+                        help="allowed p95 increase as a fraction (default: %(default)s)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"⏱️  Benchmarking {', '.join(args.endpoints)} on {BASE_URL} "
+          f"({len(corpus['properties'])} properties x {args.iterations} iterations)")
+    results = run_benchmark(corpus, args.endpoints, args.iterations, args.warmup)
+    report = to_report(results, args.iterations)
+    write_json(args.output, report)
+    print(format_report(report))
+    print(f"Results written to {args.output}")
+
+    for endpoint, (_, errors) in results.items():
+        for error in errors[:3]:
+            print(f"⚠️  {endpoint}: {error}")
+
+    if args.save_baseline:
+        write_json(args.baseline, report)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(report, baseline, args.max_regression)
+    if regressions:
+        print("❌ p95 regression detected:")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+    print(f"✅ p95 within +{args.max_regression * 100:.0f}% of baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
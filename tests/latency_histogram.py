@@ -0,0 +1,100 @@
+"""
+HDR-style latency histogram
+
+Values are recorded in microseconds into log-linear buckets: exact below
+2 * SUB_BUCKET_COUNT, then buckets whose width doubles with each power of two,
+so the relative error stays under 1 / SUB_BUCKET_COUNT (~0.05%) whatever the
+magnitude. Buckets are sparse, so the JSON form stays small and histograms
+from several runs can be merged.
+"""
+
+import math
+
+SUB_BUCKET_COUNT = 2048  # 3 significant decimal digits
+SUB_BUCKET_BITS = SUB_BUCKET_COUNT.bit_length() - 1
+
+def bucket_bounds(value_us):
+    """(start, width) of the bucket holding an integer microsecond value"""
+    if value_us < SUB_BUCKET_COUNT:
+        return value_us, 1
+    shift = value_us.bit_length() - SUB_BUCKET_BITS - 1
+    start = (value_us >> shift) << shift
+    return start, 1 << shift
+
+class LatencyHistogram:
+    """Sparse log-linear histogram of latencies recorded in milliseconds"""
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = None
+
+    def record(self, latency_ms):
+        value_us = max(0, int(round(latency_ms * 1000)))
+        start, _ = bucket_bounds(value_us)
+        self.counts[start] = self.counts.get(start, 0) + 1
+        self.total += 1
+        self.sum_us += value_us
+        self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+        self.max_us = value_us if self.max_us is None else max(self.max_us, value_us)
+
+    def merge(self, other):
+        for start, count in other.counts.items():
+            self.counts[start] = self.counts.get(start, 0) + count
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.total:
+            self.min_us = other.min_us if self.min_us is None else min(self.min_us, other.min_us)
+            self.max_us = other.max_us if self.max_us is None else max(self.max_us, other.max_us)
+        return self
+
+    def value_at_percentile(self, pct):
+        """Highest value equivalent to the pct-th percentile, in milliseconds"""
+        if not self.total:
+            return None
+        target = max(1, math.ceil(pct / 100 * self.total))
+        seen = 0
+        for start in sorted(self.counts):
+            seen += self.counts[start]
+            if seen >= target:
+                _, width = bucket_bounds(start)
+                return min(start + width - 1, self.max_us) / 1000
+        return self.max_us / 1000
+
+    def mean(self):
+        return self.sum_us / self.total / 1000 if self.total else None
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'min_ms': self.min_us / 1000 if self.total else None,
+            'mean_ms': self.mean(),
+            'p50_ms': self.value_at_percentile(50),
+            'p90_ms': self.value_at_percentile(90),
+            'p95_ms': self.value_at_percentile(95),
+            'p99_ms': self.value_at_percentile(99),
+            'max_ms': self.max_us / 1000 if self.total else None,
+        }
+
+    def to_dict(self):
+        return {
+            'unit': 'us',
+            'sub_bucket_count': SUB_BUCKET_COUNT,
+            'total': self.total,
+            'sum': self.sum_us,
+            'min': self.min_us,
+            'max': self.max_us,
+            'buckets': [[start, self.counts[start]] for start in sorted(self.counts)],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {start: count for start, count in data['buckets']}
+        histogram.total = data['total']
+        histogram.sum_us = data['sum']
+        histogram.min_us = data['min']
+        histogram.max_us = data['max']
+        return histogram
@@ -0,0 +1,48 @@
+"""
+Tests for the local BAN geocoding stand-in (ban_mock.py)
+"""
+
+import pytest
+
+from api_client import make_request
+from ban_mock import BanMock, Profile, normalize
+
+@pytest.fixture
+def mock():
+    server = BanMock(port=0, seed=1).start()
+    yield server
+    server.stop()
+
+def test_search_returns_geojson_features(mock):
+    result = make_request("GET", f"{mock.base_url}/search/", params={"q": "8 rue des Italiens Paris", "limit": 5})
+    assert result['status_code'] == 200
+    features = result['data']['features']
+    assert features[0]['properties']['label'] == '8 Rue des Italiens 75009 Paris'
+    assert features[0]['properties']['postcode'] == '75009'
+    assert features[0]['properties']['city'] == 'Paris'
+    assert features[0]['geometry']['coordinates'] == [2.3373, 48.8717]
+
+def test_search_is_accent_and_case_insensitive():
+    assert normalize("  Rue de l'Église, ÉVRY ") == "rue de l eglise evry"
+
+def test_unknown_address_returns_no_features(mock):
+    result = make_request("GET", f"{mock.base_url}/search/", params={"q": "nowhere street 00000"})
+    assert result['status_code'] == 200
+    assert result['data']['features'] == []
+
+def test_requests_are_recorded_and_reset(mock):
+    for _ in range(2):
+        make_request("GET", f"{mock.base_url}/search/", params={"q": "Boulevard Haussmann"})
+    listed = make_request("GET", f"{mock.base_url}/_mock/requests")
+    assert [r['q'] for r in listed['data']['requests']] == ["Boulevard Haussmann"] * 2
+
+    make_request("DELETE", f"{mock.base_url}/_mock/requests")
+    assert mock.get_requests() == []
+
+def test_error_profile_returns_configured_status():
+    server = BanMock(port=0, profile=Profile(error_rate=1.0, error_status=503)).start()
+    try:
+        result = make_request("GET", f"{server.base_url}/search/", params={"q": "Boulevard Haussmann"})
+    finally:
+        server.stop()
+    assert result['status_code'] == 503
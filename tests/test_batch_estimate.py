@@ -0,0 +1,58 @@
+"""
+Tests for the batch estimation client (batch_estimate.py)
+"""
+
+import json
+
+import pytest
+
+from batch_estimate import estimate_all, load_properties
+
+def test_load_csv_coerces_numbers_and_characteristics(tmp_path):
+    path = tmp_path / "portfolio.csv"
+    path.write_text(
+        "id,address,lat,lng,type,surface,characteristics\n"
+        'a1,8 Rue des Italiens 75009 Paris,48.8717,2.3373,appartement,65,"{""dpe"": ""C""}"\n'
+        "a2,,45.7640,4.8357,maison,120,\n",
+        encoding="utf-8",
+    )
+    properties = load_properties(str(path))
+    assert properties[0] == {
+        "id": "a1", "address": "8 Rue des Italiens 75009 Paris", "lat": 48.8717, "lng": 2.3373,
+        "type": "appartement", "surface": 65.0, "characteristics": {"dpe": "C"},
+    }
+    assert "address" not in properties[1] and "characteristics" not in properties[1]
+
+def test_load_json_and_ndjson(tmp_path):
+    rows = [{"id": 1, "lat": 48.8, "lng": 2.3, "type": "maison", "surface": 90}]
+    (tmp_path / "a.json").write_text(json.dumps({"properties": rows}), encoding="utf-8")
+    (tmp_path / "b.ndjson").write_text("\n".join(json.dumps(r) for r in rows) + "\n\n", encoding="utf-8")
+    assert load_properties(str(tmp_path / "a.json")) == rows
+    assert load_properties(str(tmp_path / "b.ndjson")) == rows
+
+def _fake_stream(chunks):
+    def stream(chunk, token, include_market):
+        chunks.append(len(chunk))
+        for i, prop in enumerate(chunk):
+            yield {"index": i, "id": prop["id"]} if prop.get("ok") else {"index": i, "id": prop["id"], "error": "bad"}
+        yield {"summary": {"total": len(chunk), "estimated": sum(1 for p in chunk if p.get("ok")),
+                           "failed": sum(1 for p in chunk if not p.get("ok")), "groups": 1, "elapsedMs": 1}}
+    return stream
+
+def test_estimate_all_chunks_and_offsets_indexes():
+    properties = [{"id": n, "ok": n != 3} for n in range(5)]
+    chunks = []
+    results = estimate_all(properties, "token", chunk_size=2, stream=_fake_stream(chunks))
+    lines = []
+    with pytest.raises(StopIteration) as done:
+        while True:
+            lines.append(next(results))
+    assert chunks == [2, 2, 1]
+    assert [(line["index"], line["id"]) for line in lines] == [(n, n) for n in range(5)]
+    assert done.value.value == {"total": 5, "estimated": 4, "failed": 1, "groups": 3}
+
+def test_stream_error_line_raises():
+    def stream(chunk, token, include_market):
+        yield {"error": "Batch estimation failed"}
+    with pytest.raises(RuntimeError, match="Batch estimation failed"):
+        list(estimate_all([{"id": 1}], "token", stream=stream))
@@ -0,0 +1,83 @@
+"""
+Tests for the local Brevo stand-in (brevo_mock.py)
+"""
+
+import pytest
+
+from api_client import make_request
+from brevo_mock import BrevoMock, Profile, fetch_contact
+
+API_KEY = {"api-key": "test"}
+SMS_BODY = {
+    "sender": "AlterEgo",
+    "recipient": "+33612345678",
+    "content": "Votre code de vérification AlterEgo est : 482913\n\nCe code expire dans 5 minutes.",
+    "type": "transactional",
+}
+
+@pytest.fixture
+def mock():
+    server = BrevoMock(port=0, seed=1).start()
+    yield server
+    server.stop()
+
+def test_sms_is_recorded_with_code(mock):
+    result = make_request("POST", f"{mock.api_url}/transactionalSMS/sms", SMS_BODY, headers=API_KEY)
+    assert result['status_code'] == 201
+    assert result['data']['reference']
+    assert mock.latest_code("+33612345678") == "482913"
+
+    listed = make_request("GET", f"{mock.base_url}/_mock/messages", params={"recipient": "+33612345678"})
+    assert [m['code'] for m in listed['data']['messages']] == ["482913"]
+
+def test_missing_api_key_is_rejected(mock):
+    result = make_request("POST", f"{mock.api_url}/transactionalSMS/sms", SMS_BODY)
+    assert result['status_code'] == 401
+    assert mock.get_messages() == []
+
+def test_error_profile_fails_without_recording(mock):
+    mock.profile.update(error_rate=1.0)
+    result = make_request("POST", f"{mock.api_url}/transactionalSMS/sms", SMS_BODY, headers=API_KEY)
+    assert result['status_code'] == 402
+    assert result['data']['code'] == 'not_enough_credits'
+    assert mock.latest_code("+33612345678") is None
+
+def test_throttle_profile_returns_429():
+    server = BrevoMock(port=0, profile=Profile(max_rps=2)).start()
+    try:
+        statuses = [
+            make_request("POST", f"{server.api_url}/transactionalSMS/sms", SMS_BODY, headers=API_KEY)['status_code']
+            for _ in range(5)
+        ]
+    finally:
+        server.stop()
+    assert statuses[:2] == [201, 201]
+    assert 429 in statuses[2:]
+
+def test_profile_can_be_changed_over_http(mock):
+    result = make_request("POST", f"{mock.base_url}/_mock/profile", {"latency_ms": 50})
+    assert result['data']['latency_ms'] == 50
+    sent = make_request("POST", f"{mock.api_url}/transactionalSMS/sms", SMS_BODY, headers=API_KEY)
+    assert sent['elapsed_ms'] >= 50
+
+def test_contact_create_then_update(mock):
+    contact = {"email": "lead@example.com", "attributes": {"NOM": "Lead"}, "updateEnabled": True}
+    created = make_request("POST", f"{mock.api_url}/contacts", contact, headers=API_KEY)
+    assert created['status_code'] == 201
+    assert created['data']['id'] == 1
+
+    contact["attributes"] = {"PRIX_ESTIME": 450000}
+    updated = make_request("POST", f"{mock.api_url}/contacts", contact, headers=API_KEY)
+    assert updated['status_code'] == 204
+
+    duplicate = make_request("POST", f"{mock.api_url}/contacts",
+                             {"email": "lead@example.com"}, headers=API_KEY)
+    assert duplicate['data']['code'] == 'duplicate_parameter'
+
+    put = make_request("PUT", f"{mock.api_url}/contacts/lead%40example.com",
+                       {"attributes": {"CONSENTEMENT": "Oui"}}, headers=API_KEY)
+    assert put['status_code'] == 204
+
+    stored = fetch_contact(mock.base_url, "lead@example.com")
+    assert stored['attributes'] == {"NOM": "Lead", "PRIX_ESTIME": 450000, "CONSENTEMENT": "Oui"}
+    assert fetch_contact(mock.base_url, "other@example.com") is None
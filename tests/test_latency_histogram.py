@@ -0,0 +1,59 @@
+"""
+Tests for the benchmark histogram and the p95 regression gate
+"""
+
+import random
+
+from tests.bench_estimation import compare_to_baseline
+from tests.latency_histogram import LatencyHistogram, SUB_BUCKET_COUNT, bucket_bounds
+
+def exact_percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for ms in (0.5, 1.0, 1.5, 2.0):
+        histogram.record(ms)
+    assert histogram.value_at_percentile(50) == 1.0
+    assert histogram.value_at_percentile(100) == 2.0
+
+def test_percentiles_within_relative_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(4, 1) for _ in range(5000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    for pct in (50, 90, 95, 99):
+        expected = exact_percentile(values, pct)
+        assert abs(histogram.value_at_percentile(pct) - expected) / expected < 2 / SUB_BUCKET_COUNT
+
+def test_bucket_width_grows_with_magnitude():
+    assert bucket_bounds(100) == (100, 1)
+    start, width = bucket_bounds(1_000_000)
+    assert start <= 1_000_000 < start + width
+    assert width / 1_000_000 < 1 / SUB_BUCKET_COUNT
+
+def test_round_trip_and_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    for ms in range(1, 101):
+        first.record(ms)
+        second.record(ms + 100)
+    restored = LatencyHistogram.from_dict(first.to_dict())
+    assert restored.summary() == first.summary()
+    merged = restored.merge(second)
+    assert merged.total == 200
+    assert abs(merged.value_at_percentile(50) - 100.0) < 100.0 / SUB_BUCKET_COUNT
+    assert merged.max_us == 200_000
+
+def report(p95):
+    return {'endpoints': {'estimate': {'p95_ms': p95}}}
+
+def test_regression_gate():
+    assert compare_to_baseline(report(115), report(100), max_regression=0.2) == []
+    regressions = compare_to_baseline(report(130), report(100), max_regression=0.2)
+    assert len(regressions) == 1 and 'estimate' in regressions[0]
+    # Endpoints missing from the baseline are not gated
+    assert compare_to_baseline(report(500), {'endpoints': {}}) == []
+    assert compare_to_baseline(report(None), report(100))
@@ -0,0 +1,47 @@
+"""
+Tests for the rate limiter load test (rate_limit_load.py)
+"""
+
+import random
+import threading
+
+from rate_limit_load import ROUTES, evaluate, run_route
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+def fake_server(capacity, leaky=False):
+    """Token-less stand-in: per-IP counter, 429 after `capacity` requests"""
+    counts = {}
+    lock = threading.Lock()
+
+    def send(method, endpoint, data=None, headers=None, params=None):
+        ip = headers['X-Forwarded-For']
+        with lock:
+            counts[ip] = counts.get(ip, 0) + 1
+            allowed = leaky or counts[ip] <= capacity
+        response_headers = {'X-RateLimit-Limit': str(capacity)}
+        if not allowed:
+            response_headers['Retry-After'] = '6'
+        return {'success': True, 'status_code': 200 if allowed else 429,
+                'data': {}, 'response': FakeResponse(response_headers)}
+    return send
+
+def test_limit_that_holds_passes():
+    summary, failures = run_route('estimate', 40, 10, send=fake_server(10), rng=random.Random(1))
+    assert (summary['allowed'], summary['limited'], summary['limit']) == (10, 30, 10)
+    assert failures == []
+
+def test_leaky_limit_is_reported():
+    summary, failures = run_route('send-otp', 40, 10, send=fake_server(5, leaky=True), rng=random.Random(2))
+    assert summary['allowed'] == 40
+    assert any("requests allowed" in f for f in failures)
+    assert any("no 429" in f for f in failures)
+
+def test_refill_during_burst_is_tolerated():
+    summary = {'allowed': 12, 'limited': 28, 'errors': 0, 'missing_retry_after': 0,
+               'limit': 10, 'elapsed': 6.0}
+    assert evaluate(summary, 40, ROUTES['estimate']['per']) == []
+    assert evaluate({**summary, 'missing_retry_after': 1}, 40, 60) == ["1 responses with 429 but no Retry-After"]
+    assert evaluate({**summary, 'limit': None}, 40, 60) == ["no X-RateLimit-Limit header: route not rate limited"]